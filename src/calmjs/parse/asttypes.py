@@ -26,8 +26,9 @@ from __future__ import unicode_literals
 
 __author__ = 'Ruslan Spivak <ruslan.spivak@gmail.com>'
 
-from collections import defaultdict
-from ply.lex import LexToken
+from calmjs.parse.lexers.tokens import AutoLexToken
+from calmjs.parse.lexers.tokens import LEX_TOKEN_TYPES
+from calmjs.parse.lexers.tokens import PositionTable
 from calmjs.parse.utils import str
 from calmjs.parse.utils import repr_compat
 
@@ -35,25 +36,133 @@ from calmjs.parse.utils import repr_compat
 # type for the entire tree is not the scope of what's being defined here
 
 
+# The token map for the nodes that have no tokens, shared by all of them
+# so that it must never be modified.
+EMPTY_TOKEN_MAP = {}
+
+# The attributes that are not slots of the nodes.
+NON_SLOTS = ('__dict__', '__weakref__')
+
+# The names of the slots for each of the node types.
+_slot_names = {}
+
+
+def slot_names(cls):
+    """
+    Return the names of all the slots for the node type, including the
+    ones from its parents.
+    """
+
+    try:
+        return _slot_names[cls]
+    except KeyError:
+        names = _slot_names[cls] = tuple(
+            name for c in reversed(cls.__mro__)
+            for name in c.__dict__.get('__slots__', ())
+            if name not in NON_SLOTS
+        )
+        return names
+
+
+def attributes(node):
+    """
+    Return a dict of the attributes that were assigned to the node, as
+    ``vars`` would have before the nodes were slotted.  The positions
+    are omitted if they were not set.
+    """
+
+    result = {}
+    for name in slot_names(type(node)):
+        try:
+            # the plain lookup, such that the lazy elements of the
+            # functions are not materialized by FuncBase.__getattr__
+            value = object.__getattribute__(node, name)
+        except AttributeError:
+            continue
+        if value is None and name in (
+                'lexpos', 'lineno', 'colno', '_endpos'):
+            continue
+        result[name] = value
+    result.update(getattr(node, '__dict__', {}))
+    return result
+
+
 class Node(object):
-    lexpos = lineno = colno = None
+    # The attributes for every node type are stored in their slots, with
+    # a __dict__ slot only for any additional attributes assigned to the
+    # instances (such as sourcepath and comments), which will only be
+    # allocated once one of those is assigned.
+    __slots__ = (
+        'lexpos', 'lineno', 'colno', '_endpos', '_positions',
+        '_position_index', '_children_list',
+    ) + NON_SLOTS
     sourcepath = None
     comments = None
 
+    def __new__(cls, *a, **kw):
+        self = object.__new__(cls)
+        self.lexpos = self.lineno = self.colno = self._endpos = None
+        return self
+
     def __init__(self, children=None):
         self._children_list = [] if children is None else children
-        self._token_map = {}
+        self._positions = EMPTY_TOKEN_MAP
+
+    def __getstate__(self):
+        # as required for the pickle protocols before 2, with the same
+        # form as the one provided by later versions of Python.
+        state = getattr(self, '__dict__', None) or None
+        slots = {}
+        for name in slot_names(type(self)):
+            try:
+                slots[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+        return (state, slots)
+
+    @property
+    def endpos(self):
+        # The offset to the end of the last token of the node, i.e. the
+        # node spans from lexpos up to but not including endpos, though
+        # the children of some nodes may start before their lexpos.
+        return self._endpos
+
+    @endpos.setter
+    def endpos(self, value):
+        self._endpos = value
+
+    @property
+    def _token_map(self):
+        # The positions of the tokens for the node, as a dict of tokens
+        # to the lists of their positions, which may also be assigned
+        # directly to the node.
+        positions = self._positions
+        if isinstance(positions, PositionTable):
+            return positions.token_map(self._position_index)
+        return positions
+
+    @_token_map.setter
+    def _token_map(self, value):
+        self._positions = value
 
     def getpos(self, s, idx):
-        token_map = getattr(self, '_token_map', NotImplemented)
-        if token_map is NotImplemented:
+        try:
+            token_map = self._positions
+        except AttributeError:
             return (None, None, None)
 
-        token_list = token_map.get(s, [])
-        if idx < len(token_list):
-            return token_list[idx]
-        else:
-            return (0, 0, 0)
+        if isinstance(token_map, PositionTable):
+            return token_map.getpos(self._position_index, s, idx)
+
+        positions = token_map.get(s, ())
+        if positions and not isinstance(positions[0], tuple):
+            # packed by setpos as a flat (lexpos, lineno, colno, ...)
+            idx *= 3
+            if idx < len(positions):
+                return positions[idx:idx + 3]
+        elif idx < len(positions):
+            return positions[idx]
+        return (0, 0, 0)
 
     def findpos(self, p, idx):
         lexpos = p.lexpos(idx)
@@ -66,31 +175,75 @@ class Node(object):
             else 0)
         return lexpos, lineno, colno
 
-    def setpos(self, p, idx=1, additional=()):
+    def findend(self, p, idx):
+        """
+        Return the offset to the end of the element inside the production
+        at idx, or of the closest one before it that has one, as the end
+        of the last token of that element.  Automatically inserted tokens
+        have no length and are skipped over.
+        """
+
+        for i in range(idx, 0, -1):
+            token = p.slice[i]
+            if isinstance(token, LEX_TOKEN_TYPES):
+                if not isinstance(token, AutoLexToken):
+                    return token.lexpos + len(token.value)
+                continue
+            value = p[i]
+            while isinstance(value, list) and value:
+                value = value[-1]
+            if isinstance(value, Node) and value.endpos is not None:
+                return value.endpos
+        return None
+
+    def setpos(self, p, idx=1, additional=(), last=None):
         """
         This takes a production produced by the lexer and set various
         attributes for this node, such as the positions in the original
         source that defined this token, along with other "hidden" tokens
         that should be converted into comment nodes associated with this
         node.
-        """
 
-        self._token_map = defaultdict(list)
+        The end position of the node is derived from the last element of
+        the production, unless the index to the element that ends the
+        node is provided as last.
+        """
 
         # only do so if the lexer has comments enabled, and that the
         # production at the index actually has a token provided (which
         # presumes that this is the lowest level node being produced).
-        if p.lexer.with_comments and isinstance(p.slice[idx], LexToken):
+        if p.lexer.with_comments and isinstance(p.slice[idx], LEX_TOKEN_TYPES):
             self.set_comments(p, idx)
 
-        self.lexpos, self.lineno, self.colno = self.findpos(p, idx)
-        for i, token in enumerate(p):
-            if not isinstance(token, str):
-                continue
-            self._token_map[token].append(self.findpos(p, i))
+        if not getattr(p.lexer, 'track_positions', True):
+            return
 
-        for token, i in additional:
-            self._token_map[token].append(self.findpos(p, i))
+        self.lexpos, self.lineno, self.colno = self.findpos(p, idx)
+        self.endpos = self.findend(p, len(p) - 1 if last is None else last)
+
+        # the positions of the tokens are recorded in the table provided
+        # by the lexer, shared by every node produced from its input.
+        table = getattr(p.lexer, 'positions', None)
+        if table is not None:
+            for i, token in enumerate(p):
+                if isinstance(token, str):
+                    table.add(token, p.lexpos(i), p.lineno(i))
+            for token, i in additional:
+                table.add(token, p.lexpos(i), p.lineno(i))
+            self._positions = table
+            self._position_index = table.close()
+        else:
+            # otherwise, the positions for each of the tokens are packed
+            # into a flat tuple in a token map for this node.
+            self._positions = token_map = {}
+            for i, token in enumerate(p):
+                if not isinstance(token, str):
+                    continue
+                token_map[token] = (
+                    token_map.get(token, ()) + self.findpos(p, i))
+            for token, i in additional:
+                token_map[token] = (
+                    token_map.get(token, ()) + self.findpos(p, i))
 
         # the very ugly debugger invocation for locating the special
         # cases that are required
@@ -128,13 +281,15 @@ class Node(object):
             # short-circuit the setpos only
             pos = (token.lexpos, token.lineno, token.colno)
             comment.lexpos, comment.lineno, comment.colno = pos
-            comment._token_map = {token.value: [pos]}
+            comment.endpos = token.lexpos + len(token.value)
+            comment._token_map = {token.value: pos}
             comments.append(comment)
 
         if comments:
             self.comments = Comments(list(reversed(comments)))
             (self.comments.lexpos, self.comments.lineno,
                 self.comments.colno) = pos
+            self.comments.endpos = comments[0].endpos
 
     def __iter__(self):
         for child in self.children():
@@ -150,34 +305,42 @@ class Node(object):
 
 
 class Program(Node):
-    pass
+    __slots__ = ()
 
 
 class ES5Program(Program):
-    pass
+    __slots__ = ()
 
 
 class Block(Node):
-    pass
+    __slots__ = ()
 
 
 class Boolean(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class Null(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         assert value == 'null'
         self.value = value
 
 
 class Number(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class Identifier(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -190,18 +353,26 @@ class PropIdentifier(Identifier):
     as Property Accessors (11.2.1).
     """
 
+    __slots__ = ()
+
 
 class String(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class Regex(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class Array(Node):
+    __slots__ = ('items',)
+
     def __init__(self, items):
         self.items = items
 
@@ -211,6 +382,8 @@ class Array(Node):
 
 class List(Node):
     # in JavaScript, this is distinctive from Array.
+    __slots__ = ('items',)
+
     def __init__(self, items):
         self.items = items
 
@@ -219,10 +392,12 @@ class List(Node):
 
 
 class Arguments(List):
-    pass
+    __slots__ = ()
 
 
 class Object(Node):
+    __slots__ = ('properties',)
+
     def __init__(self, properties=None):
         self.properties = [] if properties is None else properties
 
@@ -231,6 +406,8 @@ class Object(Node):
 
 
 class NewExpr(Node):
+    __slots__ = ('identifier', 'args')
+
     def __init__(self, identifier, args=None):
         self.identifier = identifier
         self.args = args
@@ -240,6 +417,8 @@ class NewExpr(Node):
 
 
 class FunctionCall(Node):
+    __slots__ = ('identifier', 'args')
+
     def __init__(self, identifier, args=None):
         self.identifier = identifier
         self.args = args
@@ -249,6 +428,8 @@ class FunctionCall(Node):
 
 
 class BracketAccessor(Node):
+    __slots__ = ('node', 'expr')
+
     def __init__(self, node, expr):
         self.node = node
         self.expr = expr
@@ -258,6 +439,8 @@ class BracketAccessor(Node):
 
 
 class DotAccessor(Node):
+    __slots__ = ('node', 'identifier')
+
     def __init__(self, node, identifier):
         self.node = node
         self.identifier = identifier
@@ -267,6 +450,8 @@ class DotAccessor(Node):
 
 
 class Assign(Node):
+    __slots__ = ('op', 'left', 'right')
+
     def __init__(self, op, left, right):
         self.op = op
         self.left = left
@@ -277,6 +462,8 @@ class Assign(Node):
 
 
 class GetPropAssign(Node):
+    __slots__ = ('prop_name', 'elements')
+
     def __init__(self, prop_name, elements):
         """elements - function body"""
         self.prop_name = prop_name
@@ -287,6 +474,8 @@ class GetPropAssign(Node):
 
 
 class SetPropAssign(Node):
+    __slots__ = ('prop_name', 'parameter', 'elements')
+
     def __init__(self, prop_name, parameter, elements):
         """elements - function body"""
         self.prop_name = prop_name
@@ -298,10 +487,12 @@ class SetPropAssign(Node):
 
 
 class VarStatement(Node):
-    pass
+    __slots__ = ()
 
 
 class VarDecl(Node):
+    __slots__ = ('identifier', 'initializer')
+
     def __init__(self, identifier, initializer=None):
         self.identifier = identifier
         self.initializer = initializer
@@ -315,8 +506,12 @@ class VarDeclNoIn(VarDecl):
     Specialized for the ForIn Node.
     """
 
+    __slots__ = ()
+
 
 class UnaryExpr(Node):
+    __slots__ = ('op', 'value')
+
     def __init__(self, op, value, postfix=False):
         self.op = op
         self.value = value
@@ -326,12 +521,16 @@ class UnaryExpr(Node):
 
 
 class PostfixExpr(UnaryExpr):
+    __slots__ = ()
+
     def __init__(self, op, value):
         self.op = op
         self.value = value
 
 
 class BinOp(Node):
+    __slots__ = ('op', 'left', 'right')
+
     def __init__(self, op, left, right):
         self.op = op
         self.left = left
@@ -342,6 +541,8 @@ class BinOp(Node):
 
 
 class GroupingOp(Node):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -351,6 +552,9 @@ class GroupingOp(Node):
 
 class Conditional(Node):
     """Conditional Operator ( ? : )"""
+
+    __slots__ = ('predicate', 'consequent', 'alternative')
+
     def __init__(self, predicate, consequent, alternative):
         self.predicate = predicate
         self.consequent = consequent
@@ -361,6 +565,8 @@ class Conditional(Node):
 
 
 class If(Node):
+    __slots__ = ('predicate', 'consequent', 'alternative')
+
     def __init__(self, predicate, consequent, alternative=None):
         self.predicate = predicate
         self.consequent = consequent
@@ -371,6 +577,8 @@ class If(Node):
 
 
 class DoWhile(Node):
+    __slots__ = ('predicate', 'statement')
+
     def __init__(self, predicate, statement):
         self.predicate = predicate
         self.statement = statement
@@ -380,6 +588,8 @@ class DoWhile(Node):
 
 
 class While(Node):
+    __slots__ = ('predicate', 'statement')
+
     def __init__(self, predicate, statement):
         self.predicate = predicate
         self.statement = statement
@@ -389,6 +599,8 @@ class While(Node):
 
 
 class For(Node):
+    __slots__ = ('init', 'cond', 'count', 'statement')
+
     def __init__(self, init, cond, count, statement):
         self.init = init
         self.cond = cond
@@ -400,6 +612,8 @@ class For(Node):
 
 
 class ForIn(Node):
+    __slots__ = ('item', 'iterable', 'statement')
+
     def __init__(self, item, iterable, statement):
         self.item = item
         self.iterable = iterable
@@ -410,6 +624,8 @@ class ForIn(Node):
 
 
 class Continue(Node):
+    __slots__ = ('identifier',)
+
     def __init__(self, identifier=None):
         self.identifier = identifier
 
@@ -418,6 +634,8 @@ class Continue(Node):
 
 
 class Break(Node):
+    __slots__ = ('identifier',)
+
     def __init__(self, identifier=None):
         self.identifier = identifier
 
@@ -426,6 +644,8 @@ class Break(Node):
 
 
 class Return(Node):
+    __slots__ = ('expr',)
+
     def __init__(self, expr=None):
         self.expr = expr
 
@@ -434,6 +654,8 @@ class Return(Node):
 
 
 class With(Node):
+    __slots__ = ('expr', 'statement')
+
     def __init__(self, expr, statement):
         self.expr = expr
         self.statement = statement
@@ -444,6 +666,8 @@ class With(Node):
 
 class Switch(Node):
 
+    __slots__ = ('expr', 'case_block')
+
     def __init__(self, expr, case_block):
         self.expr = expr
         self.case_block = case_block
@@ -453,10 +677,12 @@ class Switch(Node):
 
 
 class CaseBlock(Block):
-    pass
+    __slots__ = ()
 
 
 class Case(Node):
+    __slots__ = ('expr', 'elements')
+
     def __init__(self, expr, elements):
         self.expr = expr
         self.elements = elements if elements is not None else []
@@ -466,6 +692,8 @@ class Case(Node):
 
 
 class Default(Node):
+    __slots__ = ('elements',)
+
     def __init__(self, elements):
         self.elements = elements if elements is not None else []
 
@@ -474,6 +702,8 @@ class Default(Node):
 
 
 class Label(Node):
+    __slots__ = ('identifier', 'statement')
+
     def __init__(self, identifier, statement):
         self.identifier = identifier
         self.statement = statement
@@ -483,6 +713,8 @@ class Label(Node):
 
 
 class Throw(Node):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -491,6 +723,8 @@ class Throw(Node):
 
 
 class Try(Node):
+    __slots__ = ('statements', 'catch', 'fin')
+
     def __init__(self, statements, catch=None, fin=None):
         self.statements = statements
         self.catch = catch
@@ -501,6 +735,8 @@ class Try(Node):
 
 
 class Catch(Node):
+    __slots__ = ('identifier', 'elements')
+
     def __init__(self, identifier, elements):
         self.identifier = identifier
         self.elements = elements
@@ -510,6 +746,8 @@ class Catch(Node):
 
 
 class Finally(Node):
+    __slots__ = ('elements',)
+
     def __init__(self, elements):
         self.elements = elements
 
@@ -518,30 +756,49 @@ class Finally(Node):
 
 
 class Debugger(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class FuncBase(Node):
+    __slots__ = ('identifier', 'parameters', 'elements', '_lazy_elements')
+
     def __init__(self, identifier, parameters, elements):
         self.identifier = identifier
         self.parameters = parameters if parameters is not None else []
         self.elements = elements if elements is not None else []
 
+    def __getattr__(self, name):
+        # Only invoked for attributes that are missing, which for the
+        # elements is the case for functions produced by a lazy parser,
+        # where a callable for producing them is provided instead.
+        if name == 'elements':
+            lazy_elements = getattr(self, '_lazy_elements', None)
+            if lazy_elements is not None:
+                self.elements = lazy_elements()
+                del self._lazy_elements
+                return self.elements
+        raise AttributeError("'%s' object has no attribute '%s'" % (
+            type(self).__name__, name))
+
     def children(self):
         return [self.identifier] + self.parameters + self.elements
 
 
 class FuncDecl(FuncBase):
-    pass
+    __slots__ = ()
 
 
 # The only difference is that function expression might not have an identifier
 class FuncExpr(FuncBase):
-    pass
+    __slots__ = ()
 
 
 class Comma(Node):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -551,11 +808,15 @@ class Comma(Node):
 
 
 class EmptyStatement(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class ExprStatement(Node):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -564,11 +825,15 @@ class ExprStatement(Node):
 
 
 class Elision(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class This(Node):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -581,6 +846,7 @@ class This(Node):
 
 
 class Comments(Node):
+    __slots__ = ()
 
     def __str__(self):
         return str('\n').join(str(child) for child in self.children())
@@ -593,6 +859,8 @@ class Comments(Node):
 
 
 class Comment(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -605,8 +873,8 @@ class Comment(Node):
 
 
 class BlockComment(Comment):
-    pass
+    __slots__ = ()
 
 
 class LineComment(Comment):
-    pass
+    __slots__ = ()
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache for parsed ASTs.
+"""
+
+import logging
+import pickle
+import sys
+from functools import partial
+from hashlib import sha256
+from os import listdir
+from os import makedirs
+from os import replace
+from os import stat
+from os import unlink
+from os import utime
+from os.path import exists
+from os.path import join
+from tempfile import NamedTemporaryFile
+from types import ModuleType
+
+from calmjs.parse.utils import str
+
+logger = logging.getLogger(__name__)
+
+# bump whenever the layout of the nodes change in an incompatible way
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.ast'
+
+
+def _config_value(parser, value):
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    # the factories for the node types are identified by their names.
+    name = getattr(value, 'name', None)
+    if not isinstance(name, str):
+        raise TypeError(
+            'cannot produce a signature for the parser %r' % (parser,))
+    return name
+
+
+def parser_signature(parser):
+    """
+    Produce a string that identifies the provided parser callable, which
+    includes the module that provided it, the name of the parsing table
+    that will be used (which encodes the Python and ply versions), and
+    any arguments bounded to it through functools.partial.
+
+    For a method bound to a parser instance, the configuration that the
+    instance was constructed with is also included.  A callable instance
+    is identified by the function wrapped by its __call__ method, such
+    as the parse function for the objects produced by the factories in
+    calmjs.parse.factory.  A TypeError is raised for the callables that
+    cannot be identified, such as lambdas, other nested functions and
+    any other callable instances.
+    """
+
+    args = []
+    while isinstance(parser, partial):
+        args.append((parser.args, sorted((parser.keywords or {}).items())))
+        parser = parser.func
+    if not hasattr(parser, '__qualname__') and not hasattr(
+            parser, '__name__'):
+        call = getattr(type(parser), '__call__', None)
+        wrapped = getattr(call, '__wrapped__', None)
+        if wrapped is None:
+            raise TypeError(
+                'cannot produce a signature for the parser %r' % (parser,))
+        parser = wrapped
+    module = getattr(parser, '__module__', None) or '?'
+    name = getattr(parser, '__qualname__', getattr(parser, '__name__', '?'))
+    if '<' in name:
+        raise TypeError(
+            'cannot produce a signature for the parser %r' % (parser,))
+    instance = getattr(parser, '__self__', None)
+    if instance is not None and not isinstance(instance, ModuleType):
+        config = getattr(instance, '_lazy_kwargs', None)
+        if config is None:
+            raise TypeError(
+                'cannot produce a signature for the parser %r' % (parser,))
+        args.append(sorted(
+            (key, _config_value(parser, value))
+            for key, value in config.items()
+        ))
+    # only the parser modules provide the name of their parsing table.
+    yacctab = getattr(sys.modules.get(module), 'yacctab', None)
+    if not isinstance(yacctab, str):
+        yacctab = '?'
+    return '%s:%s:%s:%r' % (yacctab, module, name, args)
+
+
+class DiskCache(object):
+    """
+    A content-addressed cache of serialized ASTs, stored as files within
+    a local directory.  Entries are keyed by the hash of the source text
+    along with the signature of the parser that produced the AST.  Once
+    the total size of the entries exceed the specified maximum, the
+    least recently used entries will be evicted.
+
+    The hits, misses and evictions attributes count the respective
+    events for the lifetime of the instance.
+
+    Example usage:
+
+    >>> from tempfile import mkdtemp
+    >>> from io import StringIO
+    >>> from calmjs.parse.cache import DiskCache
+    >>> from calmjs.parse.parsers.es5 import read
+    >>> cache = DiskCache(mkdtemp())
+    >>> program = read(StringIO(u'var a = 1;'), cache=cache)
+    >>> program = read(StringIO(u'var a = 1;'), cache=cache)
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, path, max_size=64 * 1024 * 1024):
+        """
+        Arguments
+
+        path
+            The directory where the entries will be stored; it will be
+            created if it does not already exist.
+        max_size
+            The maximum total size in bytes of all the entries.
+            Defaults to 64 MiB.
+        """
+
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # the running total of the size of the entries, which is only
+        # determined from the directory when it may exceed max_size.
+        self._size = None
+        if not exists(path):
+            makedirs(path)
+
+    def key(self, parser, text):
+        """
+        Return the key for the text as parsed by the parser.
+        """
+
+        digest = sha256(('%d:%s\n' % (
+            CACHE_VERSION, parser_signature(parser))).encode('utf8'))
+        digest.update(text.encode('utf8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def _entry(self, key):
+        return join(self.path, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """
+        Return the AST for the key, or None if not available.
+        """
+
+        entry = self._entry(key)
+        try:
+            with open(entry, 'rb') as fd:
+                result = pickle.load(fd)
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        except Exception:
+            logger.warning("removing unreadable cache entry '%s'", entry)
+            self._unlink(entry)
+            self.misses += 1
+            return None
+
+        # refresh the modification time for the tracking of usage
+        try:
+            utime(entry, None)
+        except (IOError, OSError):  # pragma: no cover
+            pass
+        self.hits += 1
+        return result
+
+    def set(self, key, node):
+        """
+        Store the AST for the key, then evict entries as required.
+        """
+
+        entry = self._entry(key)
+        fd = NamedTemporaryFile(dir=self.path, suffix='.tmp', delete=False)
+        try:
+            with fd:
+                pickle.dump(node, fd, pickle.HIGHEST_PROTOCOL)
+                size = fd.tell()
+            try:
+                size -= stat(entry).st_size
+            except (IOError, OSError):
+                pass
+            replace(fd.name, entry)
+        except BaseException:
+            self._unlink(fd.name)
+            raise
+
+        if self._size is not None:
+            self._size += size
+        if self._size is None or self._size > self.max_size:
+            self.evict()
+
+    def _unlink(self, entry):
+        try:
+            unlink(entry)
+        except (IOError, OSError):  # pragma: no cover
+            return False
+        return True
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the total size of
+        the remaining entries fit within max_size.
+        """
+
+        entries = []
+        total = 0
+        for name in listdir(self.path):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            entry = join(self.path, name)
+            try:
+                st = stat(entry)
+            except (IOError, OSError):  # pragma: no cover
+                continue
+            entries.append((st.st_mtime, st.st_size, entry))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_size:
+                break
+            if self._unlink(entry):
+                self.evictions += 1
+            total -= size
+        self._size = total
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+
+        for name in listdir(self.path):
+            if name.endswith(CACHE_SUFFIX):
+                self._unlink(join(self.path, name))
+        self._size = 0
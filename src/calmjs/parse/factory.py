@@ -20,7 +20,24 @@ class SRFactory(object):
     cost of having to allocate all those references per object.
     """
 
-    def __init__(self, module, str_, repr_):
+    def __init__(self, module, str_, repr_, name=None):
+        """
+        Arguments
+
+        module
+            The module containing the classes to be subclassed.
+        str_
+            The function to be used as the __str__ implementation.
+        repr_
+            The function to be used as the __repr__ implementation.
+        name
+            Optional dotted path to where the constructed factory will
+            be importable from, e.g. ``'some.module.asttypes'`` for an
+            instance assigned to ``asttypes`` inside ``some.module``.
+            If provided, the generated classes will be located by that
+            path, such that instances of them may be pickled.
+        """
+
         # recreate the class definitions
         def __str__(self):
             return str_(self)
@@ -28,16 +45,40 @@ class SRFactory(object):
         def __repr__(self):
             return repr_(self)
 
+        attrs = {
+            '__repr__': __repr__,
+            '__str__': __str__,
+            # so that the instances remain as compact as the slotted
+            # node types being subclassed.
+            '__slots__': (),
+        }
+        if name:
+            attrs['__module__'], prefix = name.rsplit('.', 1)
+
+        def build(cls):
+            if name:
+                attrs['__qualname__'] = prefix + '.' + cls.__name__
+            return type(cls.__name__, (cls,), attrs)
+
         self.module = module
+        self.name = name
         self.classes = {c.__name__: c for c in (
-            type(cls.__name__, (cls,), {
-                '__repr__': __repr__,
-                '__str__': __str__,
-            }) for cls in (
+            build(cls) for cls in (
                 v for v in vars(module).values() if isinstance(v, type)
             )
         )}
 
+    def __reduce__(self):
+        # Under the older pickle protocols, the generated classes that
+        # have a dotted __qualname__ are referenced through the factory
+        # instance, so it must be reduced to its importable name.
+        if not self.name:
+            raise TypeError(
+                "cannot pickle %r instance without a name" %
+                type(self).__name__
+            )
+        return _import_factory, (self.name,)
+
     def __getattr__(self, attr):
         if attr not in self.classes:
             raise AttributeError('%s "%s" has no attribute %r' % (
@@ -49,6 +90,11 @@ class SRFactory(object):
         return self.classes[attr]
 
 
+def _import_factory(name):
+    module_name, attr = name.rsplit('.', 1)
+    return getattr(import_module(module_name), attr)
+
+
 AstTypesFactory = partial(SRFactory, asttypes)
 
 
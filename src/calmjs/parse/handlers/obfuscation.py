@@ -60,7 +60,31 @@ class NameGenerator(object):
     next = __next__
 
 
-# TODO provide an option to memoize all properties to reduce computation
+def frozen_property(f):
+    """
+    A property for the Scope that will be computed once and memoized
+    when the scope is frozen, i.e. when the scope and all its parents
+    have been closed, as none of the symbols it may depend on will be
+    changed after that.  The memoized values are frozensets.
+    """
+
+    name = f.__name__
+
+    def getter(self):
+        try:
+            return self._memo[name]
+        except KeyError:
+            pass
+        result = f(self)
+        if self.frozen:
+            result = self._memo[name] = frozenset(result)
+        return result
+
+    getter.__name__ = name
+    getter.__doc__ = f.__doc__
+    return property(getter)
+
+
 # TODO generic Scope class for the common code (for tracking execution
 # context also?)
 
@@ -71,6 +95,8 @@ class Scope(object):
 
     def __init__(self, node, parent=None):
         self._closed = False
+        self._frozen = False
+        self._memo = {}
         self.node = node
         self.parent = parent
         self.children = []
@@ -89,6 +115,17 @@ class Scope(object):
         self.remapped_symbols = {}
 
     @property
+    def frozen(self):
+        """
+        Whether this scope and all of its parents are closed.
+        """
+
+        if not self._frozen:
+            self._frozen = self._closed and (
+                self.parent is None or self.parent.frozen)
+        return self._frozen
+
+    @frozen_property
     def declared_symbols(self):
         """
         Return all local symbols here, and also of the parents
@@ -97,18 +134,24 @@ class Scope(object):
         return self.local_declared_symbols | (
             self.parent.declared_symbols if self.parent else set())
 
-    @property
+    @frozen_property
     def global_symbols(self):
         """
         These are symbols that have been referenced, but not declared
         within this scope or any parent scopes.
         """
 
+        if self.parent is not None and self.frozen:
+            # all the non local symbols were referenced in the parent
+            # when this scope was closed, so the global symbols of the
+            # parent may be used instead of all the declared symbols.
+            return self.non_local_symbols & self.parent.global_symbols
+
         declared_symbols = self.declared_symbols
         return set(
             s for s in self.referenced_symbols if s not in declared_symbols)
 
-    @property
+    @frozen_property
     def global_symbols_in_children(self):
         """
         This is based on all children referenced symbols that have not
@@ -118,6 +161,13 @@ class Scope(object):
         remapped symbol values.
         """
 
+        if self.frozen and all(child.frozen for child in self.children):
+            # the global symbols of the children are derived from the
+            # global symbols of their parent, so the ones for the nested
+            # children are already included.
+            return set().union(*(
+                child.global_symbols for child in self.children))
+
         result = set()
         for child in self.children:
             result |= (
@@ -125,7 +175,7 @@ class Scope(object):
                 child.global_symbols_in_children)
         return result
 
-    @property
+    @frozen_property
     def non_local_symbols(self):
         """
         Non local symbols are all referenced symbols that are not
@@ -199,14 +249,18 @@ class Scope(object):
         # may not be applicable this or any child scope.  So for clarity
         # and purity of references made, this somewhat more involved way
         # is done instead.
+        # The global symbols are skipped as they cannot be remapped.
+        global_symbols = self.global_symbols
         remapped_parents_symbols = {
-            self.resolve(v) for v in self.non_local_symbols}
+            self.resolve(v) for v in self.non_local_symbols
+            if v not in global_symbols
+        }
 
         return (
             # block implicit children globals.
             self.global_symbols_in_children |
             # also not any global symbols
-            self.global_symbols |
+            global_symbols |
             # also all remapped parent symbols referenced here
             remapped_parents_symbols
         )
@@ -220,10 +274,11 @@ class Scope(object):
 
         if not children_only:
             replacement = name_generator(skip=(self._reserved_symbols))
-            for symbol, c in reversed(sorted(
-                    self.referenced_symbols.items(), key=itemgetter(1, 0))):
-                if symbol not in self.local_declared_symbols:
-                    continue
+            local_declared_symbols = self.local_declared_symbols
+            for symbol, c in reversed(sorted((
+                    item for item in self.referenced_symbols.items()
+                    if item[0] in local_declared_symbols
+                    ), key=itemgetter(1, 0))):
                 self.remapped_symbols[symbol] = next(replacement)
 
         for child in self.children:
@@ -278,6 +333,8 @@ class CatchScope(Scope):
         self.catch_symbol_usage = 0
         self.remapped_symbols = {}
         self._closed = False
+        self._frozen = False
+        self._memo = {}
 
     @property
     def referenced_symbols(self):
@@ -293,7 +350,7 @@ class CatchScope(Scope):
         # like above, only provide symbols used locally here.
         return self.parent.local_declared_symbols | {self.catch_symbol}
 
-    @property
+    @frozen_property
     def declared_symbols(self):
         """
         Return all local symbols here, and also of the parents
@@ -301,7 +358,7 @@ class CatchScope(Scope):
 
         return {self.catch_symbol} | self.parent.declared_symbols
 
-    @property
+    @frozen_property
     def non_local_symbols(self):
         """
         For the catch scope, in order for the reserved symbols check to
@@ -499,6 +556,9 @@ class Obfuscator(object):
             token_handler=None,
             layout_handlers=layout_handlers,
             deferrable_handlers=deferrable_handlers,
+            # share the optimized definitions with the provided
+            # dispatcher, as they are derived from the same definitions.
+            cache=getattr(dispatcher, 'cache', None),
         )
         return list(walk(local_dispatcher, node))
 
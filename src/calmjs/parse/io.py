@@ -3,15 +3,19 @@
 Generic io functions for use with parsers.
 """
 
+import codecs
+from functools import partial
 from itertools import chain
+from multiprocessing import Pool
 from collections.abc import Iterable
 from calmjs.parse.asttypes import Node
 from calmjs.parse import sourcemap
 from calmjs.parse.exceptions import ECMASyntaxError
 from calmjs.parse.utils import repr_compat
+from calmjs.parse.utils import str
 
 
-def read(parser, stream):
+def read(parser, stream, cache=None):
     """
     Return an AST from the input ES5 stream.
 
@@ -25,6 +29,11 @@ def read(parser, stream):
 
         If a callable was provided, the 'close' method on its return
         value will be called to close the stream.
+    cache
+        An optional cache instance (e.g. calmjs.parse.cache.DiskCache);
+        if provided, the AST will be retrieved from there if the same
+        text was previously parsed by the same parser, otherwise the
+        resulting AST will be stored there.
     """
 
     source = stream() if callable(stream) else stream
@@ -32,7 +41,14 @@ def read(parser, stream):
         text = source.read()
         stream_name = getattr(source, 'name', None)
         try:
-            result = parser(text)
+            if cache is None:
+                result = parser(text)
+            else:
+                key = cache.key(parser, text)
+                result = cache.get(key)
+                if result is None:
+                    result = parser(text)
+                    cache.set(key, result)
         except ECMASyntaxError as e:
             error_name = repr_compat(stream_name or source)
             raise type(e)('%s in %s' % (str(e), error_name))
@@ -44,6 +60,89 @@ def read(parser, stream):
     return result
 
 
+def _read_path(parser, encoding, path):
+    # the units of work for parse_many; these must be defined at the
+    # module level such that they may be sent to the worker processes.
+    try:
+        return read(parser, partial(codecs.open, path, encoding=encoding))
+    except ECMASyntaxError as e:
+        return e
+
+
+def _read_text(parser, text, stream_name, error_name):
+    try:
+        result = parser(text)
+    except ECMASyntaxError as e:
+        return type(e)('%s in %s' % (str(e), error_name))
+    result.sourcepath = stream_name
+    return result
+
+
+def _run_job(job):
+    f, args = job
+    return f(*args)
+
+
+def parse_many(parser, paths_or_streams, workers=None, encoding='utf8'):
+    """
+    Return a list of ASTs from the provided collection of paths and/or
+    streams, with the parsing done in parallel through a pool of worker
+    processes.  The order of the results is the same as the inputs.
+
+    Any syntax error encountered will not abort the processing of the
+    remaining inputs; instead the ECMASyntaxError instance (with the
+    same message that the read function would have raised) will be
+    placed at the position of the result for the failed input.
+
+    The resulting ASTs will have their sourcepath assigned in the same
+    manner as the read function.
+
+    Arguments
+
+    parser
+        A parser callable; as it will be sent to the worker processes,
+        it must be picklable (e.g. a function defined at the module
+        level, such as the ``parse`` function from the es5 parser
+        module).
+    paths_or_streams
+        An iterable of paths to files, stream objects, or callables that
+        produce a stream object, which are handled in the same manner as
+        the read function.  Paths are opened and read by the workers,
+        while streams are read by the calling process.
+    workers
+        The number of worker processes to use.  Defaults to None, which
+        will use the number of CPUs available.  If set to 1, all inputs
+        will be parsed within the calling process.
+    encoding
+        The encoding used to open the paths.  Defaults to utf8.
+    """
+
+    jobs = []
+    for item in paths_or_streams:
+        if isinstance(item, str):
+            jobs.append((_read_path, (parser, encoding, item)))
+            continue
+        source = item() if callable(item) else item
+        try:
+            text = source.read()
+            stream_name = getattr(source, 'name', None)
+        finally:
+            if callable(item):
+                source.close()
+        jobs.append((_read_text, (
+            parser, text, stream_name, repr_compat(stream_name or source))))
+
+    if workers == 1 or len(jobs) < 2:
+        return [_run_job(job) for job in jobs]
+
+    pool = Pool(workers)
+    try:
+        return pool.map(_run_job, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def write(
         unparser, nodes, output_stream, sourcemap_stream=None,
         sourcemap_normalize_mappings=True,
@@ -28,8 +28,14 @@ __author__ = 'Ruslan Spivak <ruslan.spivak@gmail.com>'
 
 import re
 import ply.lex
+from bisect import bisect_right
+from bisect import insort
 
 from calmjs.parse.lexers.tokens import AutoLexToken
+from calmjs.parse.lexers.tokens import PositionTable
+from calmjs.parse.lexers.tokens import TokenArrays
+from calmjs.parse.lexers.tokenizer import RegexTokenizer
+from calmjs.parse.lexers.tokenizer import get_rules
 from calmjs.parse.utils import repr_compat
 from calmjs.parse.exceptions import (
     ECMASyntaxError,
@@ -80,6 +86,19 @@ COMMENTS = frozenset([
 
 PATT_LINE_TERMINATOR_SEQUENCE = re.compile(
     r'(\n|\r(?!\n)|\u2028|\u2029|\r\n)', flags=re.S)
+# The line terminators outside of the tokens, as the line and paragraph
+# separators are ignored as whitespace by the lexer, such that they are
+# only treated as line terminators within the tokens that may contain
+# them (see the SEPARATOR_TOKENS).
+PATT_LINE_TERMINATOR = re.compile(r'\r\n|\r|\n')
+PATT_LINE_SEPARATOR = re.compile(r'[\u2028\u2029]')
+SEPARATOR_TOKENS = frozenset(['STRING', 'BLOCK_COMMENT'])
+# The number of characters to be scanned for the line terminators at a
+# time.
+LINE_SCAN_SIZE = 65536
+# The division or the regex that may follow the spaces, which require
+# the disambiguation by the previous tokens.
+PATT_DIV_OR_REGEX = re.compile(r'[ \t]*/[^/*]')
 PATT_LINE_CONTINUATION = re.compile(
     r'\\(\n|\r(?!\n)|\u2028|\u2029|\r\n)', flags=re.S)
 
@@ -122,7 +141,8 @@ def broken_string_token_handler(lexer, token):
     # as this will be the actual token that "failed"
     token.value = match.group()
     # calculate colno for current token colno before...
-    colno = lexer._get_colno(token)
+    lexer._locate(token)
+    colno = token.colno
     # updating the newline indexes for the error reporting for raw
     # lexpos
     lexer._update_newline_idx(token)
@@ -136,7 +156,7 @@ def broken_string_token_handler(lexer, token):
         ).group()
         raise ECMASyntaxError(
             "Invalid %s escape sequence '%s' at %s:%s" % (
-                type_, seq, lexer.lineno,
+                type_, seq, lexer.lookup_lineno(position),
                 lexer._get_colno_lexpos(position)
             )
         )
@@ -188,8 +208,17 @@ class Lexer(object):
     For more information see:
     http://www.ecma-international.org/publications/files/ECMA-ST/ECMA-262.pdf
     """
-    def __init__(self, with_comments=False, yield_comments=False):
+    def __init__(
+            self, with_comments=False, yield_comments=False, backend='ply',
+            track_positions=True):
         self.lexer = None
+        # the tokenizer that produce the raw tokens, either 'ply' for
+        # the lexer built by ply from the rules, or 'regex' for the
+        # RegexTokenizer.
+        self.backend = backend
+        # whether the positions of the tokens are to be recorded for the
+        # nodes produced by the parser.
+        self.track_positions = track_positions
         self.prev_token = None
         # valid_prev_token is for syntax error hint, and also for
         # tracking real tokens
@@ -199,6 +228,12 @@ class Lexer(object):
         self.next_tokens = []
         self.token_stack = [[None, []]]
         self.newline_idx = [0]
+        # the offset up to which the newline_idx had been populated.
+        self.newline_scanned = 0
+        # the positions of the tokens for the nodes produced from the
+        # input, to be populated by the parser.
+        self.positions = (
+            PositionTable(self.newline_idx) if track_positions else None)
         self.error_token_handlers = [
             broken_string_token_handler,
         ]
@@ -213,7 +248,7 @@ class Lexer(object):
 
     @property
     def lineno(self):
-        return self.lexer.lineno if self.lexer else 0
+        return self.lookup_lineno(self.lexer.lexpos) if self.lexer else 0
 
     @property
     def lexpos(self):
@@ -221,28 +256,133 @@ class Lexer(object):
 
     @property
     def last_newline_lexpos(self):
-        return self.newline_idx[-1]
+        return self.newline_idx[self.lineno - 1]
 
     def build(self, **kwargs):
-        """Build the lexer."""
-        self.lexer = ply.lex.lex(object=self, **kwargs)
+        """
+        Build the lexer.  The keyword arguments are passed to ply, and
+        are unused by the regex backend.
+        """
 
-    def input(self, text):
+        if self.backend == 'ply':
+            self.lexer = ply.lex.lex(object=self, **kwargs)
+        elif self.backend == 'regex':
+            self.lexer = RegexTokenizer(self)
+        else:
+            raise ValueError("unsupported backend '%s'" % self.backend)
+
+    def input(self, text, lexpos=0, lineno=1, colno=1):
+        """
+        Provide the text for lexing.  The optional lexpos, lineno and
+        colno arguments specify the position within the text where the
+        lexing should start from, such that the tokens produced will
+        have the positions for the complete text.
+        """
+
+        # reset all the states tracked for the previous input, such that
+        # a given instance may be reused for lexing multiple inputs.
+        self.prev_token = None
+        self.valid_prev_token = None
+        self.cur_token = None
+        self.cur_token_real = None
+        self.next_tokens = []
+        self.token_stack = [[None, []]]
+        # only the starting index of the starting line is required.
+        self.newline_idx = [0] * (lineno - 1) + [lexpos - colno + 1]
+        self.newline_scanned = lexpos
+        self.positions = (
+            PositionTable(self.newline_idx) if self.track_positions else None)
+        self.hidden_tokens = []
+        self.lexer.lineno = lineno
+        self.lexer.begin('INITIAL')
         self.lexer.input(text)
+        self.lexer.lexpos = lexpos
+
+    def tokenize_arrays(self, text):
+        """
+        Lex the complete text, and return the tokens that iterating
+        through this lexer would have produced as a TokenArrays, which
+        only keeps the type codes and the positions of the tokens.
+        """
+
+        rules = get_rules(self)
+        arrays = TokenArrays(
+            text, self.tokens, (rules['INITIAL'][0], rules['regex'][0]))
+        codes = arrays.codes
+        types = arrays.types.append
+        offsets = arrays.offsets.append
+        lines = arrays.lines.append
+        columns = arrays.columns.append
+        token = self.token
+        self.input(text)
+        while True:
+            tok = token()
+            if tok is None:
+                return arrays
+            types(codes[tok.type])
+            offsets(tok.lexpos)
+            lines(tok.lineno)
+            columns(tok.colno)
+
+    def _scan_newlines(self, lexpos):
+        """
+        Populate the newline_idx with the starting offsets of the lines
+        beyond what had been scanned, to at least the provided lexpos.
+        """
+
+        text = self.lexer.lexdata or ''
+        start = self.newline_scanned
+        end = max(lexpos, start + LINE_SCAN_SIZE)
+        # avoid splitting a CR LF sequence.
+        if text[end - 1:end] == '\r':
+            end += 1
+        self.newline_idx.extend(
+            m.end() for m in PATT_LINE_TERMINATOR.finditer(text, start, end))
+        self.newline_scanned = end
 
     def _update_newline_idx(self, token):
+        # only the line and paragraph separators within the token value
+        # need to be added, as the rest are found by _scan_newlines.
+        for m in PATT_LINE_SEPARATOR.finditer(token.value):
+            lexpos = token.lexpos + m.end()
+            idx = bisect_right(self.newline_idx, lexpos)
+            if self.newline_idx[idx - 1] != lexpos:
+                insort(self.newline_idx, lexpos)
+
+    def lookup_lineno(self, lexpos):
+        """
+        Look up the lineno for the lexpos.
+        """
+
+        if lexpos >= self.newline_scanned:
+            self._scan_newlines(lexpos)
+        return bisect_right(self.newline_idx, lexpos)
+
+    def _locate(self, token):
+        """
+        Assign the lineno and colno for the token from its lexpos.
+        """
+
         lexpos = token.lexpos
-        fragments = PATT_LINE_TERMINATOR_SEQUENCE.split(token.value)
-        for fragment, newline in zip(*[iter(fragments)] * 2):
-            lexpos += len(fragment + newline)
-            self.lexer.lineno += 1
-            self.newline_idx.append(lexpos)
+        if lexpos >= self.newline_scanned:
+            self._scan_newlines(lexpos)
+        newline_idx = self.newline_idx
+        token.lineno = lineno = bisect_right(newline_idx, lexpos)
+        token.colno = lexpos - newline_idx[lineno - 1] + 1
 
     def get_lexer_token(self):
         token = self.lexer.token()
         if token:
-            token.colno = self._get_colno(token)
-            self._update_newline_idx(token)
+            # inlined _locate
+            lexpos = token.lexpos
+            if lexpos >= self.newline_scanned:
+                self._scan_newlines(lexpos)
+            newline_idx = self.newline_idx
+            token.lineno = lineno = bisect_right(newline_idx, lexpos)
+            token.colno = lexpos - newline_idx[lineno - 1] + 1
+            if token.type in SEPARATOR_TOKENS and (
+                    '\u2028' in token.value or '\u2029' in token.value):
+                self._update_newline_idx(token)
         return token
 
     def backtracked_token(self, pos=1):
@@ -269,25 +409,10 @@ class Lexer(object):
 
         lexer = self.lexer
         while True:
-            pos = lexer.lexpos
-            try:
-                char = lexer.lexdata[pos]
-                while char in ' \t':
-                    pos += 1
-                    char = lexer.lexdata[pos]
-                next_char = lexer.lexdata[pos + 1]
-            except IndexError:
+            if not PATT_DIV_OR_REGEX.match(lexer.lexdata, lexer.lexpos):
                 tok = self._get_update_token()
-                if tok is not None and tok.type == 'LINE_TERMINATOR':
-                    # should this also be implemented?
-                    # if not self.drop_lineterm:
-                    #     self.hidden_tokens.append(tok)
-                    continue
-                else:
+                if tok is None:
                     return tok
-
-            if char != '/' or (char == '/' and next_char in ('/', '*')):
-                tok = self._get_update_token()
                 if tok.type in DIVISION_SYNTAX_MARKERS:
                     if tok.type in COMMENTS:
                         if self.yield_comments:
@@ -401,7 +526,7 @@ class Lexer(object):
         return self._get_colno_lexpos(token.lexpos)
 
     def _get_colno_lexpos(self, lexpos):
-        return lexpos - self.last_newline_lexpos + 1
+        return lexpos - self.newline_idx[self.lookup_lineno(lexpos) - 1] + 1
 
     def lookup_colno(self, lineno, lexpos):
         """
@@ -527,6 +652,7 @@ class Lexer(object):
     t_regex_ignore = ' \t'
 
     def t_regex_error(self, token):
+        self._locate(token)
         raise ECMARegexSyntaxError(
             "Error parsing regular expression '%s' at %s:%s" % (
                 token.value, token.lineno, self._get_colno(token))
@@ -679,6 +805,7 @@ class Lexer(object):
         return token
 
     def t_error(self, token):
+        self._locate(token)
         for handler in self.error_token_handlers:
             handler(self, token)
 
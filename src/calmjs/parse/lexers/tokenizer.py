@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+A tokenizer for the rules of the ES5 lexer, built as a single master
+regex in place of the ply lexer.
+"""
+
+from __future__ import unicode_literals
+
+import re
+
+from ply.lex import LexError
+
+from calmjs.parse.lexers.tokens import LexToken
+
+# The token types with patterns that are not plain literals, along with
+# the name of the attribute on the lexer that provide them, in the order
+# that they are to be tried, which is also the order that ply would try
+# them, such that the same tokens will be produced.  The rest of the
+# token types with a t_ prefixed pattern are the literal punctuators,
+# which are matched as a single group with the longest ones tried first.
+PATTERN_RULES = (
+    ('STRING', 'string'),
+    ('GETPROP', 'getprop'),
+    ('SETPROP', 'setprop'),
+    ('ID', 'identifier'),
+    ('NUMBER', 't_NUMBER'),
+    ('LINE_TERMINATOR', 't_LINE_TERMINATOR'),
+    ('BLOCK_COMMENT', 't_BLOCK_COMMENT'),
+    ('LINE_COMMENT', 't_LINE_COMMENT'),
+)
+PUNCTUATOR = 'PUNCTUATOR'
+
+PATT_ESCAPED = re.compile(r'\\(.)')
+
+# the compiled rules for each of the lexer types.
+_rules = {}
+
+
+def ignore_pattern(chars):
+    return '[%s]*' % ''.join(re.escape(c) for c in chars)
+
+
+def build_rules(lexer):
+    """
+    Build the compiled patterns and the lookups of the token types for
+    the states of the provided lexer, which must follow the ES5 lexer.
+
+    The result is a dict from the name of the state to a tuple of the
+    pattern for the tokens, the pattern for the ignored characters, the
+    mapping for the types of the punctuators, the mapping for the types
+    of the identifiers, and the name of the error method on the lexer.
+    """
+
+    names = set(name for name, attr in PATTERN_RULES)
+    punctuators = {}
+    for name in lexer.tokens:
+        if name in names:
+            continue
+        pattern = getattr(lexer, 't_' + name, None)
+        if pattern is None or callable(pattern):
+            continue
+        punctuators[PATT_ESCAPED.sub(r'\1', pattern)] = name
+
+    groups = ['(?P<%s>%s)' % (name, getattr(lexer, attr)) for name, attr in (
+        PATTERN_RULES)]
+    groups.append('(?P<%s>%s)' % (PUNCTUATOR, '|'.join(
+        re.escape(value) for value in sorted(
+            punctuators, key=len, reverse=True))))
+    ignore = ignore_pattern(lexer.t_ignore)
+    regex_ignore = ignore_pattern(lexer.t_regex_ignore)
+
+    return {
+        'INITIAL': (
+            re.compile(ignore + '(?:' + '|'.join(groups) + ')', re.VERBOSE),
+            re.compile(ignore),
+            punctuators,
+            lexer.keywords_dict,
+            't_error',
+        ),
+        'regex': (
+            re.compile(regex_ignore + '(?P<REGEX>%s)' % (
+                lexer.t_regex_REGEX), re.VERBOSE),
+            re.compile(regex_ignore),
+            {},
+            {},
+            't_regex_error',
+        ),
+    }
+
+
+def get_rules(lexer):
+    rules = _rules.get(type(lexer))
+    if rules is None:
+        rules = _rules[type(lexer)] = build_rules(lexer)
+    return rules
+
+
+class RegexTokenizer(object):
+    """
+    Produce the tokens for the rules defined on the ES5 lexer through a
+    single master regex for each of the states, with the token types
+    derived from the name of the matched group, and the types of the
+    punctuators and keywords looked up from the matched values.
+
+    This provides the subset of the interface of the ply lexer that is
+    used by the ES5 lexer, such that it may be used in its place.
+    """
+
+    def __init__(self, lexer):
+        """
+        The lexer argument is the ES5 lexer instance that provides the
+        rules and the error methods.
+        """
+
+        self.rules = get_rules(lexer)
+        self.errorf = {
+            state: getattr(lexer, rules[4])
+            for state, rules in self.rules.items()
+        }
+        self.lexdata = None
+        self.lexpos = 0
+        self.lexlen = 0
+        self.lineno = 1
+        self.begin('INITIAL')
+
+    def input(self, text):
+        self.lexdata = text
+        self.lexpos = 0
+        self.lexlen = len(text)
+
+    def begin(self, state):
+        self.lexstate = state
+        (self.pattern, self.ignore, self.punctuators, self.keywords,
+            _) = self.rules[state]
+
+    def skip(self, n):
+        self.lexpos += n
+
+    def token(self):
+        lexdata = self.lexdata
+        match = self.pattern.match(lexdata, self.lexpos)
+        if match is None:
+            return self._error()
+
+        type_ = match.lastgroup
+        value = match.group(type_)
+        if type_ == 'ID':
+            type_ = self.keywords.get(value, 'ID')
+        elif type_ == PUNCTUATOR:
+            type_ = self.punctuators[value]
+
+        token = LexToken()
+        token.type = type_
+        token.value = value
+        token.lineno = self.lineno
+        # the match includes the ignored characters before the token.
+        self.lexpos = lexpos = match.end()
+        token.lexpos = lexpos - len(value)
+        return token
+
+    def _error(self):
+        lexpos = self.lexpos
+        if lexpos < self.lexlen:
+            lexpos = self.ignore.match(self.lexdata, lexpos).end()
+        if lexpos >= self.lexlen:
+            # as done by ply, the position is advanced past the end of
+            # the input on every request made once it is exhausted.
+            self.lexpos = lexpos + 1
+            return None
+
+        self.lexpos = lexpos
+
+        # as done by ply.
+        token = LexToken()
+        token.value = self.lexdata[lexpos:]
+        token.lineno = self.lineno
+        token.type = 'error'
+        token.lexpos = lexpos
+        self.errorf[self.lexstate](token)
+        if self.lexpos == lexpos:
+            raise LexError(
+                'Scanning error. Illegal character %r' % (
+                    self.lexdata[lexpos]), self.lexdata[lexpos:])
+        return self.token()
@@ -1,12 +1,202 @@
 # -*- coding: utf-8 -*-
 """
-Specialized lexer token subclasses.
+The lexer token types, and the storages for the tokens and positions.
 """
 
-from ply.lex import LexToken
+import re
+from array import array
+from bisect import bisect_right
+
+import ply.lex
+
+
+class LexToken(object):
+    """
+    A slotted token type with the same interface as ply.lex.LexToken,
+    which also have slots for the attributes assigned to the tokens by
+    the lexer and the parser.
+    """
+
+    __slots__ = (
+        'type', 'value', 'lineno', 'lexpos', 'colno', 'hidden_tokens',
+        # the positions of the function body skipped by the lazy parser.
+        'lazy_body',
+    )
+
+    # provided such that ply.yacc will not assign the lexer to the token
+    # that failed to be parsed, as the error handling do not need it.
+    lexer = None
+
+    def __str__(self):
+        return 'LexToken(%s,%r,%d,%d)' % (
+            self.type, self.value, self.lineno, self.lexpos)
+
+    def __repr__(self):
+        return str(self)
 
 
 class AutoLexToken(LexToken):
     """
     Special type for automatically generated tokens.
     """
+
+    __slots__ = ()
+
+
+# The types of the tokens that may be produced by the lexers, as the
+# lexer built by ply will produce its own LexToken.
+LEX_TOKEN_TYPES = (ply.lex.LexToken, LexToken)
+
+
+class PositionTable(object):
+    """
+    Packed storage of the positions of the tokens recorded for the nodes
+    produced from a single input provided to a lexer, shared by all of
+    those nodes.
+
+    Only the offsets (lexpos) of the tokens are stored; their line and
+    column numbers are derived from the offsets of the starting positions
+    of the lines tracked by the lexer, when they are requested.
+    """
+
+    def __init__(self, line_starts):
+        """
+        The line_starts argument is the list of the offsets where each
+        line starts; it may be appended to as more of the input is
+        lexed.
+        """
+
+        self.line_starts = line_starts
+        # the tokens and their offsets, along with the range of indexes
+        # to those for the node at index n being from starts[n] up to
+        # starts[n + 1].
+        self.tokens = []
+        self.offsets = array('l')
+        self.starts = array('l', [0])
+        # for the deduplication of the token strings.
+        self.names = {}
+
+    def add(self, token, lexpos, lineno):
+        """
+        Add the token at lexpos for the node currently being recorded.
+        The positions of the tokens without a lineno (e.g. the automatic
+        semicolon at the end of the input) are stored negated, as they
+        cannot be derived.
+        """
+
+        self.tokens.append(self.names.setdefault(token, token))
+        self.offsets.append(lexpos if lineno else ~lexpos)
+
+    def close(self):
+        """
+        Finish recording the tokens for the current node, and return the
+        index for the node.
+        """
+
+        self.starts.append(len(self.tokens))
+        return len(self.starts) - 2
+
+    def shift(self, index, delta):
+        """
+        Shift the offsets of the tokens for the node at index and all the
+        nodes recorded after it by delta, for when the nodes are reused
+        for a source with the preceding text modified.  The tokens
+        without a lineno are left as is.
+        """
+
+        start = self.starts[index]
+        self.offsets[start:] = array('l', [
+            offset + delta if offset >= 0 else offset
+            for offset in self.offsets[start:]
+        ])
+
+    def position(self, i):
+        lexpos = self.offsets[i]
+        if lexpos < 0:
+            return (~lexpos, 0, 0)
+        lineno = bisect_right(self.line_starts, lexpos)
+        return (lexpos, lineno, lexpos - self.line_starts[lineno - 1] + 1)
+
+    def getpos(self, index, token, idx):
+        """
+        Return the position of the idx-th occurrence of the token for the
+        node at index.
+        """
+
+        tokens = self.tokens
+        for i in range(self.starts[index], self.starts[index + 1]):
+            if tokens[i] == token:
+                if not idx:
+                    return self.position(i)
+                idx -= 1
+        return (0, 0, 0)
+
+    def token_map(self, index):
+        """
+        Return the positions for the node at index as a dict of tokens to
+        the lists of their positions.
+        """
+
+        result = {}
+        for i in range(self.starts[index], self.starts[index + 1]):
+            result.setdefault(self.tokens[i], []).append(self.position(i))
+        return result
+
+
+class TokenArrays(object):
+    """
+    The tokens lexed from a complete source, stored as parallel arrays
+    of their type codes, offsets (lexpos), line and column numbers,
+    rather than as token objects.
+
+    The values of the tokens are not stored; they are recovered from
+    the source upon request by matching the pattern of the tokenizer at
+    the offset of the token, such that only the numbers are kept for
+    every token.
+    """
+
+    def __init__(self, source, names, patterns):
+        """
+        The arguments are the source that was lexed, the sequence of the
+        names of the token types with the index of the name being used
+        as its code, and the pair of compiled patterns for the tokens in
+        the initial and the regex states of the tokenizer.
+        """
+
+        self.source = source
+        self.names = tuple(names)
+        self.codes = dict((name, code) for code, name in enumerate(names))
+        self.patterns = patterns
+        self.types = array('B')
+        self.offsets = array('l')
+        self.lines = array('l')
+        self.columns = array('l')
+
+    def __len__(self):
+        return len(self.types)
+
+    def type(self, i):
+        return self.names[self.types[i]]
+
+    def value(self, i):
+        type_ = self.names[self.types[i]]
+        if type_ == 'AUTOSEMI':
+            return ';'
+        offset = self.offsets[i]
+        match = self.patterns[type_ == 'REGEX'].match(self.source, offset)
+        return self.source[offset:match.end()]
+
+    def indexes(self, *names):
+        """
+        Return the list of the indexes of the tokens of any of the types
+        with the provided names, found through a single regex scan over
+        the type codes.
+        """
+
+        pattern = re.compile(('[%s]' % ''.join(
+            '\\x%02x' % self.codes[name] for name in names
+        )).encode('ascii'))
+        codes = self.types
+        data = codes.tobytes() if hasattr(codes, 'tobytes') else (
+            codes.tostring())
+        return [match.start() for match in pattern.finditer(data)]
@@ -24,29 +24,250 @@
 
 __author__ = 'Ruslan Spivak <ruslan.spivak@gmail.com>'
 
+from bisect import bisect_left
+from bisect import bisect_right
+from copy import copy
 from functools import partial
+from threading import Event
+from threading import Thread
 
 import ply.yacc
 
+from calmjs.parse.asttypes import FuncBase
+from calmjs.parse.asttypes import Label
 from calmjs.parse.exceptions import ECMASyntaxError
 from calmjs.parse.exceptions import ProductionError
 from calmjs.parse.lexers.tokens import AutoLexToken
+from calmjs.parse.lexers.tokens import LexToken
+from calmjs.parse.lexers.tokens import PositionTable
 from calmjs.parse.lexers.es5 import Lexer
 from calmjs.parse.factory import AstTypesFactory
 from calmjs.parse.unparsers.es5 import pretty_print
 from calmjs.parse.walkers import ReprWalker
 from calmjs.parse.utils import generate_tab_names
+from calmjs.parse.utils import ParserPool
 from calmjs.parse.utils import format_lex_token
 from calmjs.parse.utils import str
 from calmjs.parse.io import read as io_read
+from calmjs.parse.io import parse_many as io_parse_many
 
-asttypes = AstTypesFactory(pretty_print, ReprWalker())
+try:  # pragma: no cover
+    from queue import Queue
+except ImportError:  # pragma: no cover
+    from Queue import Queue
+
+asttypes = AstTypesFactory(
+    pretty_print, ReprWalker(), name=__name__ + '.asttypes')
 
 # The default values for the `Parser` constructor, passed on to ply; they must
 # be strings
 lextab, yacctab = generate_tab_names(__name__)
 
 
+class _Cancelled(Exception):
+    """
+    Raised inside the parsing thread of iterparse to abort the parsing
+    once the consumer is no longer interested in the results.
+    """
+
+
+# marks the end of the results produced by the parsing thread.
+_finished = object()
+
+# the tokens that may precede an opening brace for a block, rather than
+# the one for an object literal.
+BLOCK_PRECEDING_TOKENS = frozenset([
+    'RPAREN', 'ELSE', 'DO', 'TRY', 'FINALLY', 'SEMI', 'AUTOSEMI',
+    'LBRACE', 'RBRACE',
+])
+
+
+class _FunctionExprPosition(object):
+    """
+    Stands in for the FuncExpr nodes during validation, keeping just
+    the position of the opening parenthesis of the parameters for the
+    error message raised for function statements without a name.
+    """
+
+    def __init__(self, lineno, colno):
+        self.lineno = lineno
+        self.colno = colno
+
+
+def _validate_noop(p):
+    pass
+
+
+def _validate_passthrough(p):
+    # the single symbol productions pass their value on, such that the
+    # stand-ins for function expressions will reach the statement.
+    p[0] = p[1]
+
+
+def _function_expr_lparen(p):
+    # the opening parenthesis of the parameters for the productions of
+    # the function expressions.
+    return p.slice[2] if p.slice[2].type == 'LPAREN' else p.slice[3]
+
+
+def _validate_function_expr(p):
+    token = _function_expr_lparen(p)
+    p[0] = _FunctionExprPosition(token.lineno, token.colno)
+
+
+def _validate_expr_statement(p):
+    # the only check done by the actions, see Parser.p_expr_statement
+    if isinstance(p[1], _FunctionExprPosition):
+        raise ProductionError(ECMASyntaxError(
+            'Function statement requires a name at %s:%s' % (
+                p[1].lineno, p[1].colno)))
+
+
+def _lazy_elements(node):
+    # the callable that produces the elements for a function that was
+    # skipped by a lazy parser, looked up without invoking it.
+    return getattr(node, '_lazy_elements', None)
+
+
+def _iter_nodes(node):
+    """
+    Yield the node and every node nested within, including the comments,
+    without parsing the bodies of the functions skipped by a lazy parser.
+    """
+
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.comments is not None:
+            stack.append(node.comments)
+        if _lazy_elements(node) is not None:
+            children = [node.identifier] + node.parameters
+        else:
+            children = node.children()
+        stack.extend(child for child in children if child is not None)
+
+
+def _leading_comments(node, lexpos):
+    """
+    Return the comments that precede the token at lexpos, which is the
+    first token of the node.
+    """
+
+    for child in _iter_nodes(node):
+        comments = child.comments
+        if comments is not None and comments.lexpos < lexpos:
+            return comments.children()
+    return []
+
+
+def _element_start(node):
+    """
+    Return the node that has the position of the first token of the top
+    level source element.
+    """
+
+    # the position of a label is the one for the colon that follows the
+    # identifier that starts it.
+    while isinstance(node, Label):
+        node = node.identifier
+    return node
+
+
+def _shift_positions(nodes, text, delta, lineno, line_delta, col_delta):
+    """
+    Shift the positions of the nodes and every node nested within, for
+    the text where the modification that precedes all of them changed
+    the offsets by delta and the lines by line_delta, with the columns
+    on the line that ended the modification (the lineno before it was
+    made) changed by col_delta.
+
+    The position tables that the nodes were recorded in must be the
+    ones where the nodes are recorded after the rest of the nodes that
+    remain in use, i.e. the nodes must be the last top level source
+    elements of the program.  Return the tables, which must be provided
+    with the starting offsets of the lines for text.
+    """
+
+    def shift(pos):
+        lexpos, line, col = pos
+        if not line:
+            return pos
+        return (
+            lexpos + delta, line + line_delta,
+            col + col_delta if line == lineno and col else col)
+
+    # the index of the earliest node recorded for each of the tables.
+    tables = {}
+    stack = list(nodes)
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        node = pop()
+        if node is None:
+            continue
+        line = node.lineno
+        if node.endpos is not None:
+            node.endpos += delta
+        if line:
+            node.lexpos += delta
+            node.lineno = line + line_delta
+            if line == lineno and node.colno:
+                node.colno += col_delta
+
+        positions = getattr(node, '_positions', None)
+        if isinstance(positions, PositionTable):
+            index = node._position_index
+            if index < tables.get(positions, index + 1):
+                tables[positions] = index
+        elif positions:
+            node._positions = token_map = {}
+            for token, values in positions.items():
+                if not isinstance(values[0], tuple):
+                    token_map[token] = sum((shift(values[i:i + 3]) for i in (
+                        range(0, len(values), 3))), ())
+                else:
+                    token_map[token] = [shift(value) for value in values]
+
+        if node.comments is not None:
+            stack.append(node.comments)
+        if isinstance(node, FuncBase) and _lazy_elements(node) is not None:
+            lazy_elements = node._lazy_elements
+            kwargs, _, lexpos, line, col, end = lazy_elements.args
+            node._lazy_elements = partial(lazy_elements.func, *(
+                (kwargs, text) + shift((lexpos, line, col)) + (end + delta,)))
+            stack.append(node.identifier)
+            extend(node.parameters)
+        else:
+            extend(node.children())
+
+    for table, index in tables.items():
+        table.shift(index, delta)
+    return list(tables)
+
+
+def build_validator(parser):
+    """
+    Return a copy of the ply parser with the actions for every one of
+    its productions replaced with ones that construct nothing.
+    """
+
+    validator = copy(parser)
+    validator.productions = productions = []
+    for production in parser.productions:
+        production = copy(production)
+        if production.name == 'function_expr':
+            production.callable = _validate_function_expr
+        elif production.name == 'expr_statement':
+            production.callable = _validate_expr_statement
+        elif production.len == 1:
+            production.callable = _validate_passthrough
+        else:
+            production.callable = _validate_noop
+        productions.append(production)
+    return validator
+
+
 class Parser(object):
     """JavaScript parser(ECMA-262 5th edition grammar).
 
@@ -61,7 +282,8 @@ class Parser(object):
 
     def __init__(self, lex_optimize=True, lextab=lextab,
                  yacc_optimize=True, yacctab=yacctab, yacc_debug=False,
-                 yacc_tracking=True, with_comments=False, asttypes=asttypes):
+                 yacc_tracking=True, with_comments=False, asttypes=asttypes,
+                 lazy=False, lex_backend='ply', positions=True):
         # A warning: in order for line numbers and column numbers be
         # tracked correctly, ``yacc_tracking`` MUST be turned ON.  As
         # this parser was initially implemented with a number of manual
@@ -78,9 +300,14 @@ class Parser(object):
         self.yacc_optimize = yacc_optimize
         self.yacctab = yacctab
         self.yacc_debug = yacc_debug
-        self.yacc_tracking = yacc_tracking
-
-        self.lexer = Lexer(with_comments=with_comments)
+        # Without positions, none of the positions are tracked for the
+        # nodes, so the tracking by yacc is not needed either.
+        self.positions = positions
+        self.yacc_tracking = yacc_tracking and positions
+
+        self.lexer = Lexer(
+            with_comments=with_comments, backend=lex_backend,
+            track_positions=positions)
         self.lexer.build(optimize=lex_optimize, lextab=lextab)
         self.tokens = self.lexer.tokens
 
@@ -89,6 +316,33 @@ class Parser(object):
             debug=yacc_debug, tabmodule=yacctab, start='program')
 
         self.asttypes = asttypes
+        # the parser for validate, built on first use.
+        self._validator = None
+        # the callback for the top level source elements, only assigned
+        # for the duration of iterparse.
+        self._emit = None
+
+        # In lazy mode, the tokens inside the bodies of the functions
+        # are only lexed and skipped, with the function bodies parsed
+        # upon access of their elements by a parser constructed with
+        # the same arguments, checked out from the pool.
+        self.lazy = lazy
+        self._lazy_kwargs = dict(
+            lex_optimize=lex_optimize, lextab=lextab,
+            yacc_optimize=yacc_optimize, yacctab=yacctab,
+            yacc_debug=yacc_debug, yacc_tracking=yacc_tracking,
+            with_comments=with_comments, asttypes=asttypes, lazy=lazy,
+            lex_backend=lex_backend, positions=positions,
+        )
+        # the states for the lazy token function
+        self._function_state = 0
+        self._skip_body = None
+        # the opening parenthesis of the last function expression, when
+        # the positions are not tracked.
+        self._function_expr_lparen = None
+        # the closing brace when parsing a function body on its own
+        self._body_end = None
+        self._body_end_token = None
 
     def _raise_syntax_error(self, token):
         tokens = [format_lex_token(t) for t in [
@@ -109,12 +363,393 @@ class Parser(object):
             raise TypeError("'%s' argument expected, got '%s'" % (
                 str.__name__, type(text).__name__))
 
+        self._function_state = 0
+        self._skip_body = None
         try:
             return self.parser.parse(
                 text, lexer=self.lexer, debug=debug,
-                tracking=self.yacc_tracking)
+                tracking=self.yacc_tracking,
+                tokenfunc=self._lazy_token if self.lazy else None)
+        except ProductionError as e:
+            raise e.args[0]
+
+    def validate(self, text, debug=False):
+        """
+        Check that the text is a valid program, raising the same
+        ECMASyntaxError as parse would upon the first error.
+
+        The same grammar is used, but with actions that do not construct
+        any nodes and with position tracking disabled, so nothing is
+        produced and this is much faster than parsing.
+        """
+
+        if not isinstance(text, str):
+            raise TypeError("'%s' argument expected, got '%s'" % (
+                str.__name__, type(text).__name__))
+
+        if self._validator is None:
+            self._validator = build_validator(self.parser)
+
+        self._function_state = 0
+        self._skip_body = None
+        # p_error signals the recovery through self.parser, so the
+        # validator must be in place for the duration.
+        parser, self.parser = self.parser, self._validator
+        try:
+            self.parser.parse(
+                text, lexer=self.lexer, debug=debug, tracking=False)
         except ProductionError as e:
             raise e.args[0]
+        finally:
+            self.parser = parser
+
+    def parse_function_body(self, text, lexpos, lineno, colno, end):
+        """
+        Parse the body of a function inside the text, starting at the
+        lexpos (which is at the provided lineno and colno), up to the
+        closing brace of the function located at end, and return the
+        list of source elements.
+
+        This is used for the bodies of the functions that were skipped
+        by a parser in lazy mode.
+        """
+
+        self.lexer.input(text, lexpos, lineno, colno)
+        # the opening brace of the body precedes the starting position;
+        # it is provided as the preceding token to the lexer, such that
+        # the handling of a leading division (and the errors raised) is
+        # identical to when the body is parsed along with the function.
+        lbrace = LexToken()
+        lbrace.type, lbrace.value = 'LBRACE', '{'
+        lbrace.lexpos, lbrace.lineno, lbrace.colno = (
+            lexpos - 1, lineno, colno - 1)
+        lexer = self.lexer
+        lexer.prev_token = lexer.valid_prev_token = lbrace
+        lexer.cur_token = lexer.cur_token_real = lbrace
+        self._function_state = 0
+        self._skip_body = None
+        self._body_end = end
+        self._body_end_token = None
+        try:
+            return self.parser.parse(
+                lexer=self.lexer, tracking=self.yacc_tracking,
+                tokenfunc=self._body_token,
+            ).children()
+        except ProductionError as e:
+            raise e.args[0]
+        finally:
+            self._body_end = self._body_end_token = None
+
+    def _body_token(self):
+        """
+        The token function for parse_function_body, which ends the input
+        at the closing brace of the function.
+        """
+
+        if self._body_end_token is not None:
+            return None
+        token = self._lazy_token() if self.lazy else self.lexer.token()
+        if (token is not None and token.type == 'RBRACE' and
+                token.lexpos == self._body_end):
+            self._body_end_token = token
+            return None
+        return token
+
+    def _lazy_token(self):
+        """
+        The token function for the lazy mode.  The opening brace of the
+        body for every function is tracked, such that on the subsequent
+        call all the tokens up to the matching closing brace is skipped,
+        with the closing brace returned with the location of the body.
+        """
+
+        if self._skip_body is not None:
+            token = self._skip_function_body(self._skip_body)
+            self._skip_body = None
+            return token
+
+        token = self.lexer.token()
+        if token is None:
+            return token
+
+        # FUNCTION [ID] LPAREN [ID [COMMA ID]...] RPAREN LBRACE
+        state = self._function_state
+        token_type = token.type
+        if token_type == 'FUNCTION':
+            state = 1
+        elif state == 1 and token_type == 'ID':
+            state = 2
+        elif state in (1, 2) and token_type == 'LPAREN':
+            state = 3
+        elif state == 3 and token_type in ('ID', 'COMMA'):
+            pass
+        elif state == 3 and token_type == 'RPAREN':
+            state = 4
+        elif state == 4 and token_type == 'LBRACE':
+            self._skip_body = token
+            state = 0
+        else:
+            state = 0
+        self._function_state = state
+        return token
+
+    def _skip_function_body(self, lbrace):
+        # The opening brace of every block or object literal is tracked
+        # by whether it is for a block, such that a division following
+        # the closing of a block may be read as a regex, like how the
+        # p_error method would have done.
+        blocks = [True]
+        closed_block = False
+        prev_token = lbrace
+        while True:
+            token = self.lexer.token()
+            if token is None:
+                return token
+            token_type = token.type
+            if token_type == 'LBRACE':
+                blocks.append(prev_token.type in BLOCK_PRECEDING_TOKENS)
+            elif token_type == 'RBRACE':
+                closed_block = blocks.pop()
+                if not blocks:
+                    token.lazy_body = (
+                        lbrace.lexpos + 1, lbrace.lineno, lbrace.colno + 1)
+                    return token
+            elif (token_type == 'DIV' and closed_block and
+                    prev_token.type == 'RBRACE'):
+                regex_token = self.lexer.backtracked_token(pos=1)
+                if regex_token.type == 'REGEX':
+                    token = regex_token
+            prev_token = token
+
+    def _set_lazy_elements(self, node, token):
+        """
+        Provide the lazy elements for the function node, if the body
+        at its closing brace token was skipped.
+        """
+
+        lazy_body = getattr(token, 'lazy_body', None)
+        if lazy_body is not None:
+            del node.elements
+            node._lazy_elements = partial(
+                parse_function_body, self._lazy_kwargs,
+                self.lexer.lexer.lexdata, *(lazy_body + (token.lexpos,)))
+
+    def iterparse(self, text, debug=False, buffer_size=16):
+        """
+        Parse the text, but rather than returning the complete program,
+        yield every top level source element (i.e. the statements and
+        function declarations) as soon as it has been fully reduced by
+        the parser.  The yielded elements are no longer retained by the
+        parser, so that the memory required is bounded by the elements
+        that were produced but not yet consumed rather than the size of
+        the whole program.  Every element yielded has its own table for
+        the positions of its tokens; only the offsets for the starts of
+        the lines (one integer per line) are kept for the whole text.
+
+        The parsing happens in a separate thread, which may run ahead of
+        the consumer by up to buffer_size elements.  Any syntax error
+        will be raised after all the elements preceding it have been
+        yielded.
+        """
+
+        if not isinstance(text, str):
+            raise TypeError("'%s' argument expected, got '%s'" % (
+                str.__name__, type(text).__name__))
+
+        results = Queue(maxsize=buffer_size)
+        cancelled = Event()
+
+        def emit(node):
+            if cancelled.is_set():
+                raise _Cancelled()
+            results.put(node)
+
+        def run():
+            try:
+                self.parse(text, debug=debug)
+            except _Cancelled:
+                pass
+            except Exception as e:
+                results.put(e)
+            results.put(_finished)
+
+        self._emit = emit
+        thread = Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        finished = False
+        try:
+            while True:
+                result = results.get()
+                if result is _finished:
+                    finished = True
+                    break
+                if isinstance(result, Exception):
+                    finished = results.get() is _finished
+                    raise result
+                yield result
+        finally:
+            if not finished:
+                # the consumer has stopped early; signal the thread to
+                # stop and drain the results so it is not blocked.
+                cancelled.set()
+                while results.get() is not _finished:
+                    pass
+            thread.join()
+            self._emit = None
+
+    def _resumes_at(self, token):
+        """
+        Return whether the parser will be in between the top level source
+        elements when the token is to be shifted, i.e. with the elements
+        before it all reduced, by following the reductions it will make
+        through the parsing tables.
+        """
+
+        parser = self.parser
+        states = list(parser.statestack)
+        while True:
+            action = parser.action[states[-1]].get(token.type)
+            if action is None:
+                # an error, which may lead to an automatic semicolon and
+                # the token being provided again.
+                return False
+            if action >= 0:
+                break
+            production = parser.productions[-action]
+            if production.len:
+                del states[-production.len:]
+            states.append(parser.goto[states[-1]][production.name])
+        return len(states) == 1 or (len(states) == 2 and (
+            states[1] == parser.goto[0]['source_element_list']))
+
+    def reparse(self, program, old_text, text, start, end):
+        """
+        Return the program for the text, which is the old_text that the
+        program was parsed from with the part from start up to end (the
+        offsets within old_text) replaced, by only parsing the top level
+        source elements affected by the replacement.
+
+        The parsing starts from the top level source element preceding
+        the one where the replacement starts, and stops at the first of
+        the following top level source elements that starts after the
+        replacement with the parser back at the top level.  The rest of
+        the source elements are reused from the program with their
+        positions shifted, so the program should not be used afterwards,
+        as its nodes are modified in place.
+
+        The program must be produced by a parser constructed with the
+        same arguments; if the positions were not tracked, the complete
+        text will be parsed.
+        """
+
+        if not isinstance(text, str):
+            raise TypeError("'%s' argument expected, got '%s'" % (
+                str.__name__, type(text).__name__))
+        if not 0 <= start <= end <= len(old_text):
+            raise ValueError(
+                'invalid range for the replacement: %d to %d' % (start, end))
+
+        table = getattr(program, '_positions', None)
+        elements = program.children()
+        starts = [_element_start(element).lexpos for element in elements]
+        if (not self.positions or not isinstance(table, PositionTable) or
+                None in starts):
+            return self.parse(text)
+
+        line_starts = table.line_starts
+        delta = len(text) - len(old_text)
+        with_comments = self.lexer.with_comments
+
+        # the replacement may join the source element where it starts
+        # with the preceding one, so start from that one instead.
+        first = bisect_right(starts, start) - 2
+        if first > 0:
+            lexpos = starts[first]
+            if with_comments:
+                comments = _leading_comments(elements[first], lexpos)
+                if comments:
+                    lexpos = comments[0].lexpos
+            lineno = bisect_right(line_starts, lexpos)
+            colno = lexpos - line_starts[lineno - 1] + 1
+        else:
+            first = 0
+            lexpos, lineno, colno = 0, 1, 1
+
+        token_func = self._lazy_token if self.lazy else self.lexer.token
+        resumed = []
+
+        def reparse_token():
+            token = token_func()
+            if token is None or isinstance(token, AutoLexToken):
+                return token
+            lexpos = token.lexpos - delta
+            if lexpos < end:
+                return token
+            # the source element that starts at the token in the old
+            # text may be reused if the token starts a top level source
+            # element here also; the input is ended there instead, as
+            # the rest of the text is unchanged.
+            i = bisect_left(starts, lexpos)
+            if i == len(starts) or starts[i] != lexpos or (
+                    not self._resumes_at(token)):
+                return token
+            if with_comments:
+                # the comments of the token must be unchanged also.
+                old = [c.lexpos for c in _leading_comments(
+                    elements[i], lexpos)]
+                new = [t.lexpos - delta for t in getattr(
+                    token, 'hidden_tokens', None) or ()]
+                if min(old + new + [lexpos]) < end or (old and old != new):
+                    return token
+            resumed.append(i)
+            return None
+
+        self.lexer.input(text, lexpos, lineno, colno)
+        # the lines preceding where the lexing starts are unchanged.
+        self.lexer.newline_idx[:lineno] = line_starts[:lineno]
+        self._function_state = 0
+        self._skip_body = None
+        try:
+            result = self.parser.parse(
+                lexer=self.lexer, tracking=self.yacc_tracking,
+                tokenfunc=reparse_token)
+        except ProductionError as e:
+            raise e.args[0]
+
+        newline_idx = self.lexer.newline_idx
+        elements_parsed = result.children()
+        elements_reused = elements[resumed[0]:] if resumed else []
+        if elements_reused:
+            lexpos = starts[resumed[0]]
+            # the starts of the lines after the resumed source element
+            # are taken from the program, as they were not all scanned.
+            newline_idx[bisect_right(newline_idx, lexpos + delta):] = [
+                offset + delta for offset in line_starts[
+                    bisect_right(line_starts, lexpos):]]
+            lineno = bisect_right(line_starts, end)
+            new_lineno = bisect_right(newline_idx, end + delta)
+            line_delta = new_lineno - lineno
+            col_delta = (
+                delta - newline_idx[new_lineno - 1] + line_starts[lineno - 1])
+            if delta or line_delta or col_delta:
+                for table in _shift_positions(
+                        elements_reused, text, delta, lineno, line_delta,
+                        col_delta):
+                    table.line_starts = newline_idx
+
+        if first:
+            result.lexpos, result.lineno, result.colno = (
+                program.lexpos, program.lineno, program.colno)
+        elif not elements_parsed and elements_reused:
+            element = _element_start(elements_reused[0])
+            result.lexpos, result.lineno, result.colno = (
+                element.lexpos, element.lineno, element.colno)
+        result._children_list = (
+            elements[:first] + elements_parsed + elements_reused)
+        if result._children_list:
+            result.endpos = result._children_list[-1].endpos
+        return result
 
     def p_empty(self, p):
         """empty :"""
@@ -122,6 +757,11 @@ class Parser(object):
     def p_error(self, token):
         next_token = self.lexer.auto_semi(token)
         if next_token is not None:
+            if token is None and self._body_end_token is not None:
+                # the end of the input for a function body is really
+                # the closing brace.
+                next_token.lineno = self._body_end_token.lineno
+                next_token.lexpos = self._body_end_token.lexpos
             self.parser.errok()
             return next_token
         # try to use the token in the actual lexer over the token that
@@ -168,7 +808,19 @@ class Parser(object):
         """source_element_list : source_element
                                | source_element_list source_element
         """
-        if len(p) == 2:  # single source element
+        if self._emit is not None and len(p.stack) == 1:
+            # the element is on the top level (nothing else is on the
+            # stack) while streaming, so pass it on instead of keeping
+            # it in the list for the program.
+            self._emit(p[len(p) - 1])
+            p[0] = []
+            # the nodes of the element have all been recorded, so a new
+            # table is started for the following element such that the
+            # table of a consumed element may be released with it.
+            positions = getattr(p.lexer, 'positions', None)
+            if positions is not None:
+                p.lexer.positions = PositionTable(positions.line_starts)
+        elif len(p) == 2:  # single source element
             p[0] = [p[1]]
         else:
             p[1].append(p[2])
@@ -374,11 +1026,13 @@ class Parser(object):
         else:
             # increment the Elision value.
             p[1][-1].value += 1
+            if p[1][-1].endpos is not None:
+                p[1][-1].endpos = p[1][-1].findend(p, 2)
             p[0] = p[1]
         # TODO there should be a cleaner API for the lexer and their
         # token types for ensuring that the mappings are available.
-        p[0][0]._token_map = {(',' * p[0][0].value): [
-            p[0][0].findpos(p, 0)]}
+        p[0][0]._token_map = {
+            (',' * p[0][0].value): p[0][0].findpos(p, 0)}
         return
 
     def p_object_literal(self, p):
@@ -430,9 +1084,13 @@ class Parser(object):
         """identifier_name_string : identifier_name
         """
         p[0] = asttypes.PropIdentifier(p[1].value)
-        # manually clone the position attributes.
-        for k in ('_token_map', 'lexpos', 'lineno', 'colno'):
-            setattr(p[0], k, getattr(p[1], k))
+        # manually clone the position attributes; the index is absent
+        # if the positions are not in the table from the lexer.
+        for k in (
+                '_positions', '_position_index', 'lexpos', 'lineno', 'colno',
+                '_endpos'):
+            if hasattr(p[1], k):
+                setattr(p[0], k, getattr(p[1], k))
 
     # identifier_name_string ~= identifier_name
     def p_property_name(self, p):
@@ -1155,7 +1813,13 @@ class Parser(object):
         # which would result in an infinite loop in this case.
 
         if isinstance(p[1], self.asttypes.FuncExpr):
-            _, line, col = p[1].getpos('(', 0)
+            if self.positions:
+                _, line, col = p[1].getpos('(', 0)
+            else:
+                # as the complete expression, it must be the function
+                # expression that was reduced last.
+                token = self._function_expr_lparen
+                line, col = token.lineno, token.colno
             raise ProductionError(ECMASyntaxError(
                 'Function statement requires a name at %s:%s' % (line, col)))
 
@@ -1207,12 +1871,13 @@ class Parser(object):
                 # by using the previous token, and increment the
                 # positions
                 node = self.asttypes.EmptyStatement(';')
-                node.setpos(p, key - 1)
-                node.lexpos += 1
-                node.colno += 1
+                node.setpos(p, key - 1, last=key - 1)
+                if self.positions:
+                    node.lexpos += 1
+                    node.colno += 1
             else:
                 node = self.asttypes.ExprStatement(expr=node)
-                node.setpos(p, key)
+                node.setpos(p, key, last=key)
             return node
 
         if len(p) == 10:
@@ -1221,7 +1886,7 @@ class Parser(object):
                 count=p[7], statement=p[9])
         else:
             init = self.asttypes.VarStatement(p[4])
-            init.setpos(p, 3)
+            init.setpos(p, 3, last=4)
             p[0] = self.asttypes.For(
                 init=init, cond=wrap(p[6], 6), count=p[8], statement=p[10])
         p[0].setpos(p)
@@ -1240,7 +1905,7 @@ class Parser(object):
             FOR LPAREN VAR identifier IN expr RPAREN statement
         """
         vardecl = self.asttypes.VarDeclNoIn(identifier=p[4])
-        vardecl.setpos(p, 3)
+        vardecl.setpos(p, 3, last=4)
         p[0] = self.asttypes.ForIn(item=vardecl, iterable=p[6], statement=p[8])
         p[0].setpos(p)
 
@@ -1251,7 +1916,7 @@ class Parser(object):
         """
         vardecl = self.asttypes.VarDeclNoIn(
             identifier=p[4], initializer=p[5])
-        vardecl.setpos(p, 3)
+        vardecl.setpos(p, 3, last=5)
         p[0] = self.asttypes.ForIn(item=vardecl, iterable=p[7], statement=p[9])
         p[0].setpos(p)
 
@@ -1433,6 +2098,8 @@ class Parser(object):
             p[0] = self.asttypes.FuncDecl(
                 identifier=p[2], parameters=p[4], elements=p[7])
         p[0].setpos(p)
+        if self.lazy:
+            self._set_lazy_elements(p[0], p.slice[-1])
 
     def p_function_expr_1(self, p):
         """
@@ -1448,6 +2115,10 @@ class Parser(object):
             p[0] = self.asttypes.FuncExpr(
                 identifier=None, parameters=p[3], elements=p[6])
         p[0].setpos(p)
+        if not self.positions:
+            self._function_expr_lparen = _function_expr_lparen(p)
+        if self.lazy:
+            self._set_lazy_elements(p[0], p.slice[-1])
 
     def p_function_expr_2(self, p):
         """
@@ -1463,6 +2134,10 @@ class Parser(object):
             p[0] = self.asttypes.FuncExpr(
                 identifier=p[2], parameters=p[4], elements=p[7])
         p[0].setpos(p)
+        if not self.positions:
+            self._function_expr_lparen = _function_expr_lparen(p)
+        if self.lazy:
+            self._set_lazy_elements(p[0], p.slice[-1])
 
     def p_formal_parameter_list(self, p):
         """formal_parameter_list : identifier
@@ -1479,13 +2154,88 @@ class Parser(object):
         p[0] = p[1]
 
 
-def parse(source, with_comments=False):
+# the default pool of parsers used by the parse function.
+pool = ParserPool(Parser)
+
+
+def parse(source, with_comments=False, lazy=False, positions=True):
     """
     Return an AST from the input ES5 source.
+
+    Parser instances are reused through the module level pool, such that
+    the setup cost of the underlying lexer and parser tables are only
+    paid once per set of arguments.
+
+    If lazy is True, the bodies of the functions will only be lexed,
+    and be parsed when the elements of the function are first accessed.
+
+    If positions is False, the positions of the nodes and their tokens
+    will not be tracked, such that the output of the unparsers will only
+    have the implied positions (i.e. no source maps may be produced).
+    """
+
+    kwargs = {'with_comments': with_comments}
+    if lazy:
+        kwargs['lazy'] = lazy
+    if not positions:
+        kwargs['positions'] = positions
+    with pool.parser(**kwargs) as parser:
+        return parser.parse(source)
+
+
+def validate(source):
+    """
+    Check that the input ES5 source is valid, raising ECMASyntaxError
+    with the same message as parse would for the first error found.
+    """
+
+    with pool.parser(with_comments=False) as parser:
+        parser.validate(source)
+
+
+def parse_function_body(kwargs, text, lexpos, lineno, colno, end):
+    """
+    Parse a function body with a pooled parser constructed with kwargs;
+    refer to the method of the same name on the Parser for details.
+    """
+
+    with pool.parser(**kwargs) as parser:
+        return parser.parse_function_body(text, lexpos, lineno, colno, end)
+
+
+def iterparse(source, with_comments=False):
+    """
+    Return a generator that yields the top level source elements of the
+    input ES5 source as they become available.
+
+    Refer to the iterparse method of the Parser for details.
+    """
+
+    with pool.parser(with_comments=with_comments) as parser:
+        for node in parser.iterparse(source):
+            yield node
+
+
+def reparse(program, old_source, source, start, end, with_comments=False,
+            lazy=False):
+    """
+    Return an AST for the input ES5 source, which is the old_source that
+    the program was parsed from with the part from start up to end
+    replaced, by only parsing the top level source elements affected by
+    the replacement.  The nodes of the program are reused, so it should
+    not be used afterwards.
+
+    The with_comments and lazy arguments must match the ones used for
+    producing the program.  Refer to the reparse method of the Parser
+    for details.
     """
 
-    parser = Parser(with_comments=with_comments)
-    return parser.parse(source)
+    kwargs = {'with_comments': with_comments}
+    if lazy:
+        kwargs['lazy'] = lazy
+    with pool.parser(**kwargs) as parser:
+        return parser.reparse(program, old_source, source, start, end)
 
 
 read = partial(io_read, parse)
+parse_many = partial(io_parse_many, parse)
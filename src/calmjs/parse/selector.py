@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Selectors for the nodes of an asttypes tree.
+
+A selector is a minimal language for describing the nodes to be
+selected from a tree, modelled after the CSS selectors.  It consists of
+one or more comma separated groups of compound selectors joined by the
+combinators, where a compound selector is the name of an asttypes
+node type (or ``*`` for any node), followed by any number of attribute
+conditions in square brackets.
+
+``Type``
+    nodes that are instances of the asttypes node type named Type.
+``A B``
+    nodes matching B that are nested anywhere within a node matching A.
+``A > B``
+    nodes matching B that are direct children of a node matching A.
+``[attr]``
+    nodes with the attribute attr not being None, where attr may be a
+    dotted path to the attribute of a nested node, e.g.
+    ``identifier.value``.
+``[attr="value"]``
+    nodes with the attribute being the provided string; other than
+    ``=``, the ``!=``, ``^=``, ``$=`` and ``*=`` operators are also
+    available, for the attribute not being equal to, starting with,
+    ending with and containing the value, respectively.  The value may
+    be single or double quoted, or unquoted if it has no whitespace.
+
+Example usage:
+
+>>> from calmjs.parse.parsers.es5 import Parser
+>>> from calmjs.parse.selector import select
+>>> from calmjs.parse.unparsers.es5 import pretty_print
+>>> tree = Parser().parse(u'''
+... var a = require('a');
+... function f(x) {
+...     return a.require('b') + x;
+... }
+... ''')
+>>> for node in select(tree, 'FunctionCall > DotAccessor'
+...                          '[identifier.value="require"]'):
+...     print(pretty_print(node))
+a.require
+>>> for node in select(tree, 'FuncDecl Return'):
+...     print(pretty_print(node))
+return a.require('b') + x;
+>>> for node in select(tree, 'VarDecl > FunctionCall, Return BinOp'):
+...     print(pretty_print(node))
+require('a')
+a.require('b') + x
+
+The selectors are compiled into the matching functions once, with the
+most recently used ones being kept by the compile function.
+"""
+
+import re
+from collections import OrderedDict
+from threading import Lock
+
+from calmjs.parse import asttypes
+from calmjs.parse.asttypes import Node
+from calmjs.parse.utils import str
+
+# the number of the compiled selectors to keep.
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+_token = re.compile(r'''
+    (?P<combinator>\s*(?P<op>[>,])\s*)
+  | (?P<space>\s+)
+  | (?P<type>\*|[A-Za-z_]\w*)
+  | \[\s*(?P<attr>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\s*(?:
+        (?P<cmp>[!^$*]?=)\s*(?:
+            "(?P<dquoted>(?:[^"\\]|\\.)*)"
+          | '(?P<squoted>(?:[^'\\]|\\.)*)'
+          | (?P<unquoted>[^\s\]"']+)
+        )\s*
+    )?\]
+''', re.VERBOSE)
+
+_unescape = re.compile(r'\\(.)')
+
+_comparisons = {
+    '=': lambda actual, value: actual == value,
+    '!=': lambda actual, value: actual != value,
+    '^=': lambda actual, value: actual.startswith(value),
+    '$=': lambda actual, value: actual.endswith(value),
+    '*=': lambda actual, value: value in actual,
+}
+
+
+def _resolve(node, path):
+    for name in path:
+        node = getattr(node, name, None)
+        if node is None:
+            break
+    return node
+
+
+def _attribute_test(path, cmp, value):
+    path = tuple(path.split('.'))
+    if cmp is None:
+        def test(node):
+            return _resolve(node, path) is not None
+        return test
+
+    comparison = _comparisons[cmp]
+
+    def test(node):
+        actual = _resolve(node, path)
+        if not isinstance(actual, str):
+            return cmp == '!='
+        return comparison(actual, value)
+    return test
+
+
+def _compound_test(types, tests):
+    if not tests:
+        if types is None:
+            return lambda node: True
+        return lambda node: isinstance(node, types)
+
+    def test(node):
+        if types is not None and not isinstance(node, types):
+            return False
+        for attribute_test in tests:
+            if not attribute_test(node):
+                return False
+        return True
+    return test
+
+
+def _match(compounds, i, node, parent):
+    # compounds[i] has matched the node; check that the ones before it
+    # match the ancestors of the node as required by the combinators.
+    if not i:
+        return True
+    combinator = compounds[i][0]
+    test = compounds[i - 1][2]
+    ancestor = parent(node)
+    if combinator == '>':
+        return ancestor is not None and test(ancestor) and _match(
+            compounds, i - 1, ancestor, parent)
+    while ancestor is not None:
+        if test(ancestor) and _match(compounds, i - 1, ancestor, parent):
+            return True
+        ancestor = parent(ancestor)
+    return False
+
+
+class Selector(object):
+    """
+    A compiled selector.
+    """
+
+    def __init__(self, text):
+        """
+        Compile the selector text; a ValueError is raised if the text is
+        not a valid selector.
+        """
+
+        self.text = text
+        # a list of lists of compound selectors for every group, each
+        # as a tuple of the combinator joining it to the previous one,
+        # the node types and the test function.
+        self.groups = []
+        compounds = []
+        combinator = None
+        types = tests = None
+        named = False
+        pos = 0
+        stripped = text.strip()
+        while pos < len(stripped):
+            match = _token.match(stripped, pos)
+            if match is None:
+                raise ValueError(
+                    'invalid selector %r at position %d' % (text, pos))
+            start, pos = match.start(), match.end()
+            if match.group('type') or match.group('attr'):
+                if tests is None:
+                    if combinator is None and compounds:
+                        combinator = ' '
+                    types, tests, named = None, [], False
+                if match.group('type'):
+                    if named or tests:
+                        raise ValueError(
+                            'invalid selector %r at position %d' % (
+                                text, start))
+                    types = self._type(text, match.group('type'))
+                    named = True
+                else:
+                    value = match.group('dquoted')
+                    if value is None:
+                        value = match.group('squoted')
+                    if value is None:
+                        value = match.group('unquoted')
+                    else:
+                        value = _unescape.sub(r'\1', value)
+                    tests.append(_attribute_test(
+                        match.group('attr'), match.group('cmp'), value))
+                continue
+
+            # whitespace or an explicit combinator ends the compound.
+            if tests is None and (
+                    match.group('op') or not compounds or combinator):
+                raise ValueError(
+                    'invalid selector %r at position %d' % (text, start))
+            if tests is not None:
+                compounds.append(
+                    (combinator, types, _compound_test(types, tests)))
+                types = tests = combinator = None
+            if match.group('op') == ',':
+                self.groups.append(compounds)
+                compounds = []
+            elif match.group('op'):
+                combinator = '>'
+
+        if tests is None:
+            raise ValueError('invalid selector %r at position %d' % (
+                text, len(stripped)))
+        compounds.append((combinator, types, _compound_test(types, tests)))
+        self.groups.append(compounds)
+
+        # the types of the nodes that may be selected, if restricted.
+        self.types = None
+        if all(group[-1][1] is not None for group in self.groups):
+            self.types = tuple(
+                cls for group in self.groups for cls in group[-1][1])
+
+    @staticmethod
+    def _type(text, name):
+        if name == '*':
+            return None
+        cls = getattr(asttypes, name, None)
+        if not (isinstance(cls, type) and issubclass(cls, Node)):
+            raise ValueError(
+                'invalid selector %r: unknown node type %r' % (text, name))
+        return (cls,)
+
+    def __repr__(self):
+        return '<Selector %r>' % (self.text,)
+
+    def match(self, node, parent):
+        """
+        Return True if the node is matched by the selector, with the
+        parent argument being the function that returns the parent of
+        a given node, or None if there is no parent.
+        """
+
+        for compounds in self.groups:
+            if compounds[-1][2](node) and _match(
+                    compounds, len(compounds) - 1, node, parent):
+                return True
+        return False
+
+    def select(self, node, index=None):
+        """
+        Return the list of the nodes nested within the provided node
+        that are matched by the selector, in document order.
+
+        If a NodeIndex built for the node is provided as the index, the
+        candidate nodes are looked up from it by their types, and their
+        ancestors through its parent links, rather than traversing the
+        whole tree.
+        """
+
+        if index is not None:
+            if index.root is not node:
+                raise ValueError('the index was not built for the node')
+            candidates = (
+                index.nodes if self.types is None else
+                index.get(self.types)
+            )
+            return [
+                candidate for candidate in candidates
+                if self.match(candidate, index.parent)
+            ]
+
+        if not isinstance(node, Node):
+            raise TypeError('not a node')
+        # a preorder traversal, tracking the parent of every node
+        # traversed for the matching of the combinators.
+        parents = {id(node): None}
+
+        def parent(child):
+            return parents[id(child)]
+
+        results = []
+        stack = [(node, iter(node.children()))]
+        while stack:
+            for child in stack[-1][1]:
+                if child is None:
+                    continue
+                if not isinstance(child, Node):
+                    raise TypeError('not a node')
+                parents[id(child)] = stack[-1][0]
+                if self.match(child, parent):
+                    results.append(child)
+                stack.append((child, iter(child.children())))
+                break
+            else:
+                stack.pop()
+        return results
+
+
+def compile(text):
+    """
+    Return the compiled Selector for the text, with the most recently
+    used ones being kept.  A Selector is returned as is.
+    """
+
+    if isinstance(text, Selector):
+        return text
+    with _cache_lock:
+        selector = _cache.pop(text, None)
+        if selector is None:
+            selector = Selector(text)
+            while _cache and len(_cache) >= CACHE_SIZE:
+                _cache.popitem(last=False)
+        _cache[text] = selector
+    return selector
+
+
+def select(node, text, index=None):
+    """
+    Return the list of the nodes nested within the provided node that
+    are matched by the selector text (or a compiled Selector), in
+    document order.  See the select method of Selector for the index
+    argument.
+    """
+
+    return compile(text).select(node, index=index)
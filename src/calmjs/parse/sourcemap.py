@@ -7,16 +7,32 @@ from __future__ import unicode_literals, absolute_import
 import base64
 import json
 import logging
+import re
 from os.path import sep
 
 from calmjs.parse.vlq import encode_mappings
 from calmjs.parse.utils import normrelpath
+from calmjs.parse.utils import str
 
 logger = logging.getLogger(__name__)
 
 # for NotImplemented source values
 INVALID_SOURCE = 'about:invalid'
 default_encoding = 'utf8'
+# the number of lines buffered by write before writing to the stream.
+WRITE_BUFFER_SIZE = 4096
+
+try:
+    # none of the line boundaries for str.splitlines are printable, so
+    # a printable string is guaranteed to be a single line.
+    is_single_line = str.isprintable
+except AttributeError:  # pragma: no cover
+    # no isprintable for unicode in Python 2.
+    _line_boundary = re.compile(
+        '[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]', re.UNICODE)
+
+    def is_single_line(s):
+        return not _line_boundary.search(s)
 
 
 class Names(object):
@@ -277,10 +293,6 @@ def write(
     names) should be provided if they are not chained together.
     """
 
-    def push_line():
-        mappings.append([])
-        book.keeper._sink_column = 0
-
     if names is None:
         names = Names()
 
@@ -290,19 +302,46 @@ def write(
     if book is None:
         book = default_book()
 
+    keeper = book.keeper
     if not isinstance(mappings, list):
-        # note that
-        mappings = []
         # finalize initial states; the most recent list (mappings[-1])
         # is the current line
-        push_line()
+        mappings = [[]]
+        keeper._sink_column = 0
+
+    # The positions tracked by the bookkeeper are held as local state
+    # for the duration of this function as pairs of the current and the
+    # previous values, with the difference being the relative values to
+    # be recorded into the mappings; they are written back at the end.
+    sink_column = keeper._sink_column
+    prev_sink_column = sink_column - keeper.sink_column
+    source_line = keeper._source_line
+    prev_source_line = source_line - keeper.source_line
+    source_column = keeper._source_column
+    prev_source_column = source_column - keeper.source_column
+    # length of previously written chunk.text and its original text.
+    written_len = book.written_len
+    original_len = book.original_len
+
+    mapping_line = mappings[-1] if mappings else None
+    update_name = names.update
+    update_source = sources.update
+    # the text is buffered for writing to the stream in larger batches.
+    buffer = []
 
     for chunk, lineno, colno, original_name, source in stream_fragments:
         # note that lineno/colno are assumed to be both provided or none
         # provided.
-        lines = chunk.splitlines(True)
+
+        # the vast majority of the chunks are a single token without
+        # any line breaks, so skip the splitting for those.
+        if chunk and is_single_line(chunk):
+            lines = (chunk,)
+        else:
+            lines = chunk.splitlines(True)
+
         for line in lines:
-            stream.write(line)
+            buffer.append(line)
 
             # Two separate checks are done.  As per specification, if
             # either lineno or colno are unspecified, it is assumed that
@@ -315,24 +354,24 @@ def write(
             # unmapped indentation
 
             if lineno is None or colno is None:
-                mappings[-1].append((book.keeper.sink_column,))
+                mapping_line.append((sink_column - prev_sink_column,))
             else:
-                name_id = names.update(original_name)
+                name_id = update_name(original_name)
                 # this is a bit of a trick: an unspecified value (None)
                 # will simply be treated as the implied value, hence 0.
                 # However, a NotImplemented will be recorded and be
                 # convereted to the invalid url at the end.
-                source_id = sources.update(source) or 0
+                source_id = update_source(source) or 0
 
                 if lineno:
-                    # a new lineno is provided, apply it to the book and
-                    # use the result as the written value.
-                    book.keeper.source_line = lineno
-                    source_line = book.keeper.source_line
+                    # a new lineno is provided, apply it and use the
+                    # difference as the written value.
+                    prev_source_line, source_line = source_line, lineno
+                    line_offset = source_line - prev_source_line
                 else:
                     # no change in offset, do not calculate and assume
                     # the value to be written is unchanged.
-                    source_line = 0
+                    line_offset = 0
 
                 # if the provided colno is to be inferred, calculate it
                 # based on the previous line length plus the previous
@@ -340,28 +379,28 @@ def write(
                 # for tracking.
 
                 # the reason for using the previous lengths is simply
-                # due to how the bookkeeper class does the calculation
-                # on-demand, and that the starting column for the
-                # _current_ text fragment can only be calculated using
-                # what was written previously, hence the original length
-                # value being added if the current colno is to be
+                # due to how the column values are calculated relative
+                # to the previous ones, and that the starting column for
+                # the _current_ text fragment can only be calculated
+                # using what was written previously, hence the original
+                # length value being added if the current colno is to be
                 # inferred.
+                prev_source_column = source_column
                 if colno:
-                    book.keeper.source_column = colno
+                    source_column = colno
                 else:
-                    book.keeper.source_column = (
-                        book.keeper._source_column + book.original_len)
+                    source_column += original_len
 
                 if original_name is not None:
-                    mappings[-1].append((
-                        book.keeper.sink_column, source_id,
-                        source_line, book.keeper.source_column,
+                    mapping_line.append((
+                        sink_column - prev_sink_column, source_id,
+                        line_offset, source_column - prev_source_column,
                         name_id
                     ))
                 else:
-                    mappings[-1].append((
-                        book.keeper.sink_column, source_id,
-                        source_line, book.keeper.source_column
+                    mapping_line.append((
+                        sink_column - prev_sink_column, source_id,
+                        line_offset, source_column - prev_source_column,
                     ))
 
             # doing this last to update the position for the next line
@@ -370,8 +409,10 @@ def write(
                 colno = (
                     colno if colno in (0, None) else
                     colno + len(line.rstrip()))
-                book.original_len = book.written_len = 0
-                push_line()
+                original_len = written_len = 0
+                mapping_line = []
+                mappings.append(mapping_line)
+                sink_column = prev_sink_column = 0
 
                 if lineno and colno:
                     # naturally, a provided lineno and colno can be
@@ -404,11 +445,29 @@ def write(
                         'off into a separate fragment.'
                     )
             else:
-                book.written_len = len(line)
-                book.original_len = (
-                    len(original_name) if original_name else book.written_len)
-                book.keeper.sink_column = (
-                    book.keeper._sink_column + book.written_len)
+                written_len = len(line)
+                original_len = (
+                    len(original_name) if original_name else written_len)
+                prev_sink_column = sink_column
+                sink_column += written_len
+
+        if len(buffer) >= WRITE_BUFFER_SIZE:
+            stream.write(''.join(buffer))
+            buffer = []
+
+    if buffer:
+        stream.write(''.join(buffer))
+
+    # write back the final states, such that the book may be used for
+    # subsequent calls.
+    keeper._sink_column = prev_sink_column
+    keeper.sink_column = sink_column
+    keeper._source_line = prev_source_line
+    keeper.source_line = source_line
+    keeper._source_column = prev_source_column
+    keeper.source_column = source_column
+    book.written_len = written_len
+    book.original_len = original_len
 
     # normalize everything
     if normalize:
@@ -33,6 +33,7 @@ examples = {
 def make_suite():  # pragma: no cover
     from calmjs.parse.lexers import es5 as es5lexer
     from calmjs.parse import walkers
+    from calmjs.parse import selector
     from calmjs.parse import sourcemap
 
     def open(p, flag='r'):
@@ -61,6 +62,7 @@ def make_suite():  # pragma: no cover
     )
     test_suite.addTest(doctest.DocTestSuite(es5lexer, optionflags=optflags))
     test_suite.addTest(doctest.DocTestSuite(walkers, optionflags=optflags))
+    test_suite.addTest(doctest.DocTestSuite(selector, optionflags=optflags))
     test_suite.addTest(doctest.DocTestSuite(sourcemap, optionflags=optflags))
     test_suite.addTest(doctest.DocTestCase(
         # skipping all the error case tests which should all be in the
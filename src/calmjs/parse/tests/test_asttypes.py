@@ -1,9 +1,22 @@
 # -*- coding: utf-8 -*-
+import pickle
+import textwrap
 import unittest
 
+from calmjs.parse import asttypes
+from calmjs.parse.asttypes import attributes
 from calmjs.parse.asttypes import Comments
 from calmjs.parse.asttypes import BlockComment
 from calmjs.parse.asttypes import LineComment
+from calmjs.parse.asttypes import Identifier
+from calmjs.parse.parsers.es5 import asttypes as es5_asttypes
+from calmjs.parse.parsers.es5 import parse
+from calmjs.parse.walkers import walk
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
 
 
 class CommentNodesTestCase(unittest.TestCase):
@@ -30,3 +43,72 @@ class CommentNodesTestCase(unittest.TestCase):
             LineComment(u'// test2'),
         ])
         self.assertEqual("// test1\n// test2", str(node))
+
+
+class NodeLayoutTestCase(unittest.TestCase):
+
+    def test_slotted(self):
+        classes = [
+            v for v in vars(asttypes).values()
+            if isinstance(v, type) and issubclass(v, asttypes.Node)
+        ] + list(es5_asttypes.classes.values())
+        for cls in classes:
+            self.assertIn('__slots__', vars(cls), cls)
+
+    def test_attributes(self):
+        node = Identifier('x')
+        self.assertEqual({'value': 'x'}, attributes(node))
+        self.assertIsNone(node.lineno)
+        self.assertIsNone(node.sourcepath)
+        node.lineno = 1
+        node.sourcepath = 'x.js'
+        node.extra = 'value'
+        self.assertEqual({
+            'value': 'x', 'lineno': 1, 'sourcepath': 'x.js',
+            'extra': 'value',
+        }, attributes(node))
+
+    def test_getpos(self):
+        node = Identifier('x')
+        self.assertEqual((None, None, None), node.getpos('x', 0))
+        node._token_map = {'x': [(0, 1, 1), (4, 2, 1)]}
+        self.assertEqual((4, 2, 1), node.getpos('x', 1))
+        self.assertEqual((0, 0, 0), node.getpos('x', 2))
+        node._token_map = {'x': (0, 1, 1, 4, 2, 1)}
+        self.assertEqual((4, 2, 1), node.getpos('x', 1))
+        self.assertEqual((0, 0, 0), node.getpos('x', 2))
+        self.assertEqual((0, 0, 0), node.getpos('y', 0))
+
+    def test_pickle(self):
+        node = es5_asttypes.Identifier('x')
+        node.colno = 2
+        node.extra = 'value'
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            result = pickle.loads(pickle.dumps(node, protocol))
+            self.assertEqual(attributes(node), attributes(result))
+
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc is unavailable')
+    def test_memory_per_node(self):
+        # guard against regressions of the memory used by the nodes
+        # produced by the parser, which was 568 bytes per node under
+        # CPython 3.11 before the nodes were slotted, and 426 before the
+        # positions were moved to the table shared by the tree.
+        text = textwrap.dedent("""
+        function f(a, b) {
+          var c = [a, b, 1, 'x'], d = {e: a.b(c), 'f': /g/};
+          if (a > b) {
+            return c[0] + d.e;
+          }
+          for (var i = 0; i < c.length; i++) {
+            d.e = function() { return i; };
+          }
+        }
+        """) * 50
+        parse(text)
+        tracemalloc.start()
+        try:
+            tree = parse(text)
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(size / len(list(walk(tree))), 350)
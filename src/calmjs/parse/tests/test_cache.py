@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+from functools import partial
+from io import StringIO
+from os import listdir
+from os import utime
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from calmjs.parse import es5
+from calmjs.parse.cache import DiskCache
+from calmjs.parse.cache import parser_signature
+from calmjs.parse.exceptions import ECMASyntaxError
+from calmjs.parse.factory import AstTypesFactory
+from calmjs.parse.parsers.es5 import Parser
+from calmjs.parse.parsers.es5 import parse
+from calmjs.parse.parsers.es5 import read
+from calmjs.parse.utils import generate_tab_names
+
+
+def plain_parse(text):
+    return parse(text)
+
+
+class ParserSignatureTestCase(unittest.TestCase):
+
+    def test_parse(self):
+        signature = parser_signature(parse)
+        self.assertIn(generate_tab_names(parse.__module__)[1], signature)
+        self.assertIn('calmjs.parse.parsers.es5:parse', signature)
+
+    def test_partial(self):
+        self.assertNotEqual(
+            parser_signature(parse),
+            parser_signature(partial(parse, with_comments=True)),
+        )
+        self.assertNotEqual(
+            parser_signature(partial(parse, with_comments=False)),
+            parser_signature(partial(parse, with_comments=True)),
+        )
+
+    def test_bound_parser(self):
+        signature = parser_signature(Parser().parse)
+        self.assertIn('Parser.parse', signature)
+        self.assertEqual(signature, parser_signature(Parser().parse))
+        for kwargs in (
+                {'with_comments': True}, {'lazy': True},
+                {'positions': False}, {'lex_backend': 'regex'}):
+            self.assertNotEqual(
+                signature, parser_signature(Parser(**kwargs).parse))
+        self.assertNotEqual(
+            parser_signature(Parser().parse),
+            parser_signature(Parser().validate),
+        )
+
+    def test_callable_instance(self):
+        # the parse function wrapped by the factory produced object.
+        self.assertEqual(parser_signature(parse), parser_signature(es5))
+
+    def test_module_without_tables(self):
+        self.assertEqual(
+            "?:calmjs.parse.tests.test_cache:plain_parse:[]",
+            parser_signature(plain_parse))
+
+    def test_unidentifiable(self):
+        with self.assertRaises(TypeError):
+            parser_signature(lambda text: parse(text))
+
+        def parser(text):
+            return parse(text)
+
+        with self.assertRaises(TypeError):
+            parser_signature(parser)
+        with self.assertRaises(TypeError):
+            parser_signature(self.test_unidentifiable)
+        # callable instances not wrapping a parse function.
+
+        class A(object):
+            def __call__(self, text):
+                return parse(text)
+
+        class B(object):
+            def __call__(self, text):
+                return parse(text, with_comments=True)
+
+        with self.assertRaises(TypeError):
+            parser_signature(A())
+        with self.assertRaises(TypeError):
+            parser_signature(B())
+        # the node types must be identified by name
+        asttypes = AstTypesFactory(str, repr)
+        with self.assertRaises(TypeError):
+            parser_signature(Parser(asttypes=asttypes).parse)
+
+
+class DiskCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = mkdtemp()
+        self.addCleanup(rmtree, self.root)
+
+    def test_creation(self):
+        path = join(self.root, 'nested', 'cache')
+        DiskCache(path)
+        self.assertEqual(['nested'], listdir(self.root))
+
+    def test_key(self):
+        cache = DiskCache(self.root)
+        self.assertEqual(
+            cache.key(parse, 'var a;'), cache.key(parse, 'var a;'))
+        self.assertNotEqual(
+            cache.key(parse, 'var a;'), cache.key(parse, 'var b;'))
+        self.assertNotEqual(
+            cache.key(parse, 'var a;'),
+            cache.key(partial(parse, with_comments=True), 'var a;'))
+
+    def test_get_set(self):
+        cache = DiskCache(self.root)
+        key = cache.key(parse, 'var a = 1;')
+        self.assertIsNone(cache.get(key))
+        cache.set(key, parse('var a = 1;'))
+        result = cache.get(key)
+        self.assertEqual('var a = 1;\n', str(result))
+        self.assertEqual((1, 1, 0), (
+            cache.hits, cache.misses, cache.evictions))
+
+    def test_set_failure(self):
+        cache = DiskCache(self.root)
+        with self.assertRaises(Exception):
+            cache.set(cache.key(parse, 'a;'), lambda: None)
+        self.assertEqual([], listdir(self.root))
+
+    def test_set_evict_threshold(self):
+        calls = []
+
+        class CountedCache(DiskCache):
+            def evict(self):
+                calls.append(self._size)
+                return DiskCache.evict(self)
+
+        cache = CountedCache(self.root)
+        for idx in range(5):
+            text = 'var c%d = %d;' % (idx, idx)
+            cache.set(cache.key(parse, text), parse(text))
+        # only the first entry required the scan of the directory.
+        self.assertEqual([None], calls)
+        size = sum(
+            len(open(join(self.root, name), 'rb').read())
+            for name in listdir(self.root))
+        self.assertEqual(size, cache._size)
+        # replacing an entry does not count it twice
+        cache.set(cache.key(parse, 'var c0 = 0;'), parse('var c0 = 0;'))
+        self.assertEqual(size, cache._size)
+
+        cache.max_size = size
+        text = 'var d = 1;'
+        cache.set(cache.key(parse, text), parse(text))
+        self.assertEqual(2, len(calls))
+        self.assertEqual(1, cache.evictions)
+        self.assertLessEqual(cache._size, cache.max_size)
+
+        cache.clear()
+        self.assertEqual(0, cache._size)
+
+    def test_get_corrupted(self):
+        cache = DiskCache(self.root)
+        key = cache.key(parse, 'var a = 1;')
+        with open(join(self.root, key + '.ast'), 'wb') as fd:
+            fd.write(b'garbage')
+        self.assertIsNone(cache.get(key))
+        self.assertEqual([], listdir(self.root))
+        self.assertEqual(1, cache.misses)
+
+    def test_evict_lru(self):
+        cache = DiskCache(self.root)
+        keys = []
+        for idx in range(3):
+            text = 'var a%d = %d;' % (idx, idx)
+            key = cache.key(parse, text)
+            cache.set(key, parse(text))
+            # ensure distinct and increasing modification time
+            utime(join(self.root, key + '.ast'), (idx, idx))
+            keys.append(key)
+
+        # touch the first entry so it becomes the most recently used
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertEqual(3, len(listdir(self.root)))
+        cache.max_size = 1
+        cache.evict()
+        self.assertEqual(3, cache.evictions)
+        self.assertEqual([], listdir(self.root))
+
+    def test_evict_order(self):
+        cache = DiskCache(self.root)
+        keys = []
+        for idx in range(3):
+            text = 'var b%d = %d;' % (idx, idx)
+            key = cache.key(parse, text)
+            cache.set(key, parse(text))
+            utime(join(self.root, key + '.ast'), (idx, idx))
+            keys.append(key)
+        self.assertIsNotNone(cache.get(keys[0]))
+        # all entries should be roughly the same size; keep only two
+        cache.max_size = sum(
+            len(open(join(self.root, k + '.ast'), 'rb').read())
+            for k in keys) - 1
+        cache.evict()
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual(
+            sorted([keys[0] + '.ast', keys[2] + '.ast']),
+            sorted(listdir(self.root)))
+
+    def test_clear(self):
+        cache = DiskCache(self.root)
+        cache.set(cache.key(parse, 'a;'), parse('a;'))
+        with open(join(self.root, 'unrelated'), 'w'):
+            pass
+        cache.clear()
+        self.assertEqual(['unrelated'], listdir(self.root))
+
+
+class ReadCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = mkdtemp()
+        self.addCleanup(rmtree, self.root)
+
+    def test_read_cached(self):
+        cache = DiskCache(self.root)
+        stream = StringIO('var foo = "bar";')
+        stream.name = 'first.js'
+        first = read(stream, cache=cache)
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual('first.js', first.sourcepath)
+
+        stream = StringIO('var foo = "bar";')
+        stream.name = 'second.js'
+        second = read(stream, cache=cache)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertIsNot(first, second)
+        self.assertEqual('second.js', second.sourcepath)
+        self.assertEqual('first.js', first.sourcepath)
+        self.assertEqual(str(first), str(second))
+
+    def test_read_error_not_cached(self):
+        cache = DiskCache(self.root)
+        stream = StringIO('var foo = ;')
+        stream.name = 'bad.js'
+        with self.assertRaises(ECMASyntaxError) as e:
+            read(stream, cache=cache)
+        self.assertIn("in 'bad.js'", str(e.exception))
+        self.assertEqual([], listdir(self.root))
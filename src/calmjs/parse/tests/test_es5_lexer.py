@@ -29,8 +29,14 @@ import unittest
 import textwrap
 from functools import partial
 
+from calmjs.parse.lexers import es5
 from calmjs.parse.lexers.es5 import Lexer
+from calmjs.parse.lexers.tokens import AutoLexToken
+from calmjs.parse.lexers.tokens import LexToken
+from calmjs.parse.lexers.tokens import PositionTable
+from calmjs.parse.lexers.tokenizer import RegexTokenizer
 from calmjs.parse.exceptions import ECMASyntaxError
+from calmjs.parse.parsers.es5 import Parser
 
 from calmjs.parse.testing.util import build_equality_testcase
 from calmjs.parse.testing.util import build_exception_testcase
@@ -99,6 +105,269 @@ class LexerGeneralTestCase(unittest.TestCase):
         token = lexer.backtracked_token(pos=2)
         self.assertEqual(('REGEX', '/a/'), (token.type, token.value))
 
+    def test_input_resets_state(self):
+        lexer = Lexer()
+        lexer.input('(\n\nfoo')
+        self.assertEqual(
+            ['( 1:1', 'foo 3:1'],
+            ['%s %d:%d' % (t.value, t.lineno, t.colno) for t in lexer],
+        )
+        lexer.input('a;\n  /b/')
+        self.assertEqual(
+            ['a 1:1', '; 1:2', '/b/ 2:3'],
+            ['%s %d:%d' % (t.value, t.lineno, t.colno) for t in lexer],
+        )
+
+    def test_input_resets_state_after_error(self):
+        lexer = Lexer()
+        lexer.input('\n())')
+        with self.assertRaises(ECMASyntaxError):
+            [token for token in lexer]
+        lexer.input('(b)')
+        self.assertEqual(
+            ['( 1:1', 'b 1:2', ') 1:3'],
+            ['%s %d:%d' % (t.value, t.lineno, t.colno) for t in lexer],
+        )
+
+    def test_input_position(self):
+        lexer = Lexer()
+        lexer.input('a;\n  b; c;\nd', lexpos=8, lineno=2, colno=6)
+        self.assertEqual(
+            ['c 2:6 8', '; 2:7 9', 'd 3:1 11'],
+            ['%s %d:%d %d' % (t.value, t.lineno, t.colno, t.lexpos)
+                for t in lexer],
+        )
+        self.assertEqual(5, lexer.lookup_colno(2, 7))
+
+    def test_line_scan_chunks(self):
+        text = 'a\r\nb\rc\n\r\nd /* \r\n */ e\r\n\r\nf'
+
+        def positions():
+            lexer = Lexer()
+            lexer.input(text)
+            return ['%s %d:%d' % (t.value, t.lineno, t.colno) for t in lexer]
+
+        expected = positions()
+        self.assertEqual([
+            'a 1:1', 'b 2:1', 'c 3:1', 'd 5:1', 'e 6:5', 'f 8:1',
+        ], expected)
+        original = es5.LINE_SCAN_SIZE
+        try:
+            for size in range(1, 5):
+                es5.LINE_SCAN_SIZE = size
+                self.assertEqual(expected, positions())
+        finally:
+            es5.LINE_SCAN_SIZE = original
+
+    def test_line_separators(self):
+        # only treated as line terminators within the tokens.
+        lexer = Lexer()
+        lexer.input(u"a\u2028b '\\\u2029' /*\u2028*/ c\nd")
+        self.assertEqual(
+            ['a 1:1', 'b 1:3', u"'\\\u2029' 1:5", 'c 3:4', 'd 4:1'],
+            ['%s %d:%d' % (t.value, t.lineno, t.colno) for t in lexer],
+        )
+        self.assertEqual(4, lexer.lineno)
+        self.assertEqual([0, 7, 12, 17], lexer.newline_idx)
+        self.assertEqual(17, lexer.last_newline_lexpos)
+
+    def test_positions(self):
+        lexer = Lexer()
+        lexer.input('a;\n  b;')
+        table = lexer.positions
+        self.assertIs(table.line_starts, lexer.newline_idx)
+        list(lexer)
+        lexer.input('c')
+        self.assertIsNot(table, lexer.positions)
+
+
+class PositionTableTestCase(unittest.TestCase):
+
+    def test_positions(self):
+        line_starts = [0]
+        table = PositionTable(line_starts)
+        table.add('(', 0, 1)
+        table.add(')', 5, 2)
+        table.add('(', 7, 2)
+        self.assertEqual(0, table.close())
+        table.add(';', 9, 0)
+        self.assertEqual(1, table.close())
+        # the lines are only derived when requested.
+        line_starts.append(3)
+        self.assertEqual((0, 1, 1), table.getpos(0, '(', 0))
+        self.assertEqual((7, 2, 5), table.getpos(0, '(', 1))
+        self.assertEqual((0, 0, 0), table.getpos(0, '(', 2))
+        self.assertEqual((5, 2, 3), table.getpos(0, ')', 0))
+        self.assertEqual((0, 0, 0), table.getpos(0, ';', 0))
+        self.assertEqual((9, 0, 0), table.getpos(1, ';', 0))
+        self.assertEqual({
+            '(': [(0, 1, 1), (7, 2, 5)],
+            ')': [(5, 2, 3)],
+        }, table.token_map(0))
+        self.assertEqual({';': [(9, 0, 0)]}, table.token_map(1))
+
+
+class RegexTokenizerTestCase(unittest.TestCase):
+
+    def test_backend(self):
+        lexer = Lexer(backend='regex')
+        self.assertTrue(isinstance(lexer.lexer, RegexTokenizer))
+        # the lexer arguments for ply are ignored.
+        lexer.build(optimize=True, lextab=None)
+        self.assertTrue(isinstance(lexer.lexer, RegexTokenizer))
+
+    def test_unsupported_backend(self):
+        with self.assertRaises(ValueError):
+            Lexer(backend='unsupported')
+
+    def test_tokens(self):
+        text = u"""if (a >>>= b / 2) {\n  c = /re[/]/g . test('s') \u3000}"""
+        results = []
+        for backend in ('ply', 'regex'):
+            lexer = Lexer(backend=backend)
+            lexer.input(text)
+            results.append([(
+                t.type, t.value, t.lineno, t.colno, t.lexpos,
+            ) for t in lexer])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(('URSHIFTEQUAL', '>>>=', 1, 7, 6), results[1][3])
+        self.assertEqual(('REGEX', '/re[/]/g', 2, 7, 26), results[1][11])
+        self.assertEqual(('RBRACE', '}', 2, 29, 48), results[1][-1])
+
+    def test_trailing_ignored(self):
+        tokenizer = RegexTokenizer(Lexer())
+        tokenizer.input(u'a \t\ufeff')
+        self.assertEqual('a', tokenizer.token().value)
+        self.assertIsNone(tokenizer.token())
+        # the position past the end of the input, as with ply.
+        self.assertEqual(5, tokenizer.lexpos)
+        self.assertIsNone(tokenizer.token())
+        self.assertEqual(6, tokenizer.lexpos)
+
+    def test_end_of_input_position(self):
+        for text in ('', '// c', 'a \t\ufeff', 'a;\n\n', 'a/*x*/'):
+            results = []
+            for backend in ('ply', 'regex'):
+                lexer = Lexer(backend=backend)
+                lexer.input(text)
+                list(lexer)
+                positions = [lexer.lexer.lexpos]
+                lexer.lexer.token()
+                positions.append(lexer.lexer.lexpos)
+                program = Parser(lex_backend=backend).parse(text)
+                results.append((positions, program.lexpos, program.colno))
+            self.assertEqual(results[0], results[1])
+
+    def test_regex_state(self):
+        tokenizer = RegexTokenizer(Lexer())
+        tokenizer.input(u'a = \t/b/i;')
+        tokenizer.skip(4)
+        tokenizer.begin('regex')
+        token = tokenizer.token()
+        self.assertEqual(('REGEX', '/b/i', 5), (
+            token.type, token.value, token.lexpos))
+        tokenizer.begin('INITIAL')
+        self.assertEqual('SEMI', tokenizer.token().type)
+
+    def test_errors(self):
+        for backend in ('ply', 'regex'):
+            lexer = Lexer(backend=backend)
+            lexer.input(u'a\n  #b')
+            with self.assertRaises(ECMASyntaxError) as e:
+                list(lexer)
+            self.assertEqual(
+                "Illegal character '#' at 2:3 after '\\n' at 1:2",
+                str(e.exception))
+
+            lexer.input(u'\n  /[/')
+            with self.assertRaises(ECMASyntaxError) as e:
+                list(lexer)
+            self.assertEqual(
+                "Error parsing regular expression '/[/' at 2:3",
+                str(e.exception))
+
+
+class LexTokenTestCase(unittest.TestCase):
+
+    def test_slotted(self):
+        token = LexToken()
+        token.type = 'ID'
+        token.value = 'a'
+        token.lineno = 1
+        token.lexpos = 0
+        token.colno = 1
+        self.assertFalse(hasattr(token, '__dict__'))
+        self.assertFalse(hasattr(token, 'hidden_tokens'))
+        self.assertIsNone(token.lexer)
+        self.assertEqual("LexToken(ID,'a',1,0)", str(token).replace(
+            "u'", "'"))
+        self.assertEqual(str(token), repr(token))
+        with self.assertRaises(AttributeError):
+            token.extra = None
+        self.assertFalse(hasattr(AutoLexToken(), '__dict__'))
+
+    def test_regex_backend(self):
+        lexer = Lexer(backend='regex', with_comments=True)
+        lexer.input('a // b\nc')
+        tokens = list(lexer)
+        self.assertTrue(all(type(t) is LexToken for t in tokens))
+        self.assertEqual('// b', tokens[1].hidden_tokens[0].value)
+        self.assertTrue(isinstance(
+            lexer.auto_semi(None), AutoLexToken))
+
+
+class TokenArraysTestCase(unittest.TestCase):
+
+    text = textwrap.dedent(u"""
+    var o = {get x() { return /re/g; }};
+    function f() {
+      return
+      o.x / 2; // comment
+    }
+    """).strip()
+
+    def assertSameTokens(self, lexer_cls):
+        lexer = lexer_cls()
+        lexer.input(self.text)
+        tokens = [(t.type, t.value, t.lexpos, t.lineno, t.colno)
+                  for t in lexer]
+        arrays = lexer_cls().tokenize_arrays(self.text)
+        self.assertEqual(tokens, [(
+            arrays.type(i), arrays.value(i), arrays.offsets[i],
+            arrays.lines[i], arrays.columns[i],
+        ) for i in range(len(arrays))])
+        return arrays
+
+    def test_tokenize_arrays(self):
+        for backend in ('ply', 'regex'):
+            arrays = self.assertSameTokens(partial(Lexer, backend=backend))
+            self.assertEqual(29, len(arrays))
+            self.assertEqual('AUTOSEMI', arrays.type(21))
+            self.assertEqual(';', arrays.value(21))
+            self.assertEqual('/re/g', arrays.value(10))
+            self.assertEqual(
+                ('B', 'l', 'l', 'l'), tuple(a.typecode for a in (
+                    arrays.types, arrays.offsets, arrays.lines,
+                    arrays.columns)))
+
+    def test_tokenize_arrays_comments(self):
+        arrays = self.assertSameTokens(partial(Lexer, yield_comments=True))
+        self.assertEqual('// comment', arrays.value(len(arrays) - 2))
+
+    def test_tokenize_arrays_empty(self):
+        arrays = Lexer().tokenize_arrays(u'  \n')
+        self.assertEqual(0, len(arrays))
+        self.assertEqual([], arrays.indexes('ID'))
+
+    def test_indexes(self):
+        arrays = Lexer().tokenize_arrays(self.text)
+        self.assertEqual([1, 5, 16, 22, 24], arrays.indexes('ID'))
+        self.assertEqual(
+            ['var', 'return', 'function', 'return'],
+            [arrays.value(i) for i in arrays.indexes(
+                'VAR', 'FUNCTION', 'RETURN')])
+        self.assertEqual([], arrays.indexes('STRING'))
+
 
 class LexerWithCommentsTestCase(unittest.TestCase):
 
@@ -182,3 +451,40 @@ LexerErrorStrDQTestCase = build_exception_testcase(
 LexerPosTestCase = build_equality_testcase(
     'LexerPosTestCase', partial(
         run_lexer_pos, lexer_cls=Lexer), es5_pos_cases)
+
+RegexLexerKeywordTestCase = build_equality_testcase(
+    'RegexLexerKeywordTestCase', partial(
+        run_lexer, lexer_cls=partial(Lexer, backend='regex')), (
+        (label, data[0], data[1],) for label, data in [(
+            'keywords_all',
+            (' '.join(kw.lower() for kw in Lexer.keywords),
+             ['%s %s' % (kw, kw.lower()) for kw in Lexer.keywords]
+             ),
+        )]
+    )
+)
+
+RegexLexerTestCase = build_equality_testcase(
+    'RegexLexerTestCase', partial(
+        run_lexer, lexer_cls=partial(Lexer, backend='regex')), (
+        (label, data[0], data[1],) for label, data in es5_cases))
+
+RegexLexerAllTestCase = build_equality_testcase(
+    'RegexLexerAllTestCase', partial(run_lexer, lexer_cls=partial(
+        Lexer, yield_comments=True, backend='regex'
+    )), ((label, data[0], data[1],) for label, data in es5_all_cases))
+
+RegexLexerErrorTestCase = build_exception_testcase(
+    'RegexLexerErrorTestCase', partial(
+        run_lexer, lexer_cls=partial(Lexer, backend='regex')),
+    es5_error_cases_str_sq, ECMASyntaxError)
+
+RegexLexerErrorStrDQTestCase = build_exception_testcase(
+    'RegexLexerErrorStrDQTestCase', partial(
+        run_lexer, lexer_cls=partial(Lexer, backend='regex')),
+    es5_error_cases_str_dq, ECMASyntaxError)
+
+RegexLexerPosTestCase = build_equality_testcase(
+    'RegexLexerPosTestCase', partial(
+        run_lexer_pos, lexer_cls=partial(Lexer, backend='regex')),
+    es5_pos_cases)
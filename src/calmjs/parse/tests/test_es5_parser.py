@@ -1,15 +1,29 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import pickle
 import textwrap
 import unittest
 from io import StringIO
 
 from calmjs.parse import asttypes
+from calmjs.parse.asttypes import attributes
+from calmjs.parse.exceptions import ECMASyntaxError
+from calmjs.parse.lexers.tokens import PositionTable
 from calmjs.parse.parsers.es5 import Parser
+from calmjs.parse.parsers.es5 import asttypes as es5_asttypes
+from calmjs.parse.parsers.es5 import iterparse
+from calmjs.parse.parsers.es5 import pool
 from calmjs.parse.parsers.es5 import parse
+from calmjs.parse.parsers.es5 import parse_many
 from calmjs.parse.parsers.es5 import read
+from calmjs.parse.parsers.es5 import reparse
+from calmjs.parse.parsers.es5 import validate
+from calmjs.parse import sourcemap
+from calmjs.parse.unparsers.es5 import minify_printer
 from calmjs.parse.unparsers.es5 import pretty_print
+from calmjs.parse.unparsers.es5 import pretty_printer
+from calmjs.parse.walkers import ReprWalker
 from calmjs.parse.walkers import walk
 
 from calmjs.parse.tests.parser import (
@@ -46,6 +60,252 @@ class ParserTestCase(unittest.TestCase, ParserCaseMixin):
             """).lstrip()
         )
 
+    def test_parse_reuse_pooled(self):
+        pool.clear()
+        with pool.parser(with_comments=False) as parser:
+            pass
+        parse('var a = 1;')
+        with pool.parser(with_comments=False) as reused:
+            self.assertIs(parser, reused)
+
+    def test_parser_reuse_positions(self):
+        parser = Parser()
+        with self.assertRaises(ECMASyntaxError):
+            parser.parse('\n\nvar a = (1;')
+        tree = parser.parse('var b\n  = 2;')
+        node = tree.children()[0].children()[0].initializer
+        self.assertEqual((2, 5), (node.lineno, node.colno))
+
+    def test_pickle(self):
+        text = textwrap.dedent("""
+        // comment
+        var x = function(a, b) {
+          /* block */
+          return [a, , b];
+        };
+        """)
+        tree = parse(text, with_comments=True)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            result = pickle.loads(pickle.dumps(tree, protocol))
+            self.assertIs(type(tree), type(result))
+            self.assertEqual(str(tree), str(result))
+            self.assertEqual(repr(tree), repr(result))
+            for orig, node in zip(walk(tree), walk(result)):
+                self.assertIs(type(orig), type(node))
+                self.assertEqual(orig._token_map, node._token_map)
+                self.assertEqual(
+                    (orig.lexpos, orig.lineno, orig.colno),
+                    (node.lexpos, node.lineno, node.colno))
+
+    def test_position_table(self):
+        text = textwrap.dedent("""
+        var a = [1, , 2], b = {c: 'd\\
+        e', f: a.g}
+        function h(i) {
+          /* comment */
+          if (i) { return i ? [,,] : /j/ } else b++
+        }
+        h(a)
+        """).strip()
+        # a parser with a lexer that does not provide the table, such
+        # that the token maps are recorded on every node instead.
+        parser = Parser(with_comments=True)
+        lexer_input = parser.lexer.input
+
+        def input(*a, **kw):
+            lexer_input(*a, **kw)
+            parser.lexer.positions = None
+
+        parser.lexer.input = input
+        tree = parse(text, with_comments=True)
+        untabled = parser.parse(text)
+        self.assertIsInstance(tree._positions, PositionTable)
+        self.assertIsInstance(untabled._positions, dict)
+        for orig, node in zip(walk(untabled), walk(tree)):
+            for token, positions in orig._token_map.items():
+                for idx in range(len(positions) // 3 + 1):
+                    self.assertEqual(
+                        orig.getpos(token, idx), node.getpos(token, idx))
+            self.assertEqual(
+                set(orig._token_map), set(node._token_map))
+            self.assertEqual(orig.endpos, node.endpos)
+
+        # the positions seen by the sourcemap writer are identical.
+        for printer in (pretty_printer(), minify_printer(obfuscate=True)):
+            results = []
+            for t in (untabled, tree):
+                stream = StringIO()
+                results.append((
+                    sourcemap.write(printer(t), stream), stream.getvalue()))
+            self.assertEqual(results[0], results[1])
+
+    def test_parse_endpos(self):
+        text = textwrap.dedent("""
+        var a = [1, , , 2], b = {c: 'd'}  // comment
+        for (var e in a.f) {
+          g(e)
+        }
+        for (var h = 1 in a);
+        for (i = 0; i < 1;) break
+        """).strip()
+        tree = parse(text, with_comments=True)
+
+        def source(node):
+            return text[node.lexpos:node.endpos]
+
+        self.assertEqual(len(text), tree.endpos)
+        var_statement, for_in, for_in_init, for_ = tree.children()
+        # the automatically inserted semicolon is not a part of it.
+        self.assertEqual("var a = [1, , , 2], b = {c: 'd'}", source(
+            var_statement))
+        array = var_statement.children()[0].initializer
+        self.assertEqual(', ,', source(array.items[1]))
+        self.assertEqual(
+            ['c', "'d'"], [source(node) for node in walk(
+                var_statement.children()[1].initializer.properties[0])])
+        self.assertEqual('for (var e in a.f) {\n  g(e)\n}', source(for_in))
+        self.assertEqual('var e', source(for_in.item))
+        self.assertEqual('f', source(for_in.iterable.identifier))
+        self.assertEqual('g(e)', source(for_in.statement.children()[0]))
+        self.assertEqual('var h = 1', source(for_in_init.item))
+        self.assertEqual('i = 0', source(for_.init))
+        self.assertEqual('i < 1', source(for_.cond))
+        self.assertEqual('break', source(for_.statement))
+        # the comment is attached to the for statement.
+        comment = for_in.comments.children()[0]
+        self.assertEqual('// comment', source(comment))
+        self.assertEqual(comment.endpos, for_in.comments.endpos)
+
+        lazy = parse(text, with_comments=True, lazy=True)
+        for orig, node in zip(walk(tree), walk(lazy)):
+            self.assertEqual(orig.endpos, node.endpos)
+
+    def test_parse_positions_false(self):
+        text = textwrap.dedent("""
+        var a = function(b) {
+          // comment
+          for (;;) { return b ? [,,] : /c/; }
+        }, d = {e: 'f'};
+        """).strip()
+        tree = parse(text, with_comments=True)
+        untracked = parse(text, with_comments=True, positions=False)
+        repr_walker = ReprWalker()
+        self.assertEqual(
+            repr_walker.walk(tree, pos=False),
+            repr_walker.walk(untracked, pos=False))
+        self.assertEqual(pretty_print(tree), pretty_print(untracked))
+        for node in walk(untracked):
+            self.assertIsNone(node.lineno)
+            self.assertIsNone(node.colno)
+            self.assertIsNone(node.endpos)
+        # the comments retain their positions from the tokens.
+        comment = untracked.children()[0].children()[0].initializer.elements[
+            0].comments.children()[0]
+        self.assertEqual((2, 3), (comment.lineno, comment.colno))
+
+        with pool.parser(positions=False) as parser:
+            self.assertIsNone(parser.lexer.positions)
+            self.assertFalse(parser.yacc_tracking)
+
+        # the unparsers produce the output with the implied positions.
+        stream = StringIO()
+        printer = minify_printer(obfuscate=True)
+        sourcemap.write(printer(untracked), stream)
+        self.assertEqual(
+            stream.getvalue(), minify_printer(obfuscate=True).text(
+                parse(text)))
+        self.assertFalse([
+            chunk for chunk in printer(untracked) if chunk.lineno])
+
+    def test_parse_positions_false_function_statement(self):
+        text = 'var a;\n  function(b) {};'
+        with self.assertRaises(ECMASyntaxError) as e:
+            parse(text, positions=False)
+        self.assertEqual(
+            'Function statement requires a name at 2:11', str(e.exception))
+
+    def test_parse_lazy(self):
+        text = textwrap.dedent("""
+        var x = function(a) {
+          return function() {
+            return a;
+          };
+        };
+        function f(a, b) {
+          if (a) {
+          }
+          /}/.test(a);
+          return {b: {}} / b;
+        }
+        """)
+        tree = parse(text, lazy=True)
+        funcexpr = tree.children()[0].children()[0].initializer
+        funcdecl = tree.children()[1]
+        self.assertNotIn('elements', attributes(funcexpr))
+        self.assertNotIn('elements', attributes(funcdecl))
+        self.assertEqual('a', funcdecl.parameters[0].value)
+        # nested functions remain lazy until accessed.
+        inner = funcexpr.elements[0].expr
+        self.assertTrue(isinstance(inner, asttypes.FuncExpr))
+        self.assertNotIn('elements', attributes(inner))
+        self.assertNotIn('_lazy_elements', attributes(funcexpr))
+        self.assertEqual(repr(parse(text)), repr(tree))
+        self.assertEqual(str(parse(text)), str(tree))
+        for orig, node in zip(walk(parse(text)), walk(tree)):
+            self.assertEqual(orig._token_map, node._token_map)
+
+    def test_parse_lazy_regex_backend(self):
+        text = 'var f = function(a) {\n  return {a: a} / /b/.exec(a);\n};'
+        with pool.parser(lazy=True, lex_backend='regex') as parser:
+            tree = parser.parse(text)
+        funcexpr = tree.children()[0].children()[0].initializer
+        self.assertNotIn('elements', attributes(funcexpr))
+        self.assertEqual(repr(parse(text)), repr(tree))
+
+    def test_parse_lazy_syntax_error_deferred(self):
+        text = 'function f() {\n  var ;\n}'
+        with self.assertRaises(ECMASyntaxError) as e:
+            parse(text)
+        tree = parse(text, lazy=True)
+        with self.assertRaises(ECMASyntaxError) as lazy_e:
+            tree.children()[0].elements
+        self.assertEqual(str(e.exception), str(lazy_e.exception))
+        # the elements remain unavailable
+        with self.assertRaises(ECMASyntaxError):
+            tree.children()[0].children()
+
+    def test_parse_lazy_leading_division(self):
+        # the body starting with something that may be a division must
+        # be handled with the opening brace as the preceding token.
+        repr_walker = ReprWalker()
+        for text in (
+                'function f() {\xa0/r/g}',
+                'var f = function() {\n\xa0/a/;\n};',
+                'function f() {/r/g}\nfunction g() {\n  /a/.test(a)\n}'):
+            for lex_backend in ('ply', 'regex'):
+                try:
+                    expected = repr_walker.walk(Parser(
+                        lex_backend=lex_backend).parse(text), pos=True)
+                except ECMASyntaxError as e:
+                    expected = str(e)
+                tree = Parser(lazy=True, lex_backend=lex_backend).parse(text)
+                try:
+                    result = repr_walker.walk(tree, pos=True)
+                except ECMASyntaxError as e:
+                    result = str(e)
+                self.assertEqual(expected, result)
+
+    def test_parse_lazy_lexer_error(self):
+        with self.assertRaises(ECMASyntaxError):
+            parse('function f() { var a = "unterminated; }', lazy=True)
+        with self.assertRaises(ECMASyntaxError):
+            parse('function f() { if (a) { }', lazy=True)
+
+    def test_parse_lazy_pickle(self):
+        text = 'var x = function(a) { return a; };'
+        tree = pickle.loads(pickle.dumps(parse(text, lazy=True)))
+        self.assertEqual(repr(parse(text)), repr(tree))
+
     def test_read(self):
         stream = StringIO('var foo = "bar";')
         node = read(stream)
@@ -56,10 +316,314 @@ class ParserTestCase(unittest.TestCase, ParserCaseMixin):
         node = read(stream)
         self.assertEqual(node.sourcepath, 'somefile.js')
 
+    def test_parse_many(self):
+        stream = StringIO('var foo = "bar";')
+        stream.name = 'somefile.js'
+        results = parse_many([stream, StringIO('var ;')], workers=2)
+        self.assertTrue(isinstance(results[0], asttypes.ES5Program))
+        self.assertEqual(results[0].sourcepath, 'somefile.js')
+        self.assertTrue(isinstance(results[1], ECMASyntaxError))
+
+    def test_iterparse(self):
+        text = textwrap.dedent("""
+        /* leading */
+        var x = 1;
+        // before the function
+        function f(a) {
+          var inner = a;
+          return inner;
+        }
+        if (x) {
+        }
+        /x/.test(x);
+        label: for (;;) break label;
+        y = 2
+        """)
+        for with_comments in (False, True):
+            program = parse(text, with_comments=with_comments)
+            self.assertEqual(
+                [repr(node) for node in program.children()],
+                [repr(node) for node in iterparse(text, with_comments)],
+            )
+            self.assertEqual(
+                [repr(node.comments) for node in program.children()],
+                [repr(node.comments)
+                    for node in iterparse(text, with_comments)],
+            )
+
+    def test_iterparse_positions(self):
+        text = 'var a = 1;\nfunction f(x) {\n  return x;\n}\nf(a);\n'
+        program = parse(text)
+        elements = list(iterparse(text))
+        # every element is given its own table for the positions.
+        tables = [element._positions for element in elements]
+        self.assertTrue(all(
+            isinstance(table, PositionTable) for table in tables))
+        self.assertEqual(len(tables), len(set(id(t) for t in tables)))
+        for element, table in zip(elements, tables):
+            for node in walk(element):
+                self.assertIs(table, node._positions)
+        for orig, node in zip(
+                walk(program), walk(es5_asttypes.ES5Program(elements))):
+            if orig is not program:
+                self.assertEqual(orig._token_map, node._token_map)
+
+    def test_iterparse_empty(self):
+        self.assertEqual([], list(iterparse('')))
+        self.assertEqual([], list(iterparse('// nothing', True)))
+
+    def test_iterparse_type_error(self):
+        with self.assertRaises(TypeError):
+            list(Parser().iterparse(b'var a;'))
+
+    def test_iterparse_syntax_error(self):
+        parser = Parser()
+        results = parser.iterparse('var a = 1;\nvar b = 2;\nvar c = ;', 1)
+        self.assertEqual('a', next(results).children()[0].identifier.value)
+        self.assertEqual('b', next(results).children()[0].identifier.value)
+        with self.assertRaises(ECMASyntaxError) as e:
+            next(results)
+        self.assertEqual(
+            "Unexpected ';' at 3:9 after '=' at 3:7", str(e.exception))
+        # the parser remains usable.
+        self.assertEqual(
+            'var d = 4;\n', str(parser.parse('var d = 4;')))
+
+    def test_iterparse_closed_early(self):
+        parser = Parser()
+        text = 'var a = 1;\n' * 100
+        results = parser.iterparse(text, buffer_size=1)
+        self.assertEqual('var a = 1;', str(next(results)))
+        results.close()
+        self.assertIsNone(parser._emit)
+        self.assertEqual(100, len(list(parser.iterparse(text))))
+        self.assertEqual(100, len(parser.parse(text).children()))
+
+    def test_validate(self):
+        parser = Parser()
+        self.assertIsNone(parser.validate('var a = 1;\n{}/a/g\na++\nb'))
+        self.assertIsNone(validate(''))
+        self.assertIsNone(validate('x = function() {};'))
+
+    def test_validate_type_error(self):
+        with self.assertRaises(TypeError):
+            Parser().validate(b'var a;')
+
+    def test_validate_syntax_error(self):
+        parser = Parser()
+        original = parser.parser
+        with self.assertRaises(ECMASyntaxError) as e:
+            parser.validate('var a = 1;\nvar b = ;')
+        self.assertEqual(
+            "Unexpected ';' at 2:9 after '=' at 2:7", str(e.exception))
+        self.assertIs(original, parser.parser)
+        # the parser remains usable.
+        self.assertEqual(
+            'var d = 4;\n', str(parser.parse('var d = 4;')))
+
+    def test_validate_function_statement(self):
+        with self.assertRaises(ECMASyntaxError) as e:
+            validate('a;\n  function (x) {}')
+        self.assertEqual(
+            'Function statement requires a name at 2:12', str(e.exception))
+        with self.assertRaises(ECMASyntaxError) as e:
+            validate('function() {};')
+        self.assertEqual(
+            'Function statement requires a name at 1:9', str(e.exception))
+        # like parse, only the bare function expressions are rejected.
+        validate('function() {}.call(a);')
+        validate('(function() {}).call(a);\nfunction f() { g(function(){}) }')
+
+    def assertReparsed(self, text, start, end, replacement, **kwargs):
+        # return the program and the reparsed program, after checking
+        # the latter against the parse of the modified text.
+        program = parse(text, **kwargs)
+        elements = list(program.children())
+        new_text = text[:start] + replacement + text[end:]
+        result = reparse(program, text, new_text, start, end, **kwargs)
+        expected = parse(new_text, **kwargs)
+        repr_walker = ReprWalker()
+        self.assertEqual(
+            repr_walker.walk(expected, pos=True),
+            repr_walker.walk(result, pos=True))
+        self.assertEqual(expected.endpos, result.endpos)
+        for orig, node in zip(walk(expected), walk(result)):
+            self.assertEqual(orig._token_map, node._token_map)
+            self.assertEqual(orig.endpos, node.endpos)
+            self.assertEqual(repr(orig.comments), repr(node.comments))
+        return elements, result.children()
+
+    def test_reparse(self):
+        text = textwrap.dedent("""
+        var a = 1;
+        function f(b) {
+          return b;
+        }
+        if (a) {
+          f(a);
+        }
+        var c = f(a) +
+          2;
+        // the end
+        d = [a, c]
+        """).lstrip()
+        # add lines to the if statement; the parsing starts from the
+        # preceding element.
+        pos = text.index('f(a);') + 5
+        old, new = self.assertReparsed(text, pos, pos, '\n  f(a\n  );')
+        self.assertIs(old[0], new[0])
+        self.assertIsNot(old[1], new[1])
+        self.assertIsNot(old[2], new[2])
+        self.assertIs(old[3], new[3])
+        self.assertEqual(old[3:], new[3:])
+        pos = text.index('b;')
+        old, new = self.assertReparsed(text, pos, pos + 1, 'b * 2')
+        self.assertEqual(old[2:], new[2:])
+        # remove the function declaration
+        pos = text.index('function')
+        old, new = self.assertReparsed(text, pos, text.index('if'), '')
+        self.assertEqual(old[2:], new[1:])
+        # for the edit before the first element.
+        old, new = self.assertReparsed(text, 0, 0, '\n\n  ')
+        self.assertEqual(old[1:], new[1:])
+        # for the edit after the last element.
+        old, new = self.assertReparsed(text, len(text), len(text), 'e();')
+        self.assertEqual(old[:-2], new[:-3])
+        self.assertEqual(6, len(new))
+
+    def test_reparse_comments(self):
+        text = textwrap.dedent("""
+        /* a */
+        var a = 1;
+        // b
+        b();
+        /* c */
+        c();
+        """).lstrip()
+        pos = text.index('1')
+        old, new = self.assertReparsed(
+            text, pos, pos + 1, '2', with_comments=True)
+        self.assertIs(old[2], new[2])
+        # the comments of the element that follows the edit are changed
+        # and so it must be parsed again.
+        pos = text.index('c */')
+        old, new = self.assertReparsed(
+            text, pos, pos + 1, 'x', with_comments=True)
+        self.assertIsNot(old[2], new[2])
+        self.assertEqual(
+            '/* x */', str(new[2].expr.identifier.comments.children()[0]))
+        old, new = self.assertReparsed(
+            text, text.index('// b'), text.index('b();'), '',
+            with_comments=True)
+        self.assertIs(old[2], new[2])
+
+    def test_reparse_joined(self):
+        text = 'var a = b\nc();\nd();\n'
+        # the edit joins the element to the preceding one.
+        pos = text.index('c')
+        old, new = self.assertReparsed(text, pos, pos + 1, '(c)')
+        self.assertEqual(2, len(new))
+        self.assertIs(old[-1], new[-1])
+        old, new = self.assertReparsed(text, pos, pos, '+')
+        self.assertEqual(2, len(new))
+        old, new = self.assertReparsed(
+            'if (a) {}\nb();\nc();\n', 10, 10, 'else ')
+        self.assertEqual(2, len(new))
+        self.assertIs(old[-1], new[-1])
+        # or the following one.
+        pos = text.index(';')
+        old, new = self.assertReparsed(text, pos, pos + 2, '\n+')
+        self.assertEqual(2, len(new))
+
+    def test_reparse_label(self):
+        # the element is started from the label rather than the colon.
+        text = 'a = 1;\nlabel: for (;;) { break label; }\nc = 2;\n'
+        pos = text.index('2')
+        old, new = self.assertReparsed(text, pos, pos + 1, '3')
+        self.assertIs(old[0], new[0])
+        self.assertEqual('c = 3;', str(new[-1]).strip())
+        pos = text.index('1')
+        old, new = self.assertReparsed(text, pos, pos + 1, '2')
+        self.assertIs(old[-1], new[-1])
+        # with the program starting at the reused labelled statement.
+        old, new = self.assertReparsed(
+            'x;\na: for(;;) break a;', 0, 3, '')
+        self.assertIs(old[-1], new[-1])
+        old, new = self.assertReparsed('x;\nl1: l2: b();\n', 0, 3, '')
+        self.assertIs(old[-1], new[-1])
+        text = 'a = 1;\nl1: l2: b();\nc = 2;\n'
+        pos = text.rindex('2')
+        old, new = self.assertReparsed(text, pos, pos + 1, '3')
+        self.assertIs(old[0], new[0])
+
+    def test_reparse_lazy(self):
+        text = 'var f = function() {\n  return 1;\n};\nfunction g() {}\n'
+        pos = text.index('1')
+        old, new = self.assertReparsed(text, pos, pos + 1, '2', lazy=True)
+        self.assertIs(old[-1], new[-1])
+        old, new = self.assertReparsed(text, 0, 0, '\n\n', lazy=True)
+        self.assertIs(old[-1], new[-1])
+        self.assertEqual('return 1;', str(
+            new[0].children()[0].initializer.elements[0]).strip())
+
+    def test_reparse_untracked(self):
+        text = 'var a = 1;\nvar b = 2;\n'
+        program = parse(text, positions=False)
+        with pool.parser(positions=False) as parser:
+            result = parser.reparse(program, text, 'var c = 1;\n', 4, 5)
+        self.assertEqual('var c = 1;\n', str(result))
+        self.assertIsNone(result.children()[0].lineno)
+
+    def test_reparse_errors(self):
+        text = 'var a = 1;\nvar b = 2;\n'
+        parser = Parser()
+        program = parser.parse(text)
+        with self.assertRaises(TypeError):
+            parser.reparse(program, text, b'var c;', 0, 0)
+        with self.assertRaises(ValueError):
+            parser.reparse(program, text, text, 2, 1)
+        with self.assertRaises(ValueError):
+            parser.reparse(program, text, text, 0, len(text) + 1)
+        with self.assertRaises(ECMASyntaxError) as e:
+            parser.reparse(program, text, 'var a = 1;\nvar b = ;\n', 19, 20)
+        self.assertEqual(
+            "Unexpected ';' at 2:9 after '=' at 2:7", str(e.exception))
+
+
+def parse_pickled(value, with_comments=False):
+    return pickle.loads(pickle.dumps(parse(value, with_comments)))
+
+
+def parse_lazy(value, with_comments=False):
+    return parse(value, with_comments, lazy=True)
+
+
+def parse_streamed(value, with_comments=False):
+    return es5_asttypes.ES5Program(list(iterparse(value, with_comments)))
+
+
+def parse_validated(value, with_comments=False):
+    # everything that can be parsed must also be valid.
+    validate(value)
+    return parse(value, with_comments)
+
+
+def parse_untracked(value, with_comments=False):
+    return parse(value, with_comments, positions=False)
+
+
+def parse_regex_backend(value, with_comments=False):
+    with pool.parser(
+            with_comments=with_comments, lex_backend='regex') as parser:
+        return parser.parse(value)
+
 
 ParsedNodeTypeTestCase = build_node_repr_test_cases(
     'ParsedNodeTypeTestCase', parse, 'ES5Program')
 
+PickledNodeTypeTestCase = build_node_repr_test_cases(
+    'PickledNodeTypeTestCase', parse_pickled, 'ES5Program')
+
 # ASI - Automatic Semicolon Insertion
 ParserToECMAASITestCase = build_asi_test_cases(
     'ParserToECMAASITestCase', parse, pretty_print)
@@ -70,5 +634,70 @@ ECMASyntaxErrorsTestCase = build_syntax_error_test_cases(
 ECMARegexSyntaxErrorsTestCase = build_regex_syntax_error_test_cases(
     'ECMARegexSyntaxErrorsTestCase', parse)
 
+LazyNodeTypeTestCase = build_node_repr_test_cases(
+    'LazyNodeTypeTestCase', parse_lazy, 'ES5Program')
+
+LazyECMAASITestCase = build_asi_test_cases(
+    'LazyECMAASITestCase', parse_lazy, pretty_print)
+
+LazyECMASyntaxErrorsTestCase = build_syntax_error_test_cases(
+    'LazyECMASyntaxErrorsTestCase', parse_lazy)
+
+LazyECMARegexSyntaxErrorsTestCase = build_regex_syntax_error_test_cases(
+    'LazyECMARegexSyntaxErrorsTestCase', parse_lazy)
+
+StreamedECMAASITestCase = build_asi_test_cases(
+    'StreamedECMAASITestCase', parse_streamed, pretty_print)
+
+StreamedECMASyntaxErrorsTestCase = build_syntax_error_test_cases(
+    'StreamedECMASyntaxErrorsTestCase', parse_streamed)
+
+StreamedECMARegexSyntaxErrorsTestCase = build_regex_syntax_error_test_cases(
+    'StreamedECMARegexSyntaxErrorsTestCase', parse_streamed)
+
+ValidatedNodeTypeTestCase = build_node_repr_test_cases(
+    'ValidatedNodeTypeTestCase', parse_validated, 'ES5Program')
+
+ValidatedECMAASITestCase = build_asi_test_cases(
+    'ValidatedECMAASITestCase', parse_validated, pretty_print)
+
+ValidatedECMASyntaxErrorsTestCase = build_syntax_error_test_cases(
+    'ValidatedECMASyntaxErrorsTestCase', validate)
+
+ValidatedECMARegexSyntaxErrorsTestCase = build_regex_syntax_error_test_cases(
+    'ValidatedECMARegexSyntaxErrorsTestCase', validate)
+
+UntrackedECMAASITestCase = build_asi_test_cases(
+    'UntrackedECMAASITestCase', parse_untracked, pretty_print)
+
+UntrackedECMASyntaxErrorsTestCase = build_syntax_error_test_cases(
+    'UntrackedECMASyntaxErrorsTestCase', parse_untracked)
+
+UntrackedECMARegexSyntaxErrorsTestCase = build_regex_syntax_error_test_cases(
+    'UntrackedECMARegexSyntaxErrorsTestCase', parse_untracked)
+
+RegexBackendNodeTypeTestCase = build_node_repr_test_cases(
+    'RegexBackendNodeTypeTestCase', parse_regex_backend, 'ES5Program')
+
+RegexBackendECMAASITestCase = build_asi_test_cases(
+    'RegexBackendECMAASITestCase', parse_regex_backend, pretty_print)
+
+RegexBackendECMASyntaxErrorsTestCase = build_syntax_error_test_cases(
+    'RegexBackendECMASyntaxErrorsTestCase', parse_regex_backend)
+
+RegexBackendECMARegexSyntaxErrorsTestCase = (
+    build_regex_syntax_error_test_cases(
+        'RegexBackendECMARegexSyntaxErrorsTestCase', parse_regex_backend))
+
 ParsedNodeTypesWithCommentsTestCase = build_comments_test_cases(
     'ParsedNodeTypeWithCommentsTestCase', parse, 'ES5Program')
+
+PickledNodeTypesWithCommentsTestCase = build_comments_test_cases(
+    'PickledNodeTypesWithCommentsTestCase', parse_pickled, 'ES5Program')
+
+LazyNodeTypesWithCommentsTestCase = build_comments_test_cases(
+    'LazyNodeTypesWithCommentsTestCase', parse_lazy, 'ES5Program')
+
+RegexBackendNodeTypesWithCommentsTestCase = build_comments_test_cases(
+    'RegexBackendNodeTypesWithCommentsTestCase', parse_regex_backend,
+    'ES5Program')
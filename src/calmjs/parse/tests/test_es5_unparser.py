@@ -22,6 +22,7 @@ from calmjs.parse.handlers.indentation import indent
 from calmjs.parse.unparsers.es5 import Unparser
 from calmjs.parse.unparsers.es5 import definitions
 from calmjs.parse.unparsers.es5 import pretty_print
+from calmjs.parse.unparsers.es5 import pretty_printer
 from calmjs.parse.unparsers.es5 import minify_printer
 from calmjs.parse.unparsers.es5 import minify_print
 
@@ -498,6 +499,41 @@ class OtherUsageTestCase(unittest.TestCase):
         self.assertNotIn('do', minified)
         self.assertIn('dp', minified)
 
+    def test_reused_unparser_independent_runs(self):
+        tree = es5(textwrap.dedent("""
+        function foo(bar) {
+          if (bar) {
+            return bar;
+          }
+        }
+        """).strip())
+        unparser = pretty_printer(indent_str='  ')
+        expected = pretty_print(tree)
+        first = unparser(tree)
+        second = unparser(tree)
+        # interleave the two runs; each run should have its own state
+        # for the indentation level.
+        chunks = []
+        for a, b in zip(first, second):
+            chunks.append((a, b))
+        self.assertEqual(expected, ''.join(a.text for a, b in chunks))
+        self.assertEqual(expected, ''.join(b.text for a, b in chunks))
+        self.assertEqual(expected, ''.join(c.text for c in unparser(tree)))
+
+    def test_reused_minify_printer_obfuscate(self):
+        printer = minify_printer(obfuscate=True)
+        first = es5('(function(){var foo = 1; var bar = foo;})();')
+        second = es5('(function(){var baz = 1; return baz;})();')
+        self.assertEqual(
+            '(function(){var a=1;var b=a;})();',
+            ''.join(c.text for c in printer(first)))
+        self.assertEqual(
+            '(function(){var a=1;return a;})();',
+            ''.join(c.text for c in printer(second)))
+        self.assertEqual(
+            '(function(){var a=1;var b=a;})();',
+            ''.join(c.text for c in printer(first)))
+
 
 def parse_to_sourcemap_tokens_pretty(text):
     return quad(Unparser(rules=(
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import pickle
 import unittest
 
 from calmjs.parse import asttypes
@@ -58,6 +59,27 @@ class SRFactoryTestCase(unittest.TestCase):
         self.assertEqual(str(custom_node), 'This is a Node')
         self.assertTrue(repr(custom_node).startswith('Node has id'))
 
+    def test_asttypes_unnamed_not_picklable(self):
+        custom_asttypes = AstTypesFactory(str, repr)
+        self.assertIsNone(custom_asttypes.name)
+        with self.assertRaises(TypeError):
+            pickle.dumps(custom_asttypes)
+        with self.assertRaises(pickle.PicklingError):
+            pickle.dumps(custom_asttypes.Node())
+
+    def test_asttypes_named(self):
+        from calmjs.parse.parsers.es5 import asttypes as es5_asttypes
+        self.assertEqual(
+            'calmjs.parse.parsers.es5.asttypes', es5_asttypes.name)
+        self.assertEqual(
+            'calmjs.parse.parsers.es5', es5_asttypes.Node.__module__)
+        self.assertEqual('asttypes.Node', es5_asttypes.Node.__qualname__)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertIs(es5_asttypes, pickle.loads(
+                pickle.dumps(es5_asttypes, protocol)))
+            self.assertIs(es5_asttypes.Node, pickle.loads(
+                pickle.dumps(es5_asttypes.Node, protocol)))
+
 
 class ParserUnparserFactoryTestCase(unittest.TestCase):
 
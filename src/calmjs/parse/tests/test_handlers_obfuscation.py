@@ -161,6 +161,75 @@ class ScopeTestCase(unittest.TestCase):
 
         self.assertEqual({'window': 2}, root.referenced_symbols)
 
+    def test_frozen(self):
+        root = Scope(None)
+        child = root.nest(None)
+        grandchild = child.nest(None)
+        self.assertFalse(grandchild.frozen)
+        grandchild.close()
+        child.close()
+        # parent still open
+        self.assertFalse(grandchild.frozen)
+        self.assertFalse(child.frozen)
+        root.close()
+        self.assertTrue(grandchild.frozen)
+        self.assertTrue(child.frozen)
+        self.assertTrue(root.frozen)
+
+    def test_frozen_memoized(self):
+        root = Scope(None)
+        root.declare('root')
+        child1 = root.nest(None)
+        child1.declare('a')
+        grandchild1_1 = child1.nest(None)
+        grandchild1_1.reference('a')
+        grandchild1_1.reference('root')
+        grandchild1_1.reference('foo')
+        child2 = root.nest(None)
+        grandchild2_1 = child2.nest(None)
+        grandchild2_1.reference('bar')
+        grandchild2_1.declare('foo')
+
+        # not memoized while the scopes remain open.
+        self.assertEqual({'foo', 'bar'}, root.global_symbols_in_children)
+        self.assertIsNot(
+            root.global_symbols_in_children, root.global_symbols_in_children)
+        root.close_all()
+
+        self.assertEqual({'root', 'a'}, grandchild1_1.declared_symbols)
+        self.assertEqual({'foo'}, grandchild1_1.global_symbols)
+        self.assertEqual({'a', 'root', 'foo'}, grandchild1_1.non_local_symbols)
+        self.assertEqual({'bar'}, grandchild2_1.global_symbols)
+        self.assertEqual({'foo'}, child1.global_symbols)
+        self.assertEqual({'foo'}, child1.global_symbols_in_children)
+        self.assertEqual({'bar'}, child2.global_symbols_in_children)
+        self.assertEqual({'foo', 'bar'}, root.global_symbols)
+        self.assertEqual({'foo', 'bar'}, root.global_symbols_in_children)
+        self.assertIs(
+            root.global_symbols_in_children, root.global_symbols_in_children)
+        self.assertIs(
+            grandchild1_1.declared_symbols, grandchild1_1.declared_symbols)
+
+    def test_deeply_nested_scopes(self):
+        root = Scope(None)
+        scope = root
+        scopes = []
+        for idx in range(200):
+            scope = scope.nest(None)
+            scope.declare('v%d' % idx)
+            scope.reference('g%d' % idx)
+            scopes.append(scope)
+        scope.reference('v0')
+        for scope in reversed(scopes):
+            scope.close()
+        root.close()
+        root.build_remap_symbols(NameGenerator())
+        self.assertEqual(
+            {'g%d' % idx for idx in range(200)}, root.global_symbols)
+        self.assertEqual({'g199'}, scopes[-2].global_symbols_in_children)
+        self.assertNotEqual(
+            scopes[-1].resolve('v0'), scopes[-1].resolve('v199'))
+
     def test_close_all_check_references(self):
         # for ease of counting everything
         root = Scope(None)
@@ -3,9 +3,12 @@ from __future__ import unicode_literals
 
 import unittest
 import base64
+import codecs
 import json
 from io import StringIO
 from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
 from tempfile import mktemp
 
 from calmjs.parse.exceptions import ECMASyntaxError
@@ -13,6 +16,7 @@ from calmjs.parse.asttypes import Node
 from calmjs.parse.ruletypes import Attr
 from calmjs.parse.ruletypes import Text
 from calmjs.parse.unparsers.base import BaseUnparser
+from calmjs.parse.parsers.es5 import parse
 from calmjs.parse import io
 
 
@@ -376,3 +380,63 @@ class IOTestCase(unittest.TestCase):
 
         with self.assertRaises(TypeError):
             io.write(unparser, '', stream)
+
+
+class ParseManyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = mkdtemp()
+        self.addCleanup(rmtree, self.root)
+        self.paths = []
+        for idx, text in enumerate([
+                'var a = 1;', 'var b = ;', 'var c = "\u2603";']):
+            path = join(self.root, '%d.js' % idx)
+            with codecs.open(path, 'w', encoding='utf8') as fd:
+                fd.write(text)
+            self.paths.append(path)
+
+    def assertResults(self, results):
+        self.assertEqual(5, len(results))
+        self.assertEqual('var a = 1;\n', str(results[0]))
+        self.assertEqual(self.paths[0], results[0].sourcepath)
+        self.assertTrue(isinstance(results[1], ECMASyntaxError))
+        self.assertEqual(
+            "Unexpected ';' at 1:9 after '=' at 1:7 in %r" % self.paths[1],
+            str(results[1]))
+        self.assertEqual('var c = "\u2603";\n', str(results[2]))
+        self.assertEqual(self.paths[2], results[2].sourcepath)
+        # streams
+        self.assertEqual('var d = 4;\n', str(results[3]))
+        self.assertEqual('stream.js', results[3].sourcepath)
+        self.assertTrue(isinstance(results[4], ECMASyntaxError))
+        self.assertIn("Unexpected ')' at 1:4 after '(' at 1:3 in <", str(
+            results[4]))
+
+    def make_inputs(self):
+        stream = StringIO('var d = 4;')
+        stream.name = 'stream.js'
+        return self.paths + [stream, StringIO('f(()')]
+
+    def test_parse_many_workers(self):
+        self.assertResults(io.parse_many(
+            parse, self.make_inputs(), workers=2))
+
+    def test_parse_many_serial(self):
+        self.assertResults(io.parse_many(
+            parse, self.make_inputs(), workers=1))
+
+    def test_parse_many_same_as_read(self):
+        results = io.parse_many(parse, self.paths[:1], workers=2)
+        with codecs.open(self.paths[0], encoding='utf8') as fd:
+            result = io.read(parse, fd)
+        self.assertEqual(result.sourcepath, results[0].sourcepath)
+        self.assertEqual(repr(result), repr(results[0]))
+
+    def test_parse_many_callable(self):
+        stream = StringIO('var e = 5;')
+        results = io.parse_many(parse, [lambda: stream], workers=1)
+        self.assertEqual('var e = 5;\n', str(results[0]))
+        self.assertTrue(stream.closed)
+
+    def test_parse_many_empty(self):
+        self.assertEqual([], io.parse_many(parse, []))
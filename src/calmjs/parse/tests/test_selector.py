@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import textwrap
+import unittest
+
+from calmjs.parse import es5
+from calmjs.parse import selector
+from calmjs.parse.parsers.es5 import asttypes
+from calmjs.parse.unparsers.es5 import pretty_print
+from calmjs.parse.walkers import NodeIndex
+from calmjs.parse.walkers import Walker
+
+
+source = textwrap.dedent("""
+var a = require('a'), b = require("b");
+function f(x, y) {
+  function g() {
+    return x.require('c');
+  }
+  if (x) {
+    return y + 1;
+  }
+  return g();
+}
+a.b.c(f(1, 'd'));
+""").strip()
+
+
+class SelectorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = es5(source)
+
+    def assertSelected(self, expected, text):
+        # selected through both the traversal and the index.
+        results = [pretty_print(node) for node in selector.select(
+            self.tree, text)]
+        self.assertEqual(expected, results)
+        self.assertEqual(expected, [
+            pretty_print(node) for node in selector.select(
+                self.tree, text, index=NodeIndex(self.tree))])
+
+    def test_types(self):
+        self.assertSelected(
+            ["require('a')", 'require("b")'], 'VarDecl > FunctionCall')
+        self.assertSelected(['f', 'x', 'y', 'g'], 'FuncDecl > Identifier')
+        self.assertSelected(['return y + 1;'], 'If Return')
+        self.assertSelected(['x'], 'FuncDecl > Identifier[value=x]')
+        self.assertSelected([
+            "x.require('c')", 'g()', "a.b.c(f(1, 'd'))", "f(1, 'd')",
+        ], 'FuncDecl FunctionCall[identifier], Program > * > FunctionCall, '
+            'Arguments > *[args]')
+        self.assertSelected(['1', '1'], 'Number')
+        self.assertSelected([], 'Object')
+        self.assertSelected([], 'Number Number')
+
+    def test_combinators(self):
+        self.assertSelected([
+            'return y + 1;',
+        ], 'FuncDecl > If Return')
+        self.assertSelected([
+            "return x.require('c');", 'return y + 1;', 'return g();',
+        ], 'FuncDecl Return')
+        self.assertSelected([
+            "return x.require('c');",
+        ], 'FuncDecl FuncDecl Return')
+        self.assertSelected([
+            "return x.require('c');", 'return g();',
+        ], 'FuncDecl > * > Return, FuncDecl>Return')
+        self.assertSelected(['a.b'], 'DotAccessor > DotAccessor')
+        self.assertSelected(['a.b.c'], 'ExprStatement > * > DotAccessor')
+        self.assertSelected([], 'VarStatement > FunctionCall')
+        # the root of the tree may be matched as an ancestor
+        self.assertSelected(
+            ['f', 'x', 'y'], 'ES5Program > FuncDecl > Identifier')
+
+    def test_attributes(self):
+        self.assertSelected([
+            "x.require"
+        ], 'FunctionCall > DotAccessor[identifier.value="require"]')
+        self.assertSelected([
+            "require('a')", 'require("b")',
+        ], 'FunctionCall[identifier.value$=quire]')
+        self.assertSelected([
+            "require('a')", 'require("b")',
+        ], "FunctionCall[identifier.value='require']")
+        self.assertSelected([
+            "'a'", '"b"',
+        ], "FunctionCall[identifier.value=\"require\"] String")
+        self.assertSelected([
+            "'a'", "'c'", "'d'",
+        ], "String[value^=\"'\"]")
+        self.assertSelected(['"b"'], "String[value*=b]")
+        self.assertSelected([
+            'a', 'b', 'f', 'y', 'g', 'y', 'g', 'a', 'b', 'c', 'f',
+        ], "Identifier[value!=x][value != 'require']")
+        # non-string attributes
+        self.assertSelected([], "FunctionCall[identifier=x]")
+        self.assertSelected(['1', '1'], "Number[missing!='1']")
+        self.assertSelected([], "Number[missing]")
+
+    def test_quoted_escapes(self):
+        tree = es5(r"""f('\'', "\"");""")
+        self.assertEqual(["'\\''"], [
+            node.value for node in selector.select(
+                tree, r'''String[value="'\\''"]''')])
+        self.assertEqual(['"\\""'], [
+            node.value for node in selector.select(
+                tree, r"""String[value='"\\""']""")])
+
+    def test_invalid(self):
+        for text in (
+                '', ' ', '>', 'A >', '> A', 'A,', ',A', 'A, > B', 'A > > B',
+                'A >, B', 'A B]', 'A[', 'A[value=]', 'A[value="x]',
+                'FuncDecl*', '**', '[value]Number', 'A.b', 'A[.b]'):
+            with self.assertRaises(ValueError):
+                selector.Selector(text)
+
+        with self.assertRaises(ValueError) as e:
+            selector.Selector('FuncDecl > Missing')
+        self.assertIn("unknown node type 'Missing'", str(e.exception))
+        with self.assertRaises(ValueError):
+            selector.Selector('Node > attributes')
+
+    def test_select_errors(self):
+        with self.assertRaises(TypeError):
+            selector.select('not_a_node', 'Node')
+        with self.assertRaises(TypeError):
+            selector.select(asttypes.ExprStatement('not_a_node'), 'Node')
+        with self.assertRaises(ValueError):
+            selector.select(self.tree, 'Node', index=NodeIndex(
+                self.tree.children()[0]))
+
+    def test_selector(self):
+        compiled = selector.Selector('FuncDecl Return, If')
+        self.assertEqual("<Selector 'FuncDecl Return, If'>", repr(compiled))
+        self.assertEqual(
+            ['Return', 'If'], [cls.__name__ for cls in compiled.types])
+        self.assertIsNone(selector.Selector('If *').types)
+        self.assertIs(compiled, selector.compile(compiled))
+        self.assertEqual(4, len(selector.select(self.tree, compiled)))
+
+    def test_compile_cache(self):
+        self.addCleanup(setattr, selector, 'CACHE_SIZE', selector.CACHE_SIZE)
+        selector.CACHE_SIZE = 2
+        first = selector.compile('If')
+        self.assertIs(first, selector.compile('If'))
+        second = selector.compile('Return')
+        # the first one is more recently used after this.
+        self.assertIs(first, selector.compile('If'))
+        selector.compile('Number')
+        self.assertIs(first, selector.compile('If'))
+        self.assertIsNot(second, selector.compile('Return'))
+
+    def test_walker_select(self):
+        walker = Walker()
+        self.assertEqual(['return y + 1;'], [
+            pretty_print(node)
+            for node in walker.select(self.tree, 'If Return')
+        ])
+        index = walker.index(self.tree)
+        self.assertEqual(
+            ['x', 'require', 'y', 'g'],
+            [node.value for node in walker.select(
+                self.tree, selector.compile('Return Identifier'))]
+        )
+        self.assertIs(index, walker.index(self.tree))
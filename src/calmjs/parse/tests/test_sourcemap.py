@@ -917,6 +917,55 @@ class SourceMapTestCase(unittest.TestCase):
             [(0, 0, 0, 0, 0), (1, 0, 0, 7), (20, 1, 0, -7, 0), (1, 0, 0, 7)],
         ])
 
+    def test_unusual_line_boundaries(self):
+        # these are split by str.splitlines, but are not treated as
+        # new lines in the generated output.
+        stream = StringIO()
+        fragments = [
+            ('var', 1, 1, None, 'a.js'),
+            (' ', 0, 0, None, None),
+            ('s', 1, 5, None, 'a.js'),
+            ('=', 1, 7, None, 'a.js'),
+            ("' '", 1, 9, None, 'a.js'),
+            (';', 1, 12, None, 'a.js'),
+            ('\f', None, None, None, None),
+            ('x', 2, 1, 'longer', 'a.js'),
+        ]
+        mappings, sources, names = sourcemap.write(
+            fragments, stream, normalize=False)
+        self.assertEqual(stream.getvalue(), "var s=' ';\fx")
+        self.assertEqual(mappings, [[
+            (0, 0, 0, 0), (3, 0, 0, 3), (1, 0, 0, 1), (1, 0, 0, 2),
+            (1, 0, 0, 2), (2, 0, 0, 0), (1, 0, 0, 3), (1,),
+            (1, 0, 1, -11, 0),
+        ]])
+        self.assertEqual(sources, ['a.js'])
+        self.assertEqual(names, ['longer'])
+
+    def test_write_buffered(self):
+        fragments = [
+            ('a', 1, 1, 'console', 'demo.js'),
+            ('.', 1, 8, None, 'demo.js'),
+            ('log', 1, 9, None, 'demo.js'),
+            ('(', 1, 12, None, 'demo.js'),
+            ('"hello world"', 1, 13, None, 'demo.js'),
+            (')', 1, 26, None, 'demo.js'),
+            (';', 1, 27, None, 'demo.js'),
+            ('\n', 0, 0, None, None),
+        ] * 3
+        stream = StringIO()
+        expected = sourcemap.write(fragments, stream)
+        original = sourcemap.WRITE_BUFFER_SIZE
+        sourcemap.WRITE_BUFFER_SIZE = 2
+        try:
+            buffered = StringIO()
+            self.assertEqual(
+                expected, sourcemap.write(fragments, buffered))
+        finally:
+            sourcemap.WRITE_BUFFER_SIZE = original
+        self.assertEqual(stream.getvalue(), buffered.getvalue())
+        self.assertEqual(3, stream.getvalue().count('a.log("hello world");'))
+
     def test_encode_sourcemap(self):
         sm = sourcemap.encode_sourcemap(
             'hello.min.js', [
@@ -4,6 +4,9 @@ from __future__ import unicode_literals
 import unittest
 
 from calmjs.parse.asttypes import Node
+from calmjs.parse.ruletypes import Attr
+from calmjs.parse.ruletypes import StreamFragment
+from calmjs.parse.ruletypes import Text
 from calmjs.parse.unparsers.base import logger
 from calmjs.parse.unparsers.base import BaseUnparser
 from calmjs.parse.unparsers.walker import Dispatcher
@@ -77,6 +80,41 @@ class BaseUnparserTestCase(unittest.TestCase):
         self.assertEqual([], list(unparser(root)))
         self.assertEqual(len(prewalk), 2)
 
+    def test_optimized_definitions_shared(self):
+        dispatchers = []
+
+        def prewalk_dummy(dispatcher, node):
+            dispatchers.append(dispatcher)
+            return node
+
+        root = Node()
+        definitions = {'Node': ()}
+        unparser = BaseUnparser(definitions, prewalk_hooks=[prewalk_dummy])
+        self.assertEqual([], list(unparser(root)))
+        self.assertEqual([], list(unparser(root)))
+        first, second = dispatchers
+        self.assertIsNot(first, second)
+        self.assertIs(unparser.cache, first.cache)
+        self.assertIs(
+            first.get_optimized_definition(root),
+            second.get_optimized_definition(root),
+        )
+
+    def test_text(self):
+        node = Node()
+        node.value = 'value'
+        definitions = {'Node': (Text(value='<'), Attr('value'), Text(
+            value='>'))}
+        unparser = BaseUnparser(definitions)
+        self.assertEqual('<value>', unparser.text(node))
+
+    def test_text_custom_walk(self):
+        def walk(dispatcher, node, definition=None):
+            yield StreamFragment('custom', None, None, None, None)
+
+        unparser = BaseUnparser({'Node': ()}, walk=walk)
+        self.assertEqual('custom', unparser.text(Node()))
+
     def test_token_handler_default(self):
         stream = setup_logger(self, logger)
         definitions = {}
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import gc
+import unittest
+import textwrap
+from weakref import ref
+
+from calmjs.parse.asttypes import VarStatement
+from calmjs.parse.asttypes import Identifier
+from calmjs.parse.lexers.es5 import Lexer
+from calmjs.parse.parsers.es5 import parse
+from calmjs.parse.ruletypes import (
+    Attr,
+    Text,
+    Token,
+    Space,
+    children_comma,
+)
+from calmjs.parse.unparsers import compiler
+from calmjs.parse.unparsers import walker
+from calmjs.parse.unparsers.es5 import Unparser
+from calmjs.parse.unparsers.es5 import minify_print
+from calmjs.parse.unparsers.es5 import pretty_print
+from calmjs.parse.unparsers.walker import Dispatcher
+from calmjs.parse import rules
+
+from calmjs.parse.tests.test_unparsers_walker import setup_handlers
+
+program = textwrap.dedent("""
+/* leading comment */
+var a = 1, b = [1, , 2, , , 3], c = {"x": a, y: /re/g};
+function f(x, y) {
+  // line comment
+  if (x) {
+    return x + y;
+  } else if (y) {
+    throw new Error('no');
+  }
+  for (var i = 0; i < 10; i++) {
+    a += i;
+  }
+  for (var k in c) continue;
+  do { b--; } while (b > 0)
+  switch (x) {
+    case 1:
+      break;
+    default:
+      x = void 0;
+  }
+  try {
+    x.y(z);
+  } catch (e) {
+    label: while (true) break label;
+  } finally {
+    delete x.y;
+  }
+  return typeof x === 'string' ? x : (x, y);
+}
+var g = function named() { return this; }, h = new f;
+""").strip()
+
+
+class CompiledWalkTestCase(unittest.TestCase):
+
+    def assertSameStream(self, unparser_rules, text=program, **kw):
+        tree = parse(text, **kw)
+        interpreted = list(Unparser(rules=unparser_rules)(tree))
+        compiled = list(
+            Unparser(rules=unparser_rules, walk=compiler.walk)(tree))
+        self.assertTrue(interpreted)
+        self.assertEqual(interpreted, compiled)
+        # the text mode should produce the identical text.
+        self.assertEqual(
+            ''.join(chunk.text for chunk in interpreted),
+            Unparser(rules=unparser_rules).text(tree),
+        )
+
+    def test_pretty_print(self):
+        self.assertSameStream((rules.indent(indent_str='  '),))
+
+    def test_pretty_print_comments(self):
+        self.assertSameStream(
+            (rules.indent(indent_str='  '),), with_comments=True)
+
+    def test_minify_print(self):
+        self.assertSameStream((rules.minify(),))
+
+    def test_minify_print_drop_semi(self):
+        self.assertSameStream((rules.minify(drop_semi=True),))
+
+    def test_obfuscate(self):
+        self.assertSameStream((rules.minify(), rules.obfuscate(
+            reserved_keywords=Lexer.keywords_dict.keys())))
+
+    def test_without_yield_from(self):
+        original = compiler.YIELD_FROM
+        compiler.YIELD_FROM = False
+        try:
+            self.assertSameStream((rules.indent(indent_str='  '),))
+        finally:
+            compiler.YIELD_FROM = original
+
+    def test_sourcepath(self):
+        tree = parse(program)
+        tree.sourcepath = 'program.js'
+        tree.children()[1].sourcepath = 'f.js'
+        unparser_rules = (rules.indent(),)
+        self.assertEqual(
+            list(Unparser(rules=unparser_rules)(tree)),
+            list(Unparser(rules=unparser_rules, walk=compiler.walk)(tree)),
+        )
+
+    def test_render_table_cached_per_dispatcher(self):
+        token_handler, layout_handlers, deferrable_handlers, _ = (
+            setup_handlers(self))
+        dispatcher = Dispatcher(
+            Unparser().definitions, token_handler,
+            layout_handlers, deferrable_handlers)
+        table = compiler.get_render_table(dispatcher)
+        self.assertIs(table, compiler.get_render_table(dispatcher))
+        self.assertEqual(0, len(table))
+        tree = parse('var x = 1;')
+        list(compiler.walk(dispatcher, tree))
+        self.assertIn(type(tree), table)
+        self.assertIn(type(tree.children()[0]), table)
+        self.assertNotIn(VarStatement, table)
+
+    def test_render_table_released_with_dispatcher(self):
+        unparser = Unparser()
+        tree = parse('var x = 1;')
+        dispatchers = []
+        for text in (False, True, False, True):
+            dispatcher, node = unparser.prewalk(tree)
+            if text:
+                compiler.render_text(dispatcher, node)
+            else:
+                list(compiler.walk(dispatcher, node))
+            dispatchers.append(ref(dispatcher))
+        del dispatcher
+        gc.collect()
+        self.assertEqual([None] * 4, [r() for r in dispatchers])
+
+    def test_printers_release_dispatchers(self):
+        def live_dispatchers():
+            gc.collect()
+            return sum(
+                isinstance(obj, Dispatcher) for obj in gc.get_objects())
+
+        tree = parse(program)
+
+        def render():
+            pretty_print(tree)
+            minify_print(tree)
+            minify_print(tree, obfuscate=True)
+
+        render()
+        count = live_dispatchers()
+        for _ in range(20):
+            render()
+        self.assertEqual(count, live_dispatchers())
+
+
+class CompiledFallbackTestCase(unittest.TestCase):
+    """
+    Rules unknown to the compiler must be executed as they are.
+    """
+
+    def setUp(self):
+        (self.token_handler, self.layout_handlers, self.deferrable_handlers,
+            _) = setup_handlers(self)
+
+    def render(self, walk, definitions, node, definition=None):
+        dispatcher = Dispatcher(
+            definitions, self.token_handler,
+            self.layout_handlers, self.deferrable_handlers)
+        return ''.join(
+            c.text for c in walk(dispatcher, node, definition=definition))
+
+    def test_custom_token(self):
+        class Upper(Token):
+            def __call__(self, walk, dispatcher, node):
+                for chunk in walk(
+                        dispatcher, getattr(node, self.attr).upper(),
+                        token=self):
+                    yield chunk
+
+        definitions = {
+            'VarStatement': (
+                Text(value='var'), Space, children_comma, Text(value=';'),),
+            'VarDecl': (Attr('identifier'), Space, Attr('initializer'),),
+            'Identifier': (Upper('value'),),
+            'Number': (Attr('value'),),
+        }
+        node = parse('var x = 1, y = 2;').children()[0]
+        self.assertEqual(
+            'var X 1, Y 2;', self.render(walker.walk, definitions, node))
+        self.assertEqual(
+            'var X 1, Y 2;', self.render(compiler.walk, definitions, node))
+
+    def test_custom_token_text(self):
+        class Upper(Token):
+            def __call__(self, walk, dispatcher, node):
+                for chunk in walk(
+                        dispatcher, getattr(node, self.attr).upper(),
+                        token=self):
+                    yield chunk
+
+        definitions = {
+            'VarStatement': (
+                Text(value='var'), Space, children_comma, Text(value=';'),),
+            'VarDecl': (Attr('identifier'), Space, Attr('initializer'),),
+            'Identifier': (Upper('value'),),
+            'Number': (Attr('value'),),
+        }
+        node = parse('var x = 1, y = 2;').children()[0]
+        dispatcher = Dispatcher(
+            definitions, self.token_handler,
+            self.layout_handlers, self.deferrable_handlers)
+        self.assertEqual(
+            'var X 1, Y 2;', compiler.render_text(dispatcher, node))
+        # not one of the known token handlers, so it is invoked.
+        self.assertEqual(7, len(self.tokens_handled))
+
+    def test_explicit_definition(self):
+        definitions = {'Identifier': (Attr('value'),)}
+        node = Identifier('x')
+        definition = (Text(value='<'), Attr('value'), Text(value='>'))
+        self.assertEqual('<x>', self.render(
+            walker.walk, definitions, node, definition))
+        self.assertEqual('<x>', self.render(
+            compiler.walk, definitions, node, definition))
+        dispatcher = Dispatcher(
+            definitions, self.token_handler,
+            self.layout_handlers, self.deferrable_handlers)
+        self.assertEqual('<x>', compiler.render_text(
+            dispatcher, node, definition))
+
+
+class CompileDefinitionTestCase(unittest.TestCase):
+
+    def test_shared_code(self):
+        definition = [Text(value='a'), Attr('value')]
+        first = compiler.compile_definition('Identifier', definition)
+        second = compiler.compile_definition('Identifier', [
+            Text(value='b'), Attr('value')])
+        self.assertIsNot(first, second)
+        self.assertIs(first.__code__, second.__code__)
+
+    def test_empty_definition(self):
+        bind = compiler.compile_definition('Identifier', [])
+        render = bind(None, {}, None, None)
+        self.assertEqual([], list(render(Identifier('x'), [None])))
@@ -10,6 +10,7 @@ from calmjs.parse.asttypes import VarStatement
 from calmjs.parse.asttypes import VarDecl
 from calmjs.parse.unparsers.walker import Dispatcher
 from calmjs.parse.unparsers.walker import walk
+from calmjs.parse.handlers.core import rule_handler_noop
 from calmjs.parse.ruletypes import (
     Attr,
     JoinAttr,
@@ -221,3 +222,43 @@ class DispatcherTestcase(unittest.TestCase):
         marker = tuple()
         dispatcher = Dispatcher({'Node': marker}, {}, {}, {})
         self.assertEqual(dict(dispatcher), {'Node': marker})
+
+    def test_cache_optimized_definitions(self):
+        cache = {}
+        definitions = {'Node': (Text(value='x'), Space, Newline)}
+        node = Node()
+        d1 = Dispatcher(
+            definitions, None, {Space: rule_handler_noop}, {}, cache=cache)
+        d2 = Dispatcher(
+            definitions, None, {Space: rule_handler_noop}, {}, cache=cache)
+        d3 = Dispatcher(
+            definitions, None, {Newline: rule_handler_noop}, {}, cache=cache)
+        self.assertIs(d1.cache, cache)
+        self.assertEqual(2, len(cache))
+        self.assertIs(
+            d1.get_optimized_definition(node),
+            d2.get_optimized_definition(node),
+        )
+        self.assertIsNot(
+            d1.get_optimized_definition(node),
+            d3.get_optimized_definition(node),
+        )
+
+    def test_cache_handlers_resolved_per_dispatcher(self):
+        cache = {}
+        definitions = {'Node': (Text(value='x'), Space, Text(value='y'))}
+        node = Node()
+
+        def token_handler(token, dispatcher, node, value, stack):
+            yield SimpleChunk(value)
+
+        def handler_dispatcher(marker):
+            def handler(dispatcher, node, before, after, prev):
+                yield SimpleChunk(marker)
+            return Dispatcher(
+                definitions, token_handler, {Space: handler}, {}, cache=cache)
+
+        d1 = handler_dispatcher('_')
+        d2 = handler_dispatcher('-')
+        self.assertEqual('x_y', ''.join(c.text for c in walk(d1, node)))
+        self.assertEqual('x-y', ''.join(c.text for c in walk(d2, node)))
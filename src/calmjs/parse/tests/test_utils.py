@@ -7,6 +7,7 @@ from os.path import sep
 
 from collections import namedtuple
 from calmjs.parse import utils
+from calmjs.parse.utils import ParserPool
 
 
 class UtilsTestCase(unittest.TestCase):
@@ -107,3 +108,47 @@ class FileNormTestCase(unittest.TestCase):
 
         self.assertEqual(relative, utils.normrelpath(absolute, relative))
         self.assertEqual(absolute, utils.normrelpath(relative, absolute))
+
+
+class ParserPoolTestCase(unittest.TestCase):
+
+    def test_reuse(self):
+        created = []
+
+        def factory(**kw):
+            created.append(kw)
+            return object()
+
+        pool = ParserPool(factory)
+        with pool.parser(a=1) as p1:
+            pass
+        with pool.parser(a=1) as p2:
+            self.assertIs(p1, p2)
+            # checked out instances are not shared
+            with pool.parser(a=1) as p3:
+                self.assertIsNot(p2, p3)
+        with pool.parser(a=2) as p4:
+            self.assertIsNot(p1, p4)
+        self.assertEqual([{'a': 1}, {'a': 1}, {'a': 2}], created)
+
+    def test_checkin_on_error(self):
+        pool = ParserPool(object)
+        with self.assertRaises(ValueError):
+            with pool.parser() as p1:
+                raise ValueError('failure')
+        with pool.parser() as p2:
+            self.assertIs(p1, p2)
+
+    def test_size_and_clear(self):
+        pool = ParserPool(object, size=1)
+        with pool.parser() as p1:
+            with pool.parser() as p2:
+                pass
+        with pool.parser() as p3:
+            with pool.parser() as p4:
+                pass
+        self.assertIs(p2, p3)
+        self.assertIsNot(p1, p4)
+        pool.clear()
+        with pool.parser() as p5:
+            self.assertIsNot(p5, p2)
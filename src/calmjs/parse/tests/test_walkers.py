@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import gc
+import sys
 import textwrap
 import unittest
+from weakref import ref
 
 from calmjs.parse import walkers
 from calmjs.parse import es5
@@ -12,6 +15,14 @@ repr_walker = walkers.ReprWalker()
 walker = walkers.Walker()
 
 
+def recursive_walk(node):
+    # the reference recursive implementation.
+    for child in node:
+        yield child
+        for subchild in recursive_walk(child):
+            yield subchild
+
+
 class WalkerTestCase(unittest.TestCase):
 
     def test_not_node(self):
@@ -19,6 +30,359 @@ class WalkerTestCase(unittest.TestCase):
             list(walker.filter('not_a_node', lambda x: True))
         with self.assertRaises(TypeError):
             list(walker.walk('not_a_node'))
+        with self.assertRaises(TypeError):
+            list(walker.walk('not_a_node', postorder=True))
+
+    def test_not_node_child(self):
+        node = asttypes.ExprStatement('not_a_node')
+        with self.assertRaises(TypeError):
+            list(walker.walk(node))
+        with self.assertRaises(TypeError):
+            list(walker.walk(node, postorder=True))
+
+    def test_walk_order(self):
+        tree = es5(textwrap.dedent("""
+        var a = function(x, y) {
+          return x + y * foo(1, [2, , 3]);
+        };
+        if (a) { b = {c: 1}; } else c();
+        """))
+        self.assertEqual(
+            list(recursive_walk(tree)), list(walker.walk(tree)))
+        self.assertEqual(
+            ['a', 'x', 'y', 'x', 'y', 'foo'],
+            [n.value for n in walker.filter(
+                tree, lambda n: isinstance(n, asttypes.Identifier))
+             ][:6],
+        )
+
+    def test_walk_postorder(self):
+        tree = es5('a = b + c;')
+        self.assertEqual([
+            'Identifier', 'Identifier', 'Identifier', 'BinOp', 'Assign',
+            'ExprStatement',
+        ], [type(n).__name__ for n in walker.walk(tree, postorder=True)])
+        self.assertEqual(['a'], [n.value for n in walker.filter(
+            tree, lambda n: isinstance(n, asttypes.Identifier),
+            postorder=True, prune=lambda n: isinstance(n, asttypes.BinOp),
+        )])
+
+    def test_walk_prune(self):
+        tree = es5(textwrap.dedent("""
+        var a = function(x) { return x; };
+        b = 1;
+        """))
+
+        def prune(node):
+            return isinstance(node, asttypes.FuncExpr)
+
+        self.assertEqual([
+            'VarStatement', 'VarDecl', 'Identifier', 'FuncExpr',
+            'ExprStatement', 'Assign', 'Identifier', 'Number',
+        ], [type(n).__name__ for n in walker.walk(tree, prune=prune)])
+        self.assertEqual([
+            'Identifier', 'FuncExpr', 'VarDecl', 'VarStatement',
+            'Identifier', 'Number', 'Assign', 'ExprStatement',
+        ], [type(n).__name__ for n in walker.walk(
+            tree, postorder=True, prune=prune)])
+        self.assertEqual(['a', 'b'], [n.value for n in walker.filter(
+            tree, lambda n: isinstance(n, asttypes.Identifier), prune=prune)])
+
+    def test_walk_deep(self):
+        # deeper than the default recursion limit
+        depth = sys.getrecursionlimit() * 2
+        node = asttypes.Identifier('a')
+        for _ in range(depth):
+            node = asttypes.BinOp('+', node, asttypes.Identifier('b'))
+        tree = asttypes.ES5Program([asttypes.ExprStatement(node)])
+        self.assertEqual(depth * 2 + 2, len(list(walker.walk(tree))))
+        self.assertEqual(depth * 2 + 2, len(list(walker.walk(
+            tree, postorder=True))))
+        self.assertEqual(depth + 1, len(list(walker.filter(
+            tree, lambda n: isinstance(n, asttypes.Identifier)))))
+        index = walkers.NodeIndex(tree)
+        self.assertEqual(depth + 2, index.depth(index.get(
+            asttypes.Identifier)[0]))
+
+    def test_filter_types(self):
+        tree = es5(textwrap.dedent("""
+        var a = function(x) { return f(x); };
+        b = g(a, 1);
+        """))
+        walker = walkers.Walker()
+
+        def identifier(node):
+            return isinstance(node, asttypes.Identifier)
+
+        self.assertEqual(
+            list(walker.filter(tree, identifier)),
+            list(walker.filter(tree, asttypes.Identifier)),
+        )
+        # the index is kept for the tree.
+        index = walker.index(tree)
+        self.assertIs(index, walker.index(tree))
+        self.assertEqual(['a', 'x', 'f', 'x', 'b', 'g', 'a'], [
+            n.value for n in walker.filter(tree, asttypes.Identifier)])
+        self.assertEqual(['FunctionCall', 'FunctionCall', 'Number'], [
+            type(n).__name__ for n in walker.filter(
+                tree, (asttypes.FunctionCall, asttypes.Number))])
+        self.assertEqual('g', walker.extract(
+            tree, asttypes.FunctionCall, skip=1).identifier.value)
+        with self.assertRaises(TypeError):
+            walker.extract(tree, asttypes.String)
+
+        # types with postorder or prune are not looked up from the index.
+        self.assertEqual(['a', 'b', 'g', 'a'], [
+            n.value for n in walker.filter(
+                tree, asttypes.Identifier,
+                prune=lambda n: isinstance(n, asttypes.FuncExpr))])
+        self.assertEqual(['x', 'f', 'x', 'FunctionCall', 'b'], [
+            getattr(n, 'value', type(n).__name__) for n in walker.filter(
+                tree, (asttypes.Identifier, asttypes.FunctionCall),
+                postorder=True)][1:6])
+
+        # modifications are only reflected once the index is forgotten.
+        tree.children().pop()
+        self.assertEqual(7, len(list(walker.filter(
+            tree, asttypes.Identifier))))
+        walker.forget(tree)
+        self.assertIsNot(index, walker.index(tree))
+        self.assertEqual(4, len(list(walker.filter(
+            tree, asttypes.Identifier))))
+        walker.forget(tree)
+        walker.forget(tree)
+
+    def test_index_released(self):
+        walker = walkers.Walker()
+        trees = [es5('var a = b(c);\nfunction f(x) { return x; }')
+                 for i in range(3)]
+        # the parser keeps the last symbol it has produced.
+        es5('')
+        walker.filter(trees[0], asttypes.Identifier)
+        list(walker.filter(trees[1], asttypes.Identifier))
+        walker.select(trees[1], 'FuncDecl Return')
+        walker.extract(trees[2], asttypes.Return)
+        index = walker.index(trees[2])
+        index.parent(index.get(asttypes.VarStatement)[0])
+        self.assertEqual(2, len(walker._indexes))
+        refs = [ref(tree) for tree in trees]
+        del trees
+        gc.collect()
+        self.assertEqual([None, None, None], [r() for r in refs])
+        self.assertEqual(0, len(walker._indexes))
+        self.assertIsNone(index.root)
+
+    def test_query(self):
+        tree = es5(textwrap.dedent("""
+        var a = require('a');
+        function f(x) { return g(x, 'b'); }
+        b = f(a);
+        """))
+        visited = []
+
+        def visit(node):
+            visited.append(type(node).__name__)
+
+        def call_require(node):
+            return node.identifier.value == 'require'
+
+        results = walker.query(tree, {
+            'identifiers': asttypes.Identifier,
+            'literals': (asttypes.String, asttypes.Number),
+            'calls': asttypes.FunctionCall,
+            'requires': (asttypes.FunctionCall, call_require),
+            'strings': ((asttypes.String,), lambda n: n.value != "'b'"),
+            'visit': visit,
+        })
+        self.assertEqual(sorted([
+            'identifiers', 'literals', 'calls', 'requires', 'strings',
+            'visit',
+        ]), sorted(results))
+        self.assertEqual(list(walker.filter(
+            tree, asttypes.Identifier)), results['identifiers'])
+        self.assertEqual(list(walker.filter(
+            tree, asttypes.FunctionCall)), results['calls'])
+        self.assertEqual(["'a'", "'b'"], [
+            n.value for n in results['literals']])
+        self.assertEqual(1, len(results['requires']))
+        self.assertIs(results['calls'][0], results['requires'][0])
+        self.assertEqual(["'a'"], [n.value for n in results['strings']])
+        self.assertEqual([], results['visit'])
+        self.assertEqual(
+            [type(n).__name__ for n in walker.walk(tree)], visited)
+
+    def test_query_postorder_prune(self):
+        tree = es5('a = b + c;')
+        results = walker.query(tree, {
+            'identifiers': asttypes.Identifier,
+            'nodes': lambda n: True,
+        }, postorder=True, prune=lambda n: isinstance(n, asttypes.BinOp))
+        self.assertEqual(['a'], [n.value for n in results['identifiers']])
+        self.assertEqual(['Identifier', 'BinOp', 'Assign', 'ExprStatement'], [
+            type(n).__name__ for n in results['nodes']])
+
+    def test_query_invalid(self):
+        tree = es5('a = b + c;')
+        self.assertEqual({}, walker.query(tree, {}))
+        for query in ('a', (), ('a', 'b'), (asttypes.Identifier, 'b'), (
+                'a', lambda n: True), (asttypes.Identifier, lambda n: True,
+                                       lambda n: True)):
+            with self.assertRaises(TypeError):
+                walker.query(tree, {'query': query})
+
+
+class NodeIndexTestCase(unittest.TestCase):
+
+    def test_index(self):
+        tree = es5(textwrap.dedent("""
+        var a = function(x) { return f(x); };
+        b = g(a, 1);
+        """))
+        index = walkers.NodeIndex(tree)
+        self.assertEqual(list(walker.walk(tree)), index.nodes)
+        self.assertEqual(len(index.nodes), len(index))
+        self.assertEqual([], index.get(asttypes.String))
+        self.assertEqual(
+            [n for n in index.nodes if isinstance(n, asttypes.Node)],
+            index.get(asttypes.Node),
+        )
+        self.assertEqual(
+            [n for n in index.nodes if isinstance(
+                n, (asttypes.VarDecl, asttypes.FunctionCall))],
+            index.get((asttypes.VarDecl, asttypes.FunctionCall)),
+        )
+
+    def test_parent_depth(self):
+        tree = es5('a = b(c);')
+        index = walkers.NodeIndex(tree)
+        self.assertIsNone(index.parent(tree))
+        self.assertEqual(0, index.depth(tree))
+        call = index.get(asttypes.FunctionCall)[0]
+        self.assertEqual(3, index.depth(call))
+        self.assertIs(call, index.parent(index.get(asttypes.Identifier)[1]))
+        self.assertIs(call, index.parent(index.get(asttypes.Arguments)[0]))
+        self.assertIs(index.get(asttypes.Arguments)[0], index.parent(
+            index.get(asttypes.Identifier)[2]))
+        self.assertEqual(5, index.depth(index.get(asttypes.Identifier)[2]))
+        statement = index.get(asttypes.ExprStatement)[0]
+        self.assertIs(tree, index.parent(statement))
+        self.assertEqual(1, index.depth(statement))
+        with self.assertRaises(KeyError):
+            index.parent(asttypes.Identifier('a'))
+        with self.assertRaises(KeyError):
+            index.depth(asttypes.Identifier('a'))
+
+    def test_parent_depth_weak(self):
+        tree = es5('a = b(c);')
+        index = walkers.NodeIndex(tree, weak=True)
+        self.assertIs(tree, index.root)
+        statement = index.get(asttypes.ExprStatement)[0]
+        self.assertIs(tree, index.parent(statement))
+        self.assertIs(statement, index.parent(statement.expr))
+        self.assertIsNone(index.parent(tree))
+
+    def test_subtree(self):
+        tree = es5('a = b(c);')
+        call = walker.extract(tree, asttypes.FunctionCall)
+        index = walkers.NodeIndex(call)
+        self.assertEqual(['b', 'c'], [
+            n.value for n in index.get(asttypes.Identifier)])
+        self.assertIsNone(index.parent(call))
+        self.assertEqual(1, index.depth(index.get(asttypes.Identifier)[0]))
+
+
+class IntervalIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.text = textwrap.dedent("""
+        var a = function(b) {
+          return b + 1;
+        };
+
+        a(2);
+        """).lstrip()
+        self.tree = es5(self.text)
+        self.index = walkers.IntervalIndex(self.tree)
+
+    def test_at(self):
+        index = self.index
+        self.assertEqual(len(list(walker.walk(self.tree))) + 1, len(index))
+        self.assertIsNone(index.at(-1))
+        self.assertIsNone(index.at(len(self.text) - 1))
+        self.assertIs(self.tree, index.at(index.offset(4, 1)))
+        self.assertIsInstance(index.at(0), asttypes.VarStatement)
+        self.assertIsInstance(index.at(4), asttypes.Identifier)
+        self.assertIsInstance(index.at(5), asttypes.VarDecl)
+        # the left operand of the binary operator is nested within.
+        self.assertEqual('b', index.at(index.offset(2, 10)).value)
+        self.assertIsInstance(index.at(index.offset(2, 11)), asttypes.BinOp)
+        self.assertIsInstance(index.at(index.offset(2, 3)), asttypes.Return)
+        self.assertIsInstance(index.at(index.offset(3, 1)), asttypes.FuncExpr)
+        self.assertIsInstance(
+            index.at(index.offset(3, 2)), asttypes.VarStatement)
+        self.assertIsInstance(
+            index.at(index.offset(5, 3)), asttypes.Number)
+        self.assertIsInstance(
+            index.at(index.offset(5, 5)), asttypes.ExprStatement)
+
+    def test_overlapping(self):
+        index = self.index
+        start = index.offset(2, 14)
+        self.assertEqual([
+            'ES5Program', 'VarStatement', 'VarDecl', 'FuncExpr', 'Return',
+            'BinOp', 'Number', 'ExprStatement', 'FunctionCall',
+            'Identifier',
+        ], [type(node).__name__ for node in index.overlapping(
+            start, index.offset(5, 2))])
+        self.assertEqual([
+            'ES5Program', 'ExprStatement', 'FunctionCall', 'Arguments',
+            'Number',
+        ], [type(node).__name__ for node in index.overlapping(
+            index.offset(5, 3), index.offset(5, 4))])
+        self.assertEqual([], index.overlapping(start, start))
+        self.assertEqual(
+            [self.tree], index.overlapping(
+                index.offset(4, 1), index.offset(5, 1)))
+        self.assertEqual(
+            len(index), len(index.overlapping(-1, len(self.text))))
+
+    def test_offset(self):
+        self.assertEqual(0, self.index.offset(1, 1))
+        self.assertEqual(22, self.index.offset(2, 1))
+        for args in ((0, 1), (1, 0), (7, 1)):
+            with self.assertRaises(ValueError):
+                self.index.offset(*args)
+        index = walkers.IntervalIndex(self.tree, line_starts=[0, 10])
+        self.assertEqual(10, index.offset(2, 1))
+        tree = asttypes.ES5Program([])
+        index = walkers.IntervalIndex(tree)
+        with self.assertRaises(ValueError):
+            index.offset(1, 1)
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.at(0))
+        self.assertEqual([], index.overlapping(0, 1))
+
+    def test_nested(self):
+        tree = es5('(a);')
+        index = walkers.IntervalIndex(tree)
+        self.assertIsInstance(index.at(0), asttypes.GroupingOp)
+        self.assertIsInstance(index.at(1), asttypes.Identifier)
+        self.assertIsInstance(index.at(3), asttypes.ExprStatement)
+
+        # the nodes with identical spans are ordered by their depth.
+        tree = es5('a')
+        index = walkers.IntervalIndex(tree)
+        statement = tree.children()[0]
+        self.assertEqual([tree, statement, statement.expr], index.nodes)
+        self.assertIs(statement.expr, index.at(0))
+        self.assertEqual(
+            [tree, statement, statement.expr], index.overlapping(0, 1))
+
+        # the index over nodes that do not have their positions
+        tree = es5('a = b;', positions=False)
+        index = walkers.IntervalIndex(tree)
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.at(0))
 
 
 class ReprTestCase(unittest.TestCase):
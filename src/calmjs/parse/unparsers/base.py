@@ -9,6 +9,8 @@ from __future__ import unicode_literals
 
 import logging
 
+from calmjs.parse.unparsers import compiler
+from calmjs.parse.unparsers import walker
 from calmjs.parse.unparsers.walker import (
     Dispatcher,
     walk,
@@ -61,6 +63,12 @@ class BaseUnparser(object):
         dispatcher_cls
             The Dispatcher class - defaults to the version from the
             walker module
+
+        The rules are invoked for every call to produce the handlers
+        along with the state that is specific to that run, while the
+        optimized definitions are shared between the dispatchers that
+        were created across all runs through the ``cache`` argument to
+        the dispatcher class.
         """
 
         # the base items.
@@ -68,6 +76,7 @@ class BaseUnparser(object):
         self.definitions.update(definitions)
         self.walk = walk
         self.dispatcher_cls = dispatcher_cls
+        self.cache = {}
 
         self.rules = rules
 
@@ -137,7 +146,13 @@ class BaseUnparser(object):
         return (
             token_handler, layout_handlers, deferrable_handlers, prewalk_hooks)
 
-    def __call__(self, node):
+    def prewalk(self, node):
+        """
+        Set up the dispatcher for a run on the node and invoke the
+        prewalk hooks with it.  Returns the dispatcher and the node
+        returned by the prewalk hooks.
+        """
+
         (token_handler, layout_handlers, deferrable_handlers,
             prewalk_hooks) = self.setup()
         dispatcher = self.dispatcher_cls(
@@ -145,10 +160,29 @@ class BaseUnparser(object):
             token_handler,
             layout_handlers,
             deferrable_handlers,
+            cache=self.cache,
         )
 
         for prewalk_hook in prewalk_hooks:
             node = prewalk_hook(dispatcher, node)
 
+        return dispatcher, node
+
+    def text(self, node):
+        """
+        Return the rendering of the node as a string, i.e. the joined
+        text of all the chunks that would be produced by calling this
+        instance with the node.  If the walk function is one provided by
+        this package, the text will be produced in the text mode of the
+        compiled walk, which avoid producing the chunks altogether.
+        """
+
+        if self.walk not in (walker.walk, compiler.walk):
+            return ''.join(chunk.text for chunk in self(node))
+        dispatcher, node = self.prewalk(node)
+        return compiler.render_text(dispatcher, node)
+
+    def __call__(self, node):
+        dispatcher, node = self.prewalk(node)
         for chunk in self.walk(dispatcher, node):
             yield chunk
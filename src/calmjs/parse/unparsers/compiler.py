@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+"""
+Compiler for the unparser definitions.
+
+The default walk function from the walker module interprets the
+optimized definition of every node it encounters, invoking each rule
+through the generic inner walk function for every value it produces.
+The walk function provided here instead turns the optimized definition
+for each type of Node into a dedicated Python function, where the
+common Token types are inlined directly into the generated code such
+that the values are read straight off the node and passed to the token
+handler.  The stream of chunks produced is identical to the one from
+the walker module, as the same layout resolution is applied to it.
+
+Rules that are not known to this module (such as Token subclasses
+provided by users) are executed as they would have been by the default
+walk function.
+
+For the cases where only the resulting text is required, the render
+functions may also be compiled in a text mode for the render_text
+function, where the text is appended straight into a list rather than
+having the chunks produced and yielded through the tree.  Where the
+token handler is known to produce the value as the text, the values
+are appended directly without invoking the handler.
+"""
+
+from __future__ import unicode_literals
+
+import re
+import sys
+from threading import Lock
+
+from calmjs.parse.asttypes import Node
+from calmjs.parse.handlers.core import token_handler_str_default
+from calmjs.parse.handlers.core import token_handler_unobfuscate
+from calmjs.parse.ruletypes import (
+    Attr,
+    CommentsAttr,
+    Deferrable,
+    JoinAttr,
+    Layout,
+    LayoutChunk,
+    Operator,
+    Optional,
+    Structure,
+    Text,
+)
+from calmjs.parse.unparsers.walker import Dispatcher
+from calmjs.parse.unparsers.walker import process_layouts
+from calmjs.parse.unparsers.walker import resolve_layouts
+
+identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# delegate to the sub-generators directly where supported.
+YIELD_FROM = sys.version_info >= (3, 3)
+
+# the values that the Attr token types consider to be empty.
+EMPTY = (None, [])
+
+# compiled code objects, keyed by the generated source as the source is
+# fully determined by the structure of the definition, while the actual
+# rule instances are provided to the code as the constants.
+_code_cache = {}
+_code_cache_lock = Lock()
+
+# token handlers that produce fragments with the value as the text,
+# such that the value may be used as is for the text mode.
+text_token_handlers = {
+    token_handler_str_default,
+    token_handler_unobfuscate,
+}
+
+# guards the creation of the render tables on the dispatchers.
+_tables_lock = Lock()
+
+
+class Emitter(object):
+    """
+    Accumulates the lines of the source for a render function, along
+    with the constants that the source references.
+    """
+
+    def __init__(self, text=False, direct=False):
+        """
+        text
+            produce the render function for the text mode, where the
+            text and layout chunks are passed to the append function
+            that is provided as an argument.
+        direct
+            for the text mode, append the values directly rather than
+            having them go through the token function.
+        """
+
+        self.text = text
+        self.direct = direct
+        self.lines = []
+        self.constants = []
+        self.preamble = []
+        self.yields = False
+
+    def constant(self, value):
+        self.constants.append(value)
+        idx = len(self.constants) - 1
+        self.preamble.append('r%d = K[%d]' % (idx, idx))
+        return 'r%d' % idx
+
+    def bind(self, name, expr):
+        self.preamble.append('%s = %s' % (name, expr))
+        return name
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def emit_yield_from(self, indent, expr):
+        self.yields = True
+        if YIELD_FROM:
+            self.emit(indent, 'yield from %s' % expr)
+        else:
+            self.emit(indent, 'for c in %s:' % expr)
+            self.emit(indent + 1, 'yield c')
+
+    def emit_append_from(self, indent, expr):
+        self.emit(indent, 'for c in %s:' % expr)
+        self.emit(indent + 1, 'append(c)')
+
+    def emit_walk_value(self, indent, value, token):
+        # the equivalent of walk(dispatcher, value, token=token) from
+        # the default walk function.
+        self.emit(indent, 'if isinstance(%s, Node):' % value)
+        if self.text:
+            self.emit(indent + 1, 'render[%s.__class__](%s, append, stack)' % (
+                value, value))
+        else:
+            self.emit_yield_from(
+                indent + 1, 'render[%s.__class__](%s, stack)' % (value, value))
+        self.emit(indent, 'else:')
+        self.emit_token(indent + 1, token, value)
+
+    def emit_token(self, indent, token, value):
+        expr = 'token(%s, dispatcher, node, %s, stack)' % (token, value)
+        if not self.text:
+            self.emit_yield_from(indent, expr)
+        elif self.direct:
+            self.emit(indent, 'append(%s)' % value)
+        else:
+            self.emit_append_from(indent, expr)
+
+    def emit_layout(self, indent, layout, handler):
+        expr = 'LayoutChunk(%s, %s, node)' % (layout, handler)
+        if self.text:
+            self.emit(indent, 'append(%s)' % expr)
+        else:
+            self.yields = True
+            self.emit(indent, 'yield %s' % expr)
+
+    def emit_getattr(self, indent, target, rule, name):
+        attr = rule.attr
+        if isinstance(attr, Deferrable) and type(rule) is not Operator:
+            self.emit(indent, '%s = %s(dispatcher, node)' % (
+                target, self.bind('a' + name[1:], name + '.attr')))
+        elif isinstance(attr, str) and identifier.match(attr):
+            self.emit(indent, '%s = node.%s' % (target, attr))
+        else:
+            self.emit(indent, '%s = getattr(node, %s.attr)' % (target, name))
+
+    def emit_fallback(self, indent, name):
+        if self.text:
+            self.emit(indent, 'fallback(%s, node, append, stack)' % name)
+        else:
+            self.emit_yield_from(indent, 'fallback(%s, node, stack)' % name)
+
+    def emit_rules(self, indent, rules, depth=0):
+        start = len(self.lines)
+        for rule in rules:
+            self.emit_rule(indent, rule, depth)
+        return len(self.lines) > start
+
+    def emit_rule(self, indent, rule, depth):
+        if isinstance(getattr(rule, 'rule', None), type) and issubclass(
+                rule.rule, Layout):
+            # the runners produced by the Dispatcher; resolve the
+            # handler for the layout rule at bind time.
+            layout = self.constant(rule.rule)
+            handler = self.bind('h' + layout[1:], 'dispatcher.layout(%s)' % (
+                layout))
+            if issubclass(rule.rule, Structure):
+                self.emit(indent, '%s(dispatcher, node)' % handler)
+            else:
+                self.emit_layout(indent, layout, handler)
+            return
+
+        rule_type = type(rule)
+        value = 'v%d' % depth
+        name = self.constant(rule)
+
+        if rule_type in (Attr, CommentsAttr) or (
+                rule_type is Operator and rule.attr):
+            self.emit_getattr(indent, value, rule, name)
+            self.emit(indent, 'if %s not in EMPTY:' % value)
+            self.emit_walk_value(indent + 1, value, name)
+        elif rule_type is Operator or rule_type is Text:
+            if isinstance(rule.value, Node):
+                self.emit_fallback(indent, name)
+            elif rule_type is Text or rule.value not in EMPTY:
+                self.emit_token(indent, name, self.bind(
+                    't' + name[1:], name + '.value'))
+        elif rule_type is JoinAttr and isinstance(rule.value, (list, tuple)):
+            joined = 'j%d' % depth
+            self.emit(indent, '%s = False' % joined)
+            self.emit_getattr(indent, value, rule, name)
+            self.emit(indent, 'for %s in %s:' % (value, value))
+            self.emit(indent + 1, 'if %s:' % joined)
+            if not self.emit_rules(indent + 2, rule.value, depth + 1):
+                self.emit(indent + 2, 'pass')
+            self.emit(indent + 1, '%s = True' % joined)
+            self.emit_walk_value(indent + 1, value, name)
+        elif rule_type is Optional and isinstance(rule.value, (list, tuple)):
+            self.emit_getattr(indent, value, rule, name)
+            self.emit(indent, 'if %s not in EMPTY:' % value)
+            if not self.emit_rules(indent + 1, rule.value, depth + 1):
+                self.emit(indent + 1, 'pass')
+        else:
+            self.emit_fallback(indent, name)
+
+    def source(self):
+        lines = ['def bind(dispatcher, render, token, fallback):']
+        lines.extend('    ' + line for line in self.preamble)
+        lines.extend([
+            '',
+            '    def render_node(node, %sstack):' % (
+                'append, ' if self.text else ''),
+            '        sourcepath = node.sourcepath',
+            '        if sourcepath:',
+            '            stack.append(sourcepath)',
+        ])
+        lines.extend('    ' + line for line in self.lines)
+        lines.extend([
+            '        if sourcepath:',
+            '            stack.pop(-1)',
+        ])
+        if not self.text and not self.yields:
+            lines.extend([
+                '        return',
+                '        yield',
+            ])
+        lines.extend([
+            '',
+            '    return render_node',
+            '',
+        ])
+        return '\n'.join(lines)
+
+
+def compile_definition(name, definition, text=False, direct=False):
+    """
+    Compile the optimized definition for the Node type of the provided
+    name.  Returns a bind function, which accepts the dispatcher, the
+    render table, the token function and the fallback function; calling
+    that will return the render function for that Node type, which in
+    turn accepts a node and the sourcepath stack and produces the
+    chunks for that node.
+
+    For the text mode (see Emitter for the text and direct arguments),
+    the render function also accepts the append function before the
+    sourcepath stack and it will return nothing.
+    """
+
+    emitter = Emitter(text=text, direct=direct)
+    emitter.emit_rules(1, definition)
+    source = emitter.source()
+    with _code_cache_lock:
+        code = _code_cache.get(source)
+        if code is None:
+            code = _code_cache[source] = compile(
+                source, '<unparser:%s>' % name, 'exec')
+    namespace = {
+        'K': tuple(emitter.constants),
+        'EMPTY': EMPTY,
+        'Node': Node,
+        'LayoutChunk': LayoutChunk,
+    }
+    exec(code, namespace)
+    return namespace['bind']
+
+
+def _function(method):
+    return getattr(method, '__func__', method)
+
+
+def token_function(dispatcher):
+    """
+    Return the token handler for the dispatcher, such that it may be
+    called directly by the render functions where the dispatcher does
+    not customize how it dispatches to the token handler.
+    """
+
+    if dispatcher.token_handler and (
+            _function(type(dispatcher).token) is _function(Dispatcher.token)):
+        return dispatcher.token_handler
+
+    def token(token, dispatcher, node, value, sourcepath_stack):
+        return dispatcher.token(token, node, value, sourcepath_stack)
+
+    return token
+
+
+def text_token_function(dispatcher):
+    """
+    Return the token function for the text mode, which produces the
+    text from the fragments produced by the token handler, along with
+    whether the values may be used directly as the text.
+    """
+
+    token = token_function(dispatcher)
+    if token in text_token_handlers:
+        def text_token(token, dispatcher, node, value, sourcepath_stack):
+            yield value
+        return text_token, True
+
+    def text_token(token_, dispatcher, node, value, sourcepath_stack):
+        for fragment in token(
+                token_, dispatcher, node, value, sourcepath_stack):
+            yield fragment.text
+
+    return text_token, False
+
+
+class RenderTable(dict):
+    """
+    The mapping of Node types to the render function for a dispatcher,
+    with the render functions being compiled on first lookup.
+    """
+
+    def __init__(self, dispatcher, text=False):
+        super(RenderTable, self).__init__()
+        self.dispatcher = dispatcher
+        self.text = text
+        if text:
+            self.token, self.direct = text_token_function(dispatcher)
+        else:
+            self.token, self.direct = token_function(dispatcher), False
+        # the bind functions may be shared through the cache of the
+        # dispatcher, as the optimized definitions are shared there.
+        cache = getattr(dispatcher, 'cache', None)
+        self.binders = {} if cache is None else cache.setdefault(
+            RenderTable, {})
+
+    def __missing__(self, key):
+        definition = self.dispatcher.get_optimized_definition_by_name(
+            key.__name__)
+        # the definition is kept alongside to ensure the id is not
+        # reused by some other definition.
+        binder_key = (id(definition), self.text, self.direct)
+        _, bind = self.binders.get(binder_key, (None, None))
+        if bind is None:
+            bind = compile_definition(
+                key.__name__, definition, self.text, self.direct)
+            self.binders[binder_key] = (definition, bind)
+        render = self[key] = bind(
+            self.dispatcher, self, self.token,
+            self.fallback_text if self.text else self.fallback)
+        return render
+
+    def interpret(self, definition, node, stack, append=None):
+        """
+        Walk the node with the provided definition, following what the
+        inner walk function from the default walk function does, other
+        than using the render functions for nodes without an explicit
+        definition.  For the text mode, the append function must be
+        provided, and the chunks yielded must also be passed to it.
+        """
+
+        dispatcher = self.dispatcher
+        nodes = [node]
+
+        def _walk(dispatcher, node, definition=None, token=None):
+            if not isinstance(node, Node):
+                for fragment in self.token(
+                        token, dispatcher, nodes[-1], node, stack):
+                    yield fragment
+                return
+
+            if definition is None:
+                if self.text:
+                    self[node.__class__](node, append, stack)
+                    return
+                for chunk in self[node.__class__](node, stack):
+                    yield chunk
+                return
+
+            push = bool(node.sourcepath)
+            if push:
+                stack.append(node.sourcepath)
+            nodes.append(node)
+
+            for rule in definition:
+                for chunk in rule(_walk, dispatcher, node):
+                    yield chunk
+
+            nodes.pop(-1)
+            if push:
+                stack.pop(-1)
+
+        return _walk(dispatcher, node, definition)
+
+    def fallback(self, rule, node, stack):
+        return self.interpret((rule,), node, stack)
+
+    def fallback_text(self, rule, node, append, stack):
+        for chunk in self.interpret((rule,), node, stack, append):
+            append(chunk)
+
+
+def get_render_table(dispatcher, text=False):
+    """
+    Return the render table for the dispatcher, for the text mode if
+    specified.
+
+    The tables are kept on the dispatcher itself, as the render
+    functions reference the dispatcher they were bound to; a mapping
+    keyed by the dispatcher would keep every dispatcher alive.
+    """
+
+    with _tables_lock:
+        tables = getattr(dispatcher, '_render_tables', None)
+        if tables is None:
+            tables = dispatcher._render_tables = {}
+        table = tables.get(text)
+        if table is None:
+            table = tables[text] = RenderTable(dispatcher, text)
+    return table
+
+
+def walk(dispatcher, node, definition=None):
+    """
+    The compiled walk function, a drop-in replacement for the walk
+    function from the walker module, with the same arguments.
+
+    dispatcher
+        a Dispatcher instance from the walker module.
+    node
+        the starting Node from asttypes.
+    definition
+        a standalone definition tuple to start working on the node with;
+        if none is provided, the compiled render function for the type
+        of the node will be used.
+    """
+
+    table = get_render_table(dispatcher)
+    stack = [NotImplemented]
+    if definition is None:
+        chunks = table[node.__class__](node, stack)
+    else:
+        chunks = table.interpret(definition, node, stack)
+    for chunk in resolve_layouts(dispatcher, chunks):
+        yield chunk
+
+
+def render_text(dispatcher, node, definition=None):
+    """
+    Render the node into a string, which is identical to joining the
+    text of all the chunks produced by the walk function with the same
+    arguments.
+
+    As the text is collected before the layouts are resolved, the
+    layout handlers will be invoked after all the other handlers have
+    been invoked, rather than being interleaved as they are with the
+    walk function.
+    """
+
+    table = get_render_table(dispatcher, text=True)
+    items = []
+    append = items.append
+    stack = [NotImplemented]
+    if definition is None:
+        table[node.__class__](node, append, stack)
+    else:
+        for chunk in table.interpret(definition, node, stack, append):
+            append(chunk)
+
+    texts = []
+    layout_rule_chunks = []
+    before_text = None
+    for item in items:
+        if isinstance(item, LayoutChunk):
+            layout_rule_chunks.append(item)
+            continue
+        if layout_rule_chunks:
+            texts.extend(fragment.text for fragment in process_layouts(
+                dispatcher, layout_rule_chunks, before_text, item))
+            layout_rule_chunks = []
+        texts.append(item)
+        before_text = item
+
+    if layout_rule_chunks:
+        texts.extend(fragment.text for fragment in process_layouts(
+            dispatcher, layout_rule_chunks, before_text, None))
+    return ''.join(texts)
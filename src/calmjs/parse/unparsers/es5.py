@@ -46,6 +46,7 @@ from calmjs.parse.ruletypes import (
     children_comma,
 )
 from calmjs.parse.unparsers.base import BaseUnparser
+from calmjs.parse.unparsers.walker import walk
 from calmjs.parse import rules
 
 value = (
@@ -371,7 +372,8 @@ class Unparser(BaseUnparser):
             rules=(rules.default(),),
             layout_handlers=None,
             deferrable_handlers=None,
-            prewalk_hooks=()):
+            prewalk_hooks=(),
+            walk=walk):
 
         super(Unparser, self).__init__(
             definitions=definitions,
@@ -380,9 +382,24 @@ class Unparser(BaseUnparser):
             layout_handlers=layout_handlers,
             deferrable_handlers=deferrable_handlers,
             prewalk_hooks=prewalk_hooks,
+            walk=walk,
         )
 
 
+# the printers constructed for the print functions; as the unparser
+# instances retain the optimized definitions and the compiled render
+# functions across calls, they are kept for reuse.
+printers = {}
+
+
+def get_printer(factory, *a):
+    key = (factory,) + a
+    printer = printers.get(key)
+    if printer is None:
+        printer = printers[key] = factory(*a)
+    return printer
+
+
 def pretty_printer(indent_str='    '):
     """
     Construct a pretty printing unparser
@@ -404,7 +421,7 @@ def pretty_print(ast, indent_str='  '):
         The string used for indentations.  Defaults to two spaces.
     """
 
-    return ''.join(chunk.text for chunk in pretty_printer(indent_str)(ast))
+    return get_printer(pretty_printer, indent_str).text(ast)
 
 
 def minify_printer(
@@ -477,5 +494,7 @@ def minify_print(
         a given block).
     """
 
-    return ''.join(chunk.text for chunk in minify_printer(
-        obfuscate, obfuscate_globals, shadow_funcname, drop_semi)(ast))
+    return get_printer(
+        minify_printer, obfuscate, obfuscate_globals, shadow_funcname,
+        drop_semi,
+    ).text(ast)
@@ -17,13 +17,21 @@ def optimize_structure_handler(rule, handler):
     """
     Produce an "optimized" version of handler for the dispatcher to
     limit reference lookups.
+
+    The handler is looked up from the dispatcher running the definition,
+    such that the optimized definitions may be shared by all dispatchers
+    that have handlers for the same set of layout rules; the handler
+    provided is the one that was available during the optimization.
     """
 
     def runner(walk, dispatcher, node):
-        handler(dispatcher, node)
+        dispatcher.layout(rule)(dispatcher, node)
         return
         yield  # pragma: no cover
 
+    # keep references for the compiler module to introspect with.
+    runner.rule = rule
+    runner.handler = handler
     return runner
 
 
@@ -31,11 +39,17 @@ def optimize_layout_handler(rule, handler):
     """
     Produce an "optimized" version of handler for the dispatcher to
     limit reference lookups.
+
+    Like the structure handler, the handler is looked up from the
+    dispatcher running the definition.
     """
 
     def runner(walk, dispatcher, node):
-        yield LayoutChunk(rule, handler, node)
+        yield LayoutChunk(rule, dispatcher.layout(rule), node)
 
+    # keep references for the compiler module to introspect with.
+    runner.rule = rule
+    runner.handler = handler
     return runner
 
 
@@ -75,7 +89,7 @@ class Dispatcher(object):
     def __init__(
             self, definitions, token_handler,
             layout_handlers, deferrable_handlers,
-            indent_str='  ', newline_str='\n'):
+            indent_str='  ', newline_str='\n', cache=None):
         """
         The constructor takes three arguments.
 
@@ -133,6 +147,15 @@ class Dispatcher(object):
             The string used for renderinga new line with.  Default is
             <LF> (line-feed, or '\\n').  This attribute will be provided
             as the property ``newline_str``.
+
+        cache
+            An optional mapping (dictionary) that may be shared between
+            dispatchers constructed with the same definitions, such as
+            the ones created by an unparser instance for every run.  The
+            optimized definitions will be stored in there, keyed by the
+            layout rules that have a handler, such that the optimization
+            only need to happen once for every set of layout rules.
+            This will be provided as the property ``cache``.
         """
 
         self.__token_handler = token_handler
@@ -144,8 +167,22 @@ class Dispatcher(object):
         self.__definitions.update(definitions)
         self.__indent_str = indent_str
         self.__newline_str = newline_str
-
-        self.__optimized_definitions = self.optimize()
+        self.__cache = cache
+
+        if cache is None:
+            self.__optimized_definitions = self.optimize()
+        else:
+            # only the availability of handlers for the Layout rules
+            # affect the optimized definitions, as the runners resolve
+            # the handlers from the dispatcher while running.
+            key = frozenset(
+                rule for rule, handler in self.__layout_handlers.items()
+                if isinstance(rule, type) and handler
+            )
+            optimized_definitions = cache.get(key)
+            if optimized_definitions is None:
+                optimized_definitions = cache[key] = self.optimize()
+            self.__optimized_definitions = optimized_definitions
 
     def optimize_definition(self, name, definition):
         rules = []
@@ -194,6 +231,13 @@ class Dispatcher(object):
         # more attractive.
         return self.__optimized_definitions[node.__class__.__name__]
 
+    def get_optimized_definition_by_name(self, name):
+        """
+        Get the definition for the asttype of the provided name.
+        """
+
+        return self.__optimized_definitions[name]
+
     def __iter__(self):
         for item in self.__definitions.items():
             yield item
@@ -214,6 +258,14 @@ class Dispatcher(object):
 
         return self.__layout_handlers.get(rule, NotImplemented)
 
+    @property
+    def token_handler(self):
+        return self.__token_handler
+
+    @property
+    def cache(self):
+        return self.__cache
+
     @property
     def indent_str(self):
         return self.__indent_str
@@ -223,6 +275,99 @@ class Dispatcher(object):
         return self.__newline_str
 
 
+def process_layouts(
+        dispatcher, layout_rule_chunks, before_text, after_text):
+    """
+    Resolve the buffered layout rule chunks that are placed between the
+    chunks with the before_text and after_text into the fragments that
+    they produce.
+    """
+
+    # the text that was yielded by the previous layout handler
+    prev_text = None
+
+    # While Layout rules in a typical definition are typically
+    # interspersed with Tokens, certain assumptions with how the
+    # Layouts are specified within there will fail when Tokens fail
+    # to generate anything for any reason.  However, the dispatcher
+    # instance will be able to accept and resolve a tuple of Layouts
+    # to some handler function, so that a form of normalization can
+    # be done.  For instance, an (Indent, Newline, Dedent) can
+    # simply be resolved to no operations.  To achieve this, iterate
+    # through the layout_rule_chunks and generate a normalized form
+    # for the final handling to happen.
+
+    # the preliminary stack that will be cleared whenever a
+    # normalized layout rule chunk is generated.
+    lrcs_stack = []
+
+    # first pass: generate both the normalized/finalized lrcs.
+    for lrc in layout_rule_chunks:
+        lrcs_stack.append(lrc)
+
+        # check every single chunk from left to right...
+        for idx in range(len(lrcs_stack)):
+            rule = tuple(lrc.rule for lrc in lrcs_stack[idx:])
+            handler = dispatcher.layout(rule)
+            if handler is not NotImplemented:
+                # not manipulating lrsc_stack from within the same
+                # for loop that it is being iterated upon
+                break
+        else:
+            # which continues back to the top of the outer for loop
+            continue
+
+        # So a handler is found from inside the rules; extend the
+        # chunks from the stack that didn't get normalized, and
+        # generate a new layout rule chunk.
+        lrcs_stack[:] = lrcs_stack[:idx]
+        lrcs_stack.append(LayoutChunk(
+            rule, handler,
+            layout_rule_chunks[idx].node,
+        ))
+
+    # second pass: now the processing can be done.
+    for lr_chunk in lrcs_stack:
+        gen = lr_chunk.handler(
+            dispatcher, lr_chunk.node, before_text, after_text, prev_text)
+        if not gen:
+            continue
+        for chunk_from_layout in gen:
+            yield chunk_from_layout
+            prev_text = chunk_from_layout.text
+
+
+def resolve_layouts(dispatcher, chunks):
+    """
+    Consume the stream of chunks produced by an inner walk, buffer the
+    layout rule chunks found in there and resolve them between the real
+    chunks as they become available, yielding only the fragments.
+    """
+
+    last_chunk = None
+    layout_rule_chunks = []
+
+    for chunk in chunks:
+        if isinstance(chunk, LayoutChunk):
+            layout_rule_chunks.append(chunk)
+        else:
+            # process layout rule chunks that had been cached.
+            if layout_rule_chunks:
+                for chunk_from_layout in process_layouts(
+                        dispatcher, layout_rule_chunks,
+                        last_chunk.text if last_chunk else None, chunk.text):
+                    yield chunk_from_layout
+                layout_rule_chunks = []
+            yield chunk
+            last_chunk = chunk
+
+    # process the remaining layout rule chunks.
+    for chunk_from_layout in process_layouts(
+            dispatcher, layout_rule_chunks,
+            last_chunk.text if last_chunk else None, None):
+        yield chunk_from_layout
+
+
 def walk(dispatcher, node, definition=None):
     """
     The default, standalone walk function following the standard
@@ -281,85 +426,8 @@ def walk(dispatcher, node, definition=None):
             sourcepath_stack.pop(-1)
 
     # Format layout markers are not handled immediately in the walk -
-    # they will simply be buffered so that a collection of them can be
-    # handled at once.
-    def process_layouts(layout_rule_chunks, last_chunk, chunk):
-        before_text = last_chunk.text if last_chunk else None
-        after_text = chunk.text if chunk else None
-        # the text that was yielded by the previous layout handler
-        prev_text = None
-
-        # While Layout rules in a typical definition are typically
-        # interspersed with Tokens, certain assumptions with how the
-        # Layouts are specified within there will fail when Tokens fail
-        # to generate anything for any reason.  However, the dispatcher
-        # instance will be able to accept and resolve a tuple of Layouts
-        # to some handler function, so that a form of normalization can
-        # be done.  For instance, an (Indent, Newline, Dedent) can
-        # simply be resolved to no operations.  To achieve this, iterate
-        # through the layout_rule_chunks and generate a normalized form
-        # for the final handling to happen.
-
-        # the preliminary stack that will be cleared whenever a
-        # normalized layout rule chunk is generated.
-        lrcs_stack = []
-
-        # first pass: generate both the normalized/finalized lrcs.
-        for lrc in layout_rule_chunks:
-            lrcs_stack.append(lrc)
-
-            # check every single chunk from left to right...
-            for idx in range(len(lrcs_stack)):
-                rule = tuple(lrc.rule for lrc in lrcs_stack[idx:])
-                handler = dispatcher.layout(rule)
-                if handler is not NotImplemented:
-                    # not manipulating lrsc_stack from within the same
-                    # for loop that it is being iterated upon
-                    break
-            else:
-                # which continues back to the top of the outer for loop
-                continue
-
-            # So a handler is found from inside the rules; extend the
-            # chunks from the stack that didn't get normalized, and
-            # generate a new layout rule chunk.
-            lrcs_stack[:] = lrcs_stack[:idx]
-            lrcs_stack.append(LayoutChunk(
-                rule, handler,
-                layout_rule_chunks[idx].node,
-            ))
-
-        # second pass: now the processing can be done.
-        for lr_chunk in lrcs_stack:
-            gen = lr_chunk.handler(
-                dispatcher, lr_chunk.node, before_text, after_text, prev_text)
-            if not gen:
-                continue
-            for chunk_from_layout in gen:
-                yield chunk_from_layout
-                prev_text = chunk_from_layout.text
-
-    # The top level walker implementation
-    def walk():
-        last_chunk = None
-        layout_rule_chunks = []
-
-        for chunk in _walk(dispatcher, node, definition):
-            if isinstance(chunk, LayoutChunk):
-                layout_rule_chunks.append(chunk)
-            else:
-                # process layout rule chunks that had been cached.
-                for chunk_from_layout in process_layouts(
-                        layout_rule_chunks, last_chunk, chunk):
-                    yield chunk_from_layout
-                layout_rule_chunks[:] = []
-                yield chunk
-                last_chunk = chunk
-
-        # process the remaining layout rule chunks.
-        for chunk_from_layout in process_layouts(
-                layout_rule_chunks, last_chunk, None):
-            yield chunk_from_layout
-
-    for chunk in walk():
+    # they will simply be buffered by resolve_layouts so that a
+    # collection of them can be handled at once.
+    for chunk in resolve_layouts(
+            dispatcher, _walk(dispatcher, node, definition)):
         yield chunk
@@ -4,6 +4,8 @@ Various utilities and helpers
 """
 
 import sys
+from contextlib import contextmanager
+from threading import Lock
 from os.path import dirname
 from os.path import isabs
 from os.path import normpath
@@ -68,3 +70,80 @@ def normrelpath(base, target):
         return target
 
     return relpath(normpath(target), dirname(normpath(base)))
+
+
+class ParserPool(object):
+    """
+    A pool of reusable parser instances.  The construction of a parser
+    typically involves the building of the lexer and the loading of the
+    parsing tables, which for small inputs can be far more expensive
+    than the actual parsing, so instances are checked out and back in
+    to be reused by subsequent calls.
+
+    Parsers are keyed by the keyword arguments that were used for their
+    construction, such that only instances constructed with identical
+    arguments are shared.  Each checked out instance is used exclusively
+    by the caller until it is checked back in, so this is safe for use
+    across threads and for reentrant usage within the same thread.
+
+    Typical usage:
+
+    >>> from calmjs.parse.parsers.es5 import Parser
+    >>> from calmjs.parse.utils import ParserPool
+    >>> pool = ParserPool(Parser)
+    >>> with pool.parser(with_comments=True) as parser:
+    ...     program = parser.parse(u'var a = 1;')
+    ...
+    """
+
+    def __init__(self, factory, size=8):
+        """
+        Arguments
+
+        factory
+            The callable that will construct a new parser instance using
+            the keyword arguments passed to the parser method.
+        size
+            The maximum number of idle instances kept for each set of
+            construction arguments.  Defaults to 8.
+        """
+
+        self.factory = factory
+        self.size = size
+        self._idle = {}
+        self._lock = Lock()
+
+    def checkout(self, key, kwargs):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        return self.factory(**kwargs)
+
+    def checkin(self, key, instance):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append(instance)
+
+    def clear(self):
+        """
+        Discard all idle instances.
+        """
+
+        with self._lock:
+            self._idle.clear()
+
+    @contextmanager
+    def parser(self, **kwargs):
+        """
+        Check out a parser instance constructed with the provided
+        keyword arguments for the duration of the context.
+        """
+
+        key = tuple(sorted(kwargs.items()))
+        instance = self.checkout(key, kwargs)
+        try:
+            yield instance
+        finally:
+            self.checkin(key, instance)
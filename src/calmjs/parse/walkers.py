@@ -5,7 +5,15 @@ Generic walkers.
 
 from __future__ import unicode_literals
 
+from bisect import bisect_left
+from bisect import bisect_right
+from weakref import WeakKeyDictionary
+from weakref import ref
+
 from calmjs.parse.asttypes import Node
+from calmjs.parse.asttypes import attributes
+from calmjs.parse.lexers.tokens import PositionTable
+from calmjs.parse.selector import compile as compile_selector
 from calmjs.parse.utils import repr_compat
 
 
@@ -59,37 +67,195 @@ class Walker(object):
     Traceback (most recent call last):
     ...
     TypeError: no match found
+
+    The condition may also be provided as a node type (or a tuple of
+    node types) to be matched through isinstance; the nodes are then
+    looked up from the NodeIndex built for the tree, such that only the
+    first query will traverse the tree.  Note that the index is kept
+    as is, so the forget method must be called for the tree once it has
+    been modified, otherwise the results will be stale.
+
+    >>> len(list(walker.filter(tree, Assign)))
+    2
+    >>> print(pretty_print(walker.extract(tree, Assign, skip=1)))
+    globals[k] = 'yyy'
     """
 
-    def walk(self, node, condition=None):
+    def index(self, node):
         """
-        Simply walk through the entire node; condition argument is
-        ignored.
+        Return the NodeIndex for the provided node, which is built upon
+        the first request and kept for as long as the node is alive.
+        As the index will not reflect any subsequent modifications made
+        to the tree, the forget method must be called for the node once
+        it has been modified.
+
+        The index kept only references the node weakly, such that it
+        will not keep the node alive.
+        """
+
+        indexes = getattr(self, '_indexes', None)
+        if indexes is None:
+            indexes = self._indexes = WeakKeyDictionary()
+        result = indexes.get(node)
+        if result is None:
+            result = indexes[node] = NodeIndex(node, walker=self, weak=True)
+        return result
+
+    def forget(self, node):
+        """
+        Discard the NodeIndex built for the provided node, if any.
+        """
+
+        getattr(self, '_indexes', {}).pop(node, None)
+
+    def traverse(self, node, postorder=False, prune=None):
+        """
+        Yield every node nested within the provided node, using an
+        explicit stack such that the depth of the tree is not limited
+        by the recursion limit, and that each yielded node do not pass
+        through a generator for each level of the tree.
+
+        Arguments
+
+        node
+            The starting node; it will not be yielded.
+        postorder
+            If True, nodes are yielded after all of their children have
+            been yielded; default is False, where the nodes are yielded
+            before their children (i.e. preorder).
+        prune
+            An optional callable that accepts a single Node; if it
+            returns True for a given node, its children will not be
+            traversed (the node itself will still be yielded).
         """
 
         if not isinstance(node, Node):
             raise TypeError('not a node')
 
-        for child in node:
-            yield child
-            for subchild in self.walk(child, condition):
-                yield subchild
+        # The stack holds the iterators of the children for every level
+        # being traversed; for the postorder traversal, the node that
+        # provided the children is kept alongside (None for the starting
+        # node).  The children are iterated directly, bypassing the
+        # generator provided by Node.__iter__.
+        if not postorder:
+            stack = [iter(node.children())]
+            while stack:
+                for child in stack[-1]:
+                    if child is None:
+                        continue
+                    yield child
+                    if not isinstance(child, Node):
+                        raise TypeError('not a node')
+                    if prune is None or not prune(child):
+                        stack.append(iter(child.children()))
+                        break
+                else:
+                    stack.pop()
+            return
+
+        stack = [(None, iter(node.children()))]
+        while stack:
+            for child in stack[-1][1]:
+                if child is None:
+                    continue
+                if not isinstance(child, Node):
+                    raise TypeError('not a node')
+                if prune is None or not prune(child):
+                    stack.append((child, iter(child.children())))
+                    break
+                yield child
+            else:
+                parent = stack.pop()[0]
+                if parent is not None:
+                    yield parent
 
-    def filter(self, node, condition):
+    def walk(self, node, condition=None, postorder=False, prune=None):
+        """
+        Simply walk through the entire node; condition argument is
+        ignored.  See the traverse method for the other arguments.
+        """
+
+        return self.traverse(node, postorder=postorder, prune=prune)
+
+    def filter(self, node, condition, postorder=False, prune=None):
         """
         This method accepts a node and the condition function; a
         generator will be returned to yield the nodes that got matched
-        by the condition.
+        by the condition.  See the traverse method for the other
+        arguments.
+
+        If the condition is a node type or a tuple of node types, the
+        matching nodes (in document order) are provided by the index
+        of the node, unless the postorder or prune arguments are used.
+        As the index is kept, the forget method must be called for the
+        node once the tree has been modified; see the index method.
         """
 
-        if not isinstance(node, Node):
-            raise TypeError('not a node')
+        if isinstance(condition, (type, tuple)):
+            if not postorder and prune is None:
+                for child in self.index(node).get(condition):
+                    yield child
+                return
+            types = condition
+
+            def condition(node):
+                return isinstance(node, types)
 
-        for child in node:
+        for child in self.traverse(node, postorder=postorder, prune=prune):
             if condition(child):
                 yield child
-            for subchild in self.filter(child, condition):
-                yield subchild
+
+    def query(self, node, queries, postorder=False, prune=None):
+        """
+        Evaluate all the provided queries against every node nested
+        within the provided node through a single traversal, returning
+        a dict with the list of the matching nodes (in the order they
+        were traversed) for every query.  See the traverse method for
+        the other arguments.
+
+        The queries argument is a mapping of names to queries, which
+        may be provided as one of the following:
+
+        a node type or a tuple of node types
+            matching the nodes that are instances of those types.
+        a callable
+            the condition function, as accepted by the filter method,
+            which may also be used as a visitor for every node.
+        a tuple of a node type (or a tuple of node types) and a callable
+            the condition function, only to be called for the nodes
+            that are instances of those types.
+
+        The queries applicable to a given node type are resolved once
+        for every type encountered.
+        """
+
+        queries = [
+            (name, _query_condition(query)) for name, query in queries.items()]
+        results = dict((name, []) for name, query in queries)
+        dispatch = {}
+        for child in self.traverse(node, postorder=postorder, prune=prune):
+            handlers = dispatch.get(type(child))
+            if handlers is None:
+                handlers = dispatch[type(child)] = [
+                    (results[name].append, condition)
+                    for name, (types, condition) in queries
+                    if types is None or issubclass(type(child), types)
+                ]
+            for append, condition in handlers:
+                if condition is None or condition(child):
+                    append(child)
+        return results
+
+    def select(self, node, selector):
+        """
+        Return the list of the nodes nested within the provided node
+        that are matched by the selector (the text or a compiled one
+        from the calmjs.parse.selector module), in document order.  The
+        nodes are looked up through the index of the node, so the same
+        caveat for modified trees as the index method applies.
+        """
+
+        return compile_selector(selector).select(node, index=self.index(node))
 
     def extract(self, node, condition, skip=0):
         """
@@ -106,6 +272,319 @@ class Walker(object):
         raise TypeError('no match found')
 
 
+def _query_condition(query):
+    # return the types and the condition for the query, as a tuple with
+    # None in place of either one that is not applicable.
+    condition = None
+    if isinstance(query, type):
+        return (query, None)
+    if isinstance(query, tuple):
+        types = query
+        if len(query) == 2 and not isinstance(query[1], type) and callable(
+                query[1]):
+            types, condition = query
+            types = types if isinstance(types, tuple) else (types,)
+        if types and all(isinstance(cls, type) for cls in types):
+            return (types, condition)
+    elif callable(query):
+        return (None, query)
+    raise TypeError('invalid query: %r' % (query,))
+
+
+class NodeIndex(object):
+    """
+    An index of all the nodes nested within a node, built through a
+    single traversal, with the nodes grouped by their types such that
+    the nodes of a given type can be looked up without walking through
+    the tree again.
+
+    Example usage:
+
+    >>> from calmjs.parse.asttypes import Identifier
+    >>> from calmjs.parse.parsers.es5 import Parser
+    >>> from calmjs.parse.unparsers.es5 import pretty_print
+    >>> from calmjs.parse.walkers import NodeIndex
+    >>> tree = Parser().parse(u'var a = b(c);')
+    >>> index = NodeIndex(tree)
+    >>> print(', '.join(node.value for node in index.get(Identifier)))
+    a, b, c
+    >>> index.depth(index.get(Identifier)[1])
+    4
+    >>> print(pretty_print(index.parent(index.get(Identifier)[1])))
+    b(c)
+    """
+
+    def __init__(self, node, walker=None, weak=False):
+        """
+        Index every node nested within the provided node (but not the
+        node itself), using the traverse method of the walker.
+
+        If weak is True, only a weak reference to the provided node is
+        kept, such that the index may be kept in a mapping keyed by the
+        node without keeping it alive; the root will be None once the
+        node is gone.  As the nodes do not reference their parents, the
+        indexed nodes will not keep the node alive.
+        """
+
+        walker = Walker() if walker is None else walker
+        self._root = None if weak else node
+        self._root_ref = ref(node)
+        # the nodes in document order (i.e. preorder), and the indexes
+        # to that list for the nodes of every type.
+        self.nodes = []
+        self.types = {}
+        self._queries = {}
+        self._parents = None
+        self._depths = None
+        append = self.nodes.append
+        types = self.types
+        for i, child in enumerate(walker.traverse(node)):
+            append(child)
+            indexes = types.get(type(child))
+            if indexes is None:
+                types[type(child)] = [i]
+            else:
+                indexes.append(i)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def root(self):
+        return self._root_ref() if self._root is None else self._root
+
+    def get(self, types):
+        """
+        Return the list of the indexed nodes that are instances of the
+        provided type or tuple of types, in document order.
+        """
+
+        indexes = self._queries.get(types)
+        if indexes is None:
+            matched = [
+                indexes for cls, indexes in self.types.items()
+                if issubclass(cls, types)
+            ]
+            if len(matched) == 1:
+                indexes = matched[0]
+            else:
+                indexes = sorted(i for items in matched for i in items)
+            self._queries[types] = indexes
+        nodes = self.nodes
+        return [nodes[i] for i in indexes]
+
+    def _link(self):
+        # build the parent links and the depths of every node, in one
+        # pass through the indexed nodes; as they are in preorder, the
+        # depth of the parent is always known before its children.  The
+        # root is not kept here, as the parent of the nodes at depth 1.
+        root = self.root
+        parents = {id(root): None}
+        depths = {id(root): 0}
+        for parent in [root] + self.nodes:
+            depth = depths[id(parent)] + 1
+            link = None if parent is root else parent
+            for child in parent.children():
+                if child is not None:
+                    parents[id(child)] = link
+                    depths[id(child)] = depth
+        self._parents = parents
+        self._depths = depths
+
+    def parent(self, node):
+        """
+        Return the parent of the provided node, or None for the root.
+        A KeyError is raised for a node that is not indexed.
+        """
+
+        if self._parents is None:
+            self._link()
+        parent = self._parents[id(node)]
+        if parent is None and self._depths[id(node)] == 1:
+            return self.root
+        return parent
+
+    def depth(self, node):
+        """
+        Return the depth of the provided node, with the children of the
+        root being at depth 1.  A KeyError is raised for a node that is
+        not indexed.
+        """
+
+        if self._depths is None:
+            self._link()
+        return self._depths[id(node)]
+
+
+class IntervalIndex(object):
+    """
+    An index of a node and all the nodes nested within by the range of
+    the source that each of them spans, for finding the nodes at a given
+    offset or overlapping a given range of the source in logarithmic
+    time (plus the number of nodes returned).
+
+    The span of a node is from the earliest position out of its lexpos
+    and the ones of its children, up to the latest endpos out of itself
+    and its children; the nodes without positions are not indexed.
+
+    Example usage:
+
+    >>> from calmjs.parse.parsers.es5 import Parser
+    >>> from calmjs.parse.unparsers.es5 import pretty_print
+    >>> from calmjs.parse.walkers import IntervalIndex
+    >>> tree = Parser().parse(u'var a = b(c);\\nd = a + 1;\\n')
+    >>> index = IntervalIndex(tree)
+    >>> print(pretty_print(index.at(index.offset(1, 9))))
+    b
+    >>> print(pretty_print(index.at(index.offset(1, 10))))
+    (c)
+    >>> print(pretty_print(index.at(index.offset(2, 7))))
+    a + 1
+    >>> print(', '.join(
+    ...     type(node).__name__ for node in index.overlapping(7, 17)))
+    ES5Program, VarStatement, VarDecl, FunctionCall, Identifier, Arguments,
+    Identifier, ExprStatement, Assign, Identifier
+    """
+
+    def __init__(self, node, walker=None, line_starts=None):
+        """
+        Index the provided node and every node nested within, using the
+        traverse method of the walker.
+
+        The line_starts argument is the list of the offsets where each
+        line starts, for the conversion of the line and column numbers
+        to offsets; it is taken from the position table of the node if
+        not provided.
+        """
+
+        walker = Walker() if walker is None else walker
+        self.root = node
+        if line_starts is None and isinstance(
+                getattr(node, '_positions', None), PositionTable):
+            line_starts = node._positions.line_starts
+        self.line_starts = line_starts
+
+        # derive the spans of the nodes from their children, which are
+        # all traversed before their parents in postorder.
+        spans = {}
+        entries = []
+        nodes = list(walker.traverse(node, postorder=True))
+        nodes.append(node)
+        for i, child in enumerate(nodes):
+            start = child.lexpos
+            end = child.endpos
+            for grandchild in child.children():
+                span = spans.get(id(grandchild))
+                if span is None:
+                    continue
+                if start is None or span[0] < start:
+                    start = span[0]
+                if end is None or span[1] > end:
+                    end = span[1]
+            if start is None:
+                continue
+            if end is None or end < start:
+                end = start
+            spans[id(child)] = (start, end)
+            # the later ones in postorder are the parents, which must
+            # come first out of the nodes with the same span.
+            entries.append((start, -end, -i, child))
+
+        # the nodes ordered by their spans, with the nodes spanning a
+        # range placed before the ones nested within that range.
+        entries.sort(key=lambda entry: entry[:3])
+        self.nodes = [entry[3] for entry in entries]
+        self.starts = [entry[0] for entry in entries]
+        self.ends = [-entry[1] for entry in entries]
+
+        # the index of the innermost node spanning each of the segments
+        # of the source that start from the offsets, along with the
+        # index of the parent (as the enclosing span) of every node.
+        self.offsets = []
+        self.innermost = []
+        self.parents = []
+        stack = []
+        for i, (start, end) in enumerate(zip(self.starts, self.ends)):
+            self._close(stack, start)
+            self.parents.append(stack[-1] if stack else -1)
+            if start == end:
+                continue
+            stack.append(i)
+            self._segment(start, i)
+        self._close(stack, None)
+
+    def _segment(self, offset, i):
+        if self.offsets and self.offsets[-1] == offset:
+            self.innermost[-1] = i
+        else:
+            self.offsets.append(offset)
+            self.innermost.append(i)
+
+    def _close(self, stack, offset):
+        # close the spans on the stack that end at or before the offset,
+        # or all of them if offset is None.
+        ends = self.ends
+        while stack and (offset is None or ends[stack[-1]] <= offset):
+            end = ends[stack.pop()]
+            while stack and ends[stack[-1]] <= end:
+                stack.pop()
+            self._segment(end, stack[-1] if stack else -1)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def offset(self, lineno, colno):
+        """
+        Return the offset for the line and column numbers, which start
+        from 1 as the ones of the nodes do.
+        """
+
+        if self.line_starts is None:
+            raise ValueError('the starting offsets of the lines are unknown')
+        if not 0 < lineno <= len(self.line_starts) or colno < 1:
+            raise ValueError('invalid position %d:%d' % (lineno, colno))
+        return self.line_starts[lineno - 1] + colno - 1
+
+    def _at(self, offset):
+        i = bisect_right(self.offsets, offset) - 1
+        return self.innermost[i] if i >= 0 else -1
+
+    def at(self, offset):
+        """
+        Return the innermost node that spans the offset, or None if
+        there is no such node.
+        """
+
+        i = self._at(offset)
+        return self.nodes[i] if i >= 0 else None
+
+    def overlapping(self, start, end):
+        """
+        Return the nodes that span any part of the range of the source
+        from start up to (but not including) end, in the order of the
+        index; i.e. the nodes that span a range will precede the nodes
+        nested within that range.
+        """
+
+        if end <= start:
+            return []
+        # the nodes that start before the range but extend into it are
+        # the ones enclosing the start of the range.
+        enclosing = []
+        i = self._at(start)
+        while i >= 0:
+            if self.starts[i] < start:
+                enclosing.append(i)
+            i = self.parents[i]
+        enclosing.reverse()
+        starts, ends = self.starts, self.ends
+        return [self.nodes[i] for i in enclosing] + [
+            self.nodes[i] for i in range(
+                bisect_left(starts, start), bisect_left(starts, end))
+            if starts[i] < ends[i]
+        ]
+
+
 class ReprWalker(object):
     """
     Walker for the generation of an expanded repr-like form recursively
@@ -158,7 +637,7 @@ class ReprWalker(object):
         joiner = ',\n' + indentation if indent else ', '
         tailer = '\n' + ' ' * (indent * _level) if indent else ''
 
-        for k, v in vars(node).items():
+        for k, v in attributes(node).items():
             if k.startswith('_'):
                 continue
             if id(v) in ids: